@@ -1,16 +1,33 @@
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+import numpy as np
+import asyncio
 import subprocess
 import pathlib
 import json
+import logging
 import time
+import sys
+
+PROJECT_DIR = pathlib.Path(__file__).parent.resolve()
+OUTPUTS_DIR = PROJECT_DIR / "outputs"
+sys.path.insert(0, str(PROJECT_DIR / "scripts"))
+from openwakeword import MultiStreamModel  # noqa: E402
 
 """
 uvicorn api:app --reload --port 8000
 """
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_detectors()
+
+app = FastAPI(lifespan=lifespan)
 
 JOBS_FILE = pathlib.Path("jobs.json")
 
@@ -64,3 +81,230 @@ def get_status(job_id: str):
     if job_id not in jobs:
         return {"error": "Job not found"}
     return jobs[job_id]
+
+
+# -----------------------------
+# Streaming detection
+# -----------------------------
+MAX_QUEUED_EVENTS = 100  # the events waiting to be sent to a connection, beyond which the oldest are dropped
+
+class WakewordDetector:
+    """
+    Runs the models of a wakeword for all of the WebSocket connections detecting it. Each connection is a stream
+    of a MultiStreamModel, and a shared tick predicts on the pending audio of every connection in a single
+    batched call (on a dedicated thread, so the event loop is not blocked). While a tick runs, new audio
+    accumulates, so the batches grow with the load instead of queueing one call per connection.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wakeword-detector")
+        self.connections = {}
+        self.removed_connections = []
+        self.ticking = False
+        self.audio_ready = asyncio.Event()
+        self.tick_task = asyncio.get_running_loop().create_task(self.run())
+
+    def add_connection(self, connection_id, threshold, debounce_time):
+        self.connections[connection_id] = {
+            "pending": [],
+            "n_pending": 0,
+            "n_samples": 0,
+            "threshold": threshold,
+            "debounce_time": debounce_time,
+            "last_detection": {},
+            "events": asyncio.Queue(maxsize=MAX_QUEUED_EVENTS)
+        }
+        return self.connections[connection_id]["events"]
+
+    def add_audio(self, connection_id, audio):
+        connection = self.connections.get(connection_id)
+        if connection is None:
+            return  # the connection failed, and is being closed
+        connection["pending"].append(audio)
+        connection["n_pending"] += audio.shape[0]
+        if (connection["n_samples"] % 1280) + connection["n_pending"] >= 1280:
+            self.audio_ready.set()
+
+    def remove_connection(self, connection_id):
+        self.connections.pop(connection_id, None)
+        self.remove_stream(connection_id)
+
+    def fail_connection(self, connection_id, message):
+        # The connection is sent an error event (after which it is closed), and its stream is removed
+        connection = self.connections.pop(connection_id, None)
+        if connection is not None:
+            self.put_event(connection, {"event": "error", "message": message})
+            self.remove_stream(connection_id)
+
+    def put_event(self, connection, event):
+        # A client that doesn't read its events only gets the most recent ones, instead of the server buffering
+        # events for it without a limit
+        if connection["events"].full():
+            connection["events"].get_nowait()
+        connection["events"].put_nowait(event)
+
+    def remove_stream(self, connection_id):
+        # The streams of the model can't change while a tick predicts on them, so those removed during a tick
+        # are removed right after it
+        if self.ticking:
+            self.removed_connections.append(connection_id)
+        else:
+            self.model.remove_stream(connection_id)
+
+    async def run(self):
+        while True:
+            await self.audio_ready.wait()
+            self.audio_ready.clear()
+
+            # A failed tick only fails its connections, so that the other (and new) connections keep working
+            batch = {}
+            try:
+                batch = self.get_batch()
+                if batch:
+                    self.ticking = True
+                    await self.tick(batch)
+            except Exception as e:
+                logging.exception(f"Wakeword detection failed for {len(batch)} connection(s)")
+                for connection_id in batch:
+                    self.fail_connection(connection_id, f"Wakeword detection failed: {e}")
+            finally:
+                self.ticking = False
+                for connection_id in self.removed_connections:
+                    self.model.remove_stream(connection_id)
+                self.removed_connections = []
+
+    def get_batch(self):
+        batch = {}
+        for connection_id, connection in self.connections.items():
+            if connection["n_pending"] > 0:
+                batch[connection_id] = np.concatenate(connection["pending"])
+                connection["pending"], connection["n_pending"] = [], 0
+        return batch
+
+    async def tick(self, batch):
+        predictions = await asyncio.get_running_loop().run_in_executor(self.executor, self.model.predict, batch)
+
+        for connection_id, audio in batch.items():
+            connection = self.connections.get(connection_id)
+            if connection is None:
+                continue
+            n_frames = connection["n_samples"]//1280
+            connection["n_samples"] += audio.shape[0]
+            if connection["n_samples"]//1280 == n_frames:
+                continue  # no complete frame was predicted for this connection
+            position = (connection["n_samples"]//1280)*1280/16000
+            for label, score in predictions[connection_id].items():
+                last_detection = connection["last_detection"].get(label)
+                if score >= connection["threshold"] and \
+                   (last_detection is None or position - last_detection >= connection["debounce_time"]):
+                    connection["last_detection"][label] = position
+                    self.put_event(connection, {"event": "detection", "label": label, "score": score,
+                                                "time": position})
+
+    async def close(self):
+        # A prediction already running on the executor isn't stopped by cancelling the tick, so the executor is
+        # shut down after it finishes (on another thread, so the event loop is not blocked)
+        self.tick_task.cancel()
+        try:
+            await self.tick_task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+
+
+detectors = {}
+
+def get_wakeword_models(wakeword: str):
+    """Gets the ONNX models of the most recent training run of a wakeword"""
+    model_dirs = [i for i in (OUTPUTS_DIR / wakeword / "models").glob("*") if i.is_dir()]
+    for model_dir in sorted(model_dirs, key=lambda i: i.stat().st_mtime, reverse=True):
+        model_paths = sorted(i for i in model_dir.glob("*.onnx") if not i.stem.endswith("_int8"))
+        if model_paths:
+            return model_paths
+    raise FileNotFoundError(f"No trained models found for wakeword '{wakeword}'")
+
+async def load_detector(wakeword: str):
+    """Loads the models of a wakeword on a worker thread, so that the event loop is not blocked"""
+    loop = asyncio.get_running_loop()
+    model_paths = await loop.run_in_executor(None, get_wakeword_models, wakeword)
+    model = await loop.run_in_executor(None, partial(MultiStreamModel, wakeword_models=[str(i) for i in model_paths],
+                                                     inference_framework="onnx"))
+    return WakewordDetector(model)
+
+async def get_detector(wakeword: str):
+    # Connections arriving while the models load wait for the same task (which isn't cancelled if they close)
+    if wakeword not in detectors:
+        detectors[wakeword] = asyncio.get_running_loop().create_task(load_detector(wakeword))
+    task = detectors[wakeword]
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        if detectors.get(wakeword) is task:
+            del detectors[wakeword]
+        raise
+
+async def send_events(websocket: WebSocket, events: asyncio.Queue):
+    while True:
+        event = await events.get()
+        await websocket.send_json(event)
+        if event["event"] == "error":
+            await websocket.close(code=1011, reason=event["message"][0:120])
+            return
+
+
+@app.websocket("/wakewords/detect/{wakeword}")
+async def detect_wakeword(websocket: WebSocket, wakeword: str, threshold: float = 0.5, debounce_time: float = 1.0):
+    """
+    Streams 16 kHz, 16-bit little-endian mono PCM audio (as binary messages of any length, which don't need to
+    contain whole samples) to the models of a wakeword.
+    After a {"event": "ready"} message, the server sends {"event": "detection", "label", "score", "time"}
+    messages, where "time" is the position (in seconds) of the end of the detected frame in the stream.
+    If detection fails, the server sends an {"event": "error", "message"} message and closes the connection.
+    If more than MAX_QUEUED_EVENTS events are waiting to be sent (because the client doesn't read them),
+    the oldest ones are dropped.
+    Text messages aren't supported, and close the connection with code 1003.
+    """
+    try:
+        detector = await get_detector(wakeword)
+    except FileNotFoundError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    except Exception as e:
+        logging.exception(f"Could not load the models of wakeword '{wakeword}'")
+        await websocket.close(code=1011, reason=f"Could not load the models: {e}"[0:120])
+        return
+
+    await websocket.accept()
+    connection_id = str(uuid4())
+    events = detector.add_connection(connection_id, threshold, debounce_time)
+    await websocket.send_json({"event": "ready", "labels": detector.model.labels})
+    sender = asyncio.create_task(send_events(websocket, events))
+    odd_byte = b""  # a message may end in the middle of a sample, whose second byte starts the next message
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is None:
+                await websocket.close(code=1003, reason="Only binary messages with audio are supported")
+                break
+            data = odd_byte + message["bytes"]
+            n_bytes = len(data) - len(data) % 2
+            odd_byte = data[n_bytes:]
+            if n_bytes > 0:
+                detector.add_audio(connection_id, np.frombuffer(data[0:n_bytes], dtype="<i2"))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        detector.remove_connection(connection_id)
+
+
+async def close_detectors():
+    tasks = list(detectors.values())
+    detectors.clear()
+    for task in tasks:
+        if not task.done():
+            task.cancel()  # the models are still loading
+        elif not task.cancelled() and task.exception() is None:
+            await task.result().close()
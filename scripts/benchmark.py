@@ -0,0 +1,704 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import onnxruntime as ort
+import scipy.io.wavfile
+
+import openwakeword
+from openwakeword.autotune import autotune, save_profile, DEFAULT_PROFILE_PATH
+from openwakeword.quantization import (quantize_onnx_model, quantize_feature_models, load_calibration_features,
+                                       get_feature_model_calibration_data)
+from openwakeword.noise_suppression import SpeexNoiseSuppressor, SpectralSubtractionNoiseSuppressor
+from openwakeword.feature_store import FeatureStore
+from openwakeword.utils import (AudioFeatures, get_batchable_onnx_model, mine_false_positives,
+                                compute_features_from_generator)
+
+"""Micro-benchmarks for the openWakeWord inference paths.
+
+Run from the `scripts/` folder, for example:
+
+    uv run python benchmark.py streaming-buffers --frames 2000
+"""
+
+
+def _random_audio(n_samples, seed=0):
+    rng = np.random.RandomState(seed)
+    return (rng.randn(n_samples)*2000).astype(np.int16)
+
+
+def benchmark_streaming_buffers(args):
+    """Per-frame time and allocations of the AudioFeatures streaming buffers.
+
+    The melspectrogram and embedding models are replaced by functions returning
+    preallocated outputs, so that only the buffer bookkeeping is measured.
+    """
+    F = AudioFeatures(inference_framework="onnx")
+    audio = _random_audio(1280*args.frames)
+
+    # Measure the full streaming pipeline (including model inference)
+    start = time.perf_counter()
+    for i in range(0, audio.shape[0], 1280):
+        F(audio[i:i+1280])
+    elapsed = time.perf_counter() - start
+    print(f"streaming features: {1e6*elapsed/args.frames:.1f} us/frame (with models)")
+
+    # Measure only the buffer management
+    melspec_output = [np.zeros((1, 1, 8, 32), dtype=np.float32)]
+    embedding_output = np.zeros(96, dtype=np.float32)
+    F.melspec_model_predict = lambda x: melspec_output
+    F.embedding_model_predict = lambda x: embedding_output
+
+    for i in range(0, 1280*args.warmup, 1280):
+        F(audio[i:i+1280])
+
+    tracemalloc.start()
+    snapshot_start = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    current, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    for i in range(0, audio.shape[0], 1280):
+        F(audio[i:i+1280])
+        F.get_features(16)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot_end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = snapshot_end.compare_to(snapshot_start, "lineno")
+    net_blocks = sum(stat.count_diff for stat in stats if "openwakeword" in stat.traceback[0].filename)
+    net_bytes = sum(stat.size_diff for stat in stats if "openwakeword" in stat.traceback[0].filename)
+    print(f"buffer bookkeeping: {1e6*elapsed/args.frames:.1f} us/frame")
+    print(f"retained allocations: {net_blocks/args.frames:.3f} blocks/frame ({net_bytes/args.frames:.1f} bytes/frame)")
+    print(f"peak transient memory: {(peak - current)/1024:.1f} KiB")
+
+
+def benchmark_multistream(args):
+    """Tick latency and streams-per-core of the batched multi-stream model"""
+    msm = openwakeword.MultiStreamModel(wakeword_models=args.models, inference_framework="onnx", ncpu=args.ncpu)
+    audio = _random_audio(1280*args.frames)
+    for i in range(0, audio.shape[0], 1280):
+        msm.predict({stream_id: audio[i:i+1280] for stream_id in range(args.streams)})
+
+    for key, value in msm.get_stats().items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+def _high_dynamic_range_audio(n_samples, seed=0):
+    """Random audio with loud bursts, quiet stretches and silence, where the melspectrogram floor matters"""
+    rng = np.random.RandomState(seed)
+    audio = rng.randn(n_samples)*rng.choice([0, 20, 2000, 20000], (n_samples + 7999)//8000).repeat(8000)[0:n_samples]
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def benchmark_offline_scoring(args):
+    """Speed of offline (batched) clip scoring, and the agreement of its features and scores with streaming"""
+    oww = openwakeword.Model(wakeword_models=args.models, inference_framework="onnx")
+    n_input_frames = max(oww.model_inputs.values())
+    clips = [_high_dynamic_range_audio(int(16000*args.clip_duration), seed=i) for i in range(args.clips)]
+
+    streaming_time, offline_time, max_score_difference, max_feature_difference = 0.0, 0.0, 0.0, 0.0
+    for clip in clips:
+        # Streaming prediction, as in `predict_clip`, keeping the features of each frame
+        oww.reset()
+        data = np.concatenate((np.zeros(16000, dtype=np.int16), clip, np.zeros(16000, dtype=np.int16)))
+        streaming, streaming_features = [], []
+        start = time.perf_counter()
+        for i in range(0, data.shape[0] - 1280, 1280):
+            streaming.append(oww.predict(data[i:i+1280]))
+            streaming_features.append(oww.preprocessor.get_features(n_input_frames)[0])
+        streaming_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        offline = oww.predict_clip(clip, offline=True)
+        offline_time += time.perf_counter() - start
+
+        for frame_streaming, frame_offline in zip(streaming, offline):
+            for label in frame_streaming.keys():
+                max_score_difference = max(max_score_difference, abs(frame_streaming[label] - frame_offline[label]))
+
+        scores, features = oww._get_offline_scores(data, return_features=True)
+        n_initial_features = features.shape[0] - scores.shape[0]
+        for i, frame_features in enumerate(streaming_features):
+            end = n_initial_features + i + 1
+            max_feature_difference = max(max_feature_difference,
+                                         float(np.abs(features[end - n_input_frames:end] - frame_features).max()))
+
+    print(f"streaming: {streaming_time/args.clips*1000:.1f} ms/clip")
+    print(f"offline: {offline_time/args.clips*1000:.1f} ms/clip")
+    print(f"max score difference: {max_score_difference:.2e} (tolerance {args.tolerance:.0e})")
+    print(f"max feature difference: {max_feature_difference:.2e} (tolerance {args.tolerance:.0e})")
+    if max_score_difference > args.tolerance or max_feature_difference > args.tolerance:
+        raise SystemExit("Offline scores or features differ from streaming prediction by more than the tolerance!")
+
+
+def benchmark_false_positive_mining(args):
+    """Speed of mining false positives from long files, compared to streaming one file with `predict`"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = []
+        for i in range(args.files):
+            files.append(os.path.join(tmp_dir, f"negative_{i}.wav"))
+            scipy.io.wavfile.write(files[-1], 16000, _random_audio(int(16000*60*args.duration), seed=i))
+
+        oww = openwakeword.Model(wakeword_models=args.models, inference_framework="onnx")
+        start = time.perf_counter()
+        streaming = oww._get_positive_prediction_frames(files[0], threshold=args.threshold)
+        streaming_time = time.perf_counter() - start
+        n_streaming_hits = sum(i.shape[0] for i in streaming.values())
+
+        start = time.perf_counter()
+        summary = mine_false_positives(files, args.models, os.path.join(tmp_dir, "store"), threshold=args.threshold,
+                                       ncpu=args.ncpu, segment_duration=args.segment_duration)
+        mining_time = time.perf_counter() - start
+        store = FeatureStore(os.path.join(tmp_dir, "store"))
+        n_mining_hits = int(np.sum(store.get_metadata()["source"] == store.sources.index(files[0]))) \
+            if files[0] in store.sources else 0
+
+    print(f"streaming: {60*args.duration/streaming_time:.1f}x real time ({n_streaming_hits} hits in the first file)")
+    print(f"mining ({args.ncpu} processes): {summary['hours']*3600/mining_time:.1f}x real time "
+          f"({n_mining_hits} hits in the first file, {summary['n_hits']} in total)")
+
+
+def benchmark_feature_pipeline(args):
+    """Clips/s of `compute_features_from_generator` compared to augmenting, embedding, and writing in sequence.
+
+    Augmentation is simulated by waiting `augmentation_ms` per batch (like torch kernels, this releases the GIL),
+    so the overlap of the stages can be measured without the training dependencies.
+    """
+    def generator(n_clips):
+        rng = np.random.RandomState(0)
+        for i in range(0, n_clips, args.batch_size):
+            time.sleep(args.augmentation_ms/1000)
+            yield (rng.randn(min(args.batch_size, n_clips - i), 32000)*2000).astype(np.int16)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        F = AudioFeatures(inference_framework="onnx", autotune_workload="batch")
+        fp = np.lib.format.open_memmap(os.path.join(tmp_dir, "sequential.npy"), mode="w+", dtype=np.float32,
+                                       shape=(args.clips, 16, 96))
+        start = time.perf_counter()
+        row_counter = 0
+        for audio_data in generator(args.clips):
+            features = F.embed_clips(audio_data, batch_size=audio_data.shape[0], ncpu=args.ncpu)
+            fp[row_counter:row_counter+features.shape[0]] = features
+            row_counter += features.shape[0]
+            fp.flush()
+        sequential_time = time.perf_counter() - start
+        del fp
+
+        stats = compute_features_from_generator(
+            [generator(args.clips//args.augmentation_workers) for _ in range(args.augmentation_workers)],
+            n_total=args.clips//args.augmentation_workers*args.augmentation_workers, clip_duration=32000,
+            output_file=os.path.join(tmp_dir, "pipeline.npy"), ncpu=args.ncpu,
+            n_embedding_workers=args.embedding_workers, prefetch_batches=args.prefetch_batches
+        )
+
+    print(f"sequential: {args.clips/sequential_time:.1f} clips/s")
+    print(f"pipeline: {stats['clips_per_second']:.1f} clips/s")
+    for stage, utilization in stats["utilization"].items():
+        print(f"  {stage} utilization: {utilization:.0%}")
+
+
+def benchmark_embed_clips(args):
+    """Throughput of `AudioFeatures.embed_clips` and its melspectrogram and embedding stages on 2 second clips"""
+    F = AudioFeatures(inference_framework="onnx", autotune_workload="batch")
+    rng = np.random.RandomState(0)
+    clips = (rng.randn(args.clips, 32000)*2000*rng.uniform(0.001, 1, (args.clips, 1))).astype(np.int16)
+    F.embed_clips(clips[0:args.batch_size], batch_size=args.batch_size, ncpu=args.ncpu)
+
+    start = time.perf_counter()
+    melspecs = F._get_melspectrogram_batch(clips, batch_size=args.batch_size, ncpu=args.ncpu)
+    melspec_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    F._get_embeddings_batch(melspecs[:, :, :, None], batch_size=args.batch_size, ncpu=args.ncpu)
+    embedding_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    F.embed_clips(clips, batch_size=args.batch_size, ncpu=args.ncpu)
+    total_time = time.perf_counter() - start
+
+    # Each clip on its own, which is how the features of single clips are computed
+    reference = np.array([F._get_melspectrogram(clip) for clip in clips[0:args.batch_size]])
+    max_difference = np.abs(melspecs[0:args.batch_size] - reference).max()
+
+    # The cost of building the embedding model inputs, with the model replaced by a function returning zeros
+    embedding_model_predict = F.embedding_model_predict
+    F.embedding_model_predict = lambda x: np.zeros((x.shape[0], 96), dtype=np.float32).squeeze()
+    start = time.perf_counter()
+    F._get_embeddings_batch(melspecs[:, :, :, None], batch_size=args.batch_size, ncpu=args.ncpu)
+    overhead_time = time.perf_counter() - start
+    F.embedding_model_predict = embedding_model_predict
+
+    print(f"melspectrogram: {args.clips/melspec_time:.1f} clips/s")
+    print(f"embedding: {args.clips/embedding_time:.1f} clips/s "
+          f"(of which {overhead_time/args.clips*1e6:.1f} us/clip outside of the model)")
+    print(f"embed_clips: {args.clips/total_time:.1f} clips/s")
+    print(f"max melspectrogram difference to single clips: {max_difference:.2e}")
+
+
+def benchmark_noise_suppression(args):
+    """Per-frame time of the noise suppression stages, compared to joining per-chunk Speex outputs"""
+    audio = _random_audio(1280*args.frames)
+    results = {}
+
+    try:
+        from speexdsp_ns import NoiseSuppression
+    except ImportError:
+        NoiseSuppression = None
+        print("speexdsp_ns is not installed, skipping the Speex noise suppression")
+
+    if NoiseSuppression is not None:
+        # The previous implementation, which joins the outputs of each 160 sample chunk and re-parses them
+        speex_ns = NoiseSuppression.create(160, 16000)
+        start = time.perf_counter()
+        joined = []
+        for i in range(0, audio.shape[0], 1280):
+            cleaned = [speex_ns.process(audio[j:j+160].tobytes()) for j in range(i, i+1280, 160)]
+            joined.append(np.frombuffer(b''.join(cleaned), np.int16))
+        results["speex (joined chunks)"] = time.perf_counter() - start
+        reference = np.concatenate(joined)
+
+        ns = SpeexNoiseSuppressor()
+        output = np.zeros(audio.shape[0], dtype=np.int16)
+        start = time.perf_counter()
+        for i in range(0, audio.shape[0], 1280):
+            ns.process(audio[i:i+1280], out=output[i:])
+        results["speex (preallocated)"] = time.perf_counter() - start
+        if not np.array_equal(output, reference):
+            raise SystemExit("The outputs of the preallocated Speex noise suppressor differ from the reference!")
+
+    ns = SpectralSubtractionNoiseSuppressor()
+    output = np.zeros(1280 + 160, dtype=np.int16)
+    start = time.perf_counter()
+    for i in range(0, audio.shape[0], 1280):
+        ns.process(audio[i:i+1280], out=output)
+    results["spectral subtraction (numpy)"] = time.perf_counter() - start
+
+    for name, elapsed in results.items():
+        print(f"{name}: {1e6*elapsed/args.frames:.1f} us/frame")
+
+
+def benchmark_melspectrogram(args):
+    """Per-hop latency of the melspectrogram frontends, and the agreement of streaming and whole-clip results"""
+    audio = _random_audio(1280*args.frames)
+
+    melspecs = {}
+    for frontend in ["model", "numpy"]:
+        F = AudioFeatures(inference_framework="onnx", melspectrogram_frontend=frontend)
+        for i in range(0, 1280*10, 1280):
+            F(audio[i:i+1280])
+        window = F.raw_data_buffer[-1760:]
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            F._get_melspectrogram(window)
+        latency = (time.perf_counter() - start)/args.frames
+
+        # Compare on a clip that fits in the melspectrogram buffer (after the 76 initial frames)
+        clip = audio[0:1280*min(args.frames, 100)]
+        clip[clip.shape[0]//3:clip.shape[0]//2] = 0  # digital silence, where the dynamic range limit applies
+        F.reset()
+        for i in range(0, clip.shape[0], 1280):
+            F(clip[i:i+1280])
+        streaming = F.melspectrogram_buffer[76:].copy()
+        whole_clip = F._get_melspectrogram(clip)
+        melspecs[frontend] = streaming
+        print(f"{frontend}: {latency*1e6:.1f} us/hop, max streaming vs. whole-clip difference "
+              f"{np.abs(streaming - whole_clip).max():.6f}")
+        F.close()
+
+    print(f"Max streaming difference of the numpy frontend from the model: "
+          f"{np.abs(melspecs['numpy'] - melspecs['model']).max():.6f}")
+
+
+def _time_to_first_prediction(models, onnx_cache_dir=None, n_instances=1):
+    """Seconds from creating each Model to the end of its first prediction (run in a new process)"""
+    audio = _random_audio(1280)
+    times, instances = [], []
+    for _ in range(n_instances):
+        start = time.perf_counter()
+        oww = openwakeword.Model(wakeword_models=models, inference_framework="onnx", onnx_cache_dir=onnx_cache_dir)
+        oww.predict(audio)
+        times.append(time.perf_counter() - start)
+        instances.append(oww)  # keep the instances alive, as separate models in one process would be
+
+    start = time.perf_counter()
+    for _ in range(20):
+        instances[0].reset()
+    times.append((time.perf_counter() - start)/20)
+
+    return times
+
+
+def benchmark_startup(args):
+    """Time-to-first-prediction of a new Model (with and without shared sessions and the optimized model cache),
+    and the time to reset a Model"""
+    ctx = multiprocessing.get_context("spawn")
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="oww_onnx_cache_")
+
+    with ctx.Pool(1) as pool:
+        times = pool.apply(_time_to_first_prediction, (args.models, None, args.instances))
+    print(f"new process, no cache: {times[0]*1000:.1f} ms")
+    if len(times) > 2:
+        print(f"later instances in the same process (shared sessions): {np.mean(times[1:-1])*1000:.1f} ms")
+    print(f"reset: {times[-1]*1e6:.0f} us")
+
+    with ctx.Pool(1) as pool:
+        pool.apply(_time_to_first_prediction, (args.models, cache_dir))  # populates the cache, if needed
+    with ctx.Pool(1) as pool:
+        times = pool.apply(_time_to_first_prediction, (args.models, cache_dir))
+    print(f"new process, optimized model cache: {times[0]*1000:.1f} ms (cache: {cache_dir})")
+
+
+def benchmark_autotune(args):
+    """Benchmarks the inference parameters on this host, and saves the fastest ones as the autotune profile"""
+    logging.basicConfig(level=logging.INFO, format="%(message)s")  # the time of each configuration
+    profile = autotune(wakeword_models=args.models, n_frames=args.frames, n_clips=args.clips,
+                       batch_sizes=args.batch_sizes)
+    save_profile(profile, args.output)
+    print(f"streaming: {profile['streaming']}")
+    print(f"batch: {profile['batch']}")
+    print(f"saved the profile to {args.output or DEFAULT_PROFILE_PATH}")
+
+
+def _load_session(model_path):
+    """Loads an ONNX model with a dynamic batch dimension when possible"""
+    session = ort.InferenceSession(get_batchable_onnx_model(model_path), providers=["CPUExecutionProvider"])
+    try:
+        session.run(None, {session.get_inputs()[0].name: np.zeros([2] + session.get_inputs()[0].shape[1:],
+                                                                  dtype=np.float32)})
+        return session, True
+    except Exception:
+        return ort.InferenceSession(model_path, providers=["CPUExecutionProvider"]), False
+
+
+def _score_windows(session, supports_batching, windows, batch_size=512):
+    """The score of each window (the first output of the model)"""
+    input_name = session.get_inputs()[0].name
+    if not supports_batching:
+        return np.array([session.run(None, {input_name: i[None, ]})[0].reshape(-1)[0] for i in windows])
+    return np.concatenate([session.run(None, {input_name: windows[i:i+batch_size]})[0][:, 0]
+                           for i in range(0, windows.shape[0], batch_size)])
+
+
+def _evaluate_model(model_path, positive_windows, n_positive_clips, negative_windows, fp_hours, threshold):
+    """Latency, size, recall, and false positives per hour of a wakeword model"""
+    session, supports_batching = _load_session(model_path)
+    single_window = positive_windows[0:1]
+    for _ in range(10):
+        session.run(None, {session.get_inputs()[0].name: single_window})
+    start = time.perf_counter()
+    for _ in range(200):
+        session.run(None, {session.get_inputs()[0].name: single_window})
+    latency = (time.perf_counter() - start)/200
+
+    positive_scores = _score_windows(session, supports_batching, positive_windows).reshape(n_positive_clips, -1)
+    negative_scores = _score_windows(session, supports_batching, negative_windows)
+    return {
+        "latency_ms": latency*1000,
+        "size_kb": os.path.getsize(model_path)/1024,
+        "recall": float((positive_scores.max(axis=1) >= threshold).mean()),
+        "fp_per_hour": float((negative_scores >= threshold).sum()/fp_hours)
+    }
+
+
+def benchmark_quantization(args):
+    """Latency, size, recall, and false positives per hour of INT8 quantized models compared to float32.
+
+    Recall is the fraction of positive clips with any window scoring above the threshold, and false positives
+    are the windows of the continuous false positive validation features scoring above the threshold (as
+    during training). Both are computed from precomputed features, so they reflect the wakeword models only;
+    the quantized feature models are compared by latency, size, and the error of their embeddings.
+    """
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix="oww_quantized_")
+    positive = np.load(args.positive_features, mmap_mode="r")
+    negative = np.load(args.false_positive_features, mmap_mode="r")
+    fp_hours = negative.shape[0]*1280/16000/3600
+    calibration_files = args.calibration_features or [args.positive_features, args.false_positive_features]
+
+    print(f"{'model':<40}{'latency (ms)':>14}{'size (KB)':>12}{'recall':>10}{'FP/hr':>10}")
+    for model_path in args.models:
+        name = os.path.splitext(os.path.basename(model_path))[0]
+        n_input_frames = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0].shape[1]
+
+        # All of the windows of the positive clips and the false positive validation features
+        positive_windows = np.lib.stride_tricks.sliding_window_view(positive, n_input_frames, axis=1)
+        positive_windows = np.ascontiguousarray(positive_windows.transpose(0, 1, 3, 2).reshape(-1, n_input_frames, 96),
+                                                dtype=np.float32)
+        negative_windows = np.lib.stride_tricks.sliding_window_view(negative, n_input_frames, axis=0)
+        negative_windows = np.ascontiguousarray(negative_windows.transpose(0, 2, 1), dtype=np.float32)
+
+        results = {"float32": _evaluate_model(model_path, positive_windows, positive.shape[0], negative_windows,
+                                              fp_hours, args.threshold)}
+        for mode in args.modes:
+            calibration_data = load_calibration_features(calibration_files, n_input_frames) if mode == "static" else None
+            quantized_path = quantize_onnx_model(model_path, os.path.join(output_dir, f"{name}_{mode}_int8.onnx"),
+                                                 mode=mode, calibration_data=calibration_data)
+            results[f"int8 ({mode})"] = _evaluate_model(quantized_path, positive_windows, positive.shape[0],
+                                                        negative_windows, fp_hours, args.threshold)
+
+        for precision, r in results.items():
+            row = f"{name + ' ' + precision:<40}{r['latency_ms']:>14.3f}{r['size_kb']:>12.1f}"
+            row += f"{r['recall']:>10.3f}{r['fp_per_hour']:>10.2f}"
+            if precision != "float32":
+                row += (f"  (recall {r['recall'] - results['float32']['recall']:+.3f},"
+                        f" FP/hr {r['fp_per_hour'] - results['float32']['fp_per_hour']:+.2f})")
+            print(row)
+
+    if args.feature_models:
+        if args.calibration_audio:
+            clips = [scipy.io.wavfile.read(i)[1] for i in args.calibration_audio]
+        else:
+            clips = [_random_audio(16000*4, seed=i) for i in range(8)]
+        inputs = get_feature_model_calibration_data(clips)
+        for mode in args.modes:
+            if mode == "static" and not args.calibration_audio:
+                print("Skipping static quantization of the feature models (requires --calibration_audio)")
+                continue
+            quantized_paths = quantize_feature_models(mode, clips, output_dir=os.path.join(output_dir, mode))
+            for name, quantized_path in quantized_paths.items():
+                float_path = os.path.join(os.path.dirname(openwakeword.__file__), "resources", "models",
+                                          os.path.basename(quantized_path).replace("_int8", ""))
+                outputs, latencies = [], []
+                for path in [float_path, quantized_path]:
+                    session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+                    input_name = session.get_inputs()[0].name
+                    start = time.perf_counter()
+                    outputs.append(np.concatenate([session.run(None, {input_name: i[None, ]})[0].reshape(1, -1)
+                                                   for i in inputs[name]]))
+                    latencies.append((time.perf_counter() - start)/len(inputs[name]))
+                error = np.sqrt(np.mean((outputs[0] - outputs[1])**2))/np.std(outputs[0])
+                print(f"{name} int8 ({mode}): latency {latencies[0]*1000:.3f} -> {latencies[1]*1000:.3f} ms, "
+                      f"size {os.path.getsize(float_path)/1024:.1f} -> {os.path.getsize(quantized_path)/1024:.1f} KB, "
+                      f"relative RMS error {error:.3f}")
+
+    print(f"Quantized models saved to {output_dir}")
+
+
+def benchmark_async_detect(args):
+    """Event loop responsiveness and queue depth of `Model.detect`, compared to calling `Model.predict` directly"""
+    import asyncio
+
+    audio = _random_audio(1280*args.frames)
+
+    async def audio_source():
+        # Sends audio `speed` times faster than real time, in chunks of `chunk_size` samples
+        for i in range(0, audio.shape[0], args.chunk_size):
+            await asyncio.sleep(args.chunk_size/16000/args.speed)
+            yield audio[i:i+args.chunk_size]
+
+    async def monitor_loop_lag(lags):
+        # Measures how late a 10 ms timer fires, which is the time the event loop was blocked
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+
+    async def run(mode):
+        oww = openwakeword.Model(wakeword_models=args.models, inference_framework="onnx")
+        lags: list = []
+        monitor = asyncio.ensure_future(monitor_loop_lag(lags))
+        start = time.perf_counter()
+        if mode == "detect":
+            async for _ in oww.detect(audio_source(), max_queue_frames=args.max_queue_frames):
+                pass
+        else:
+            loop = asyncio.get_running_loop()
+            async for chunk in audio_source():
+                if mode == "predict":
+                    oww.predict(chunk)
+                else:
+                    await loop.run_in_executor(None, oww.predict, chunk)
+        elapsed = time.perf_counter() - start
+        monitor.cancel()
+
+        print(f"{mode}: {elapsed:.2f} s for {audio.shape[0]/16000:.1f} s of audio, event loop lag "
+              f"p99 {np.percentile(lags, 99)*1000:.2f} ms, max {np.max(lags)*1000:.2f} ms")
+        if mode == "detect":
+            stats = oww.get_detect_stats()
+            print(f"  max queue depth {stats['max_queue_depth']} frames, mean batch {stats['mean_batch_frames']:.2f}"
+                  f" frames, backpressure waits {stats['backpressure_waits']}, "
+                  f"real-time factor {stats['real_time_factor']:.3f}")
+        oww.close()
+
+    for mode in ["predict", "run_in_executor", "detect"]:
+        asyncio.run(run(mode))
+
+
+def benchmark_websocket_load(args):
+    """Concurrent-connection capacity and detection latency of the WebSocket detection endpoint in `api.py`.
+
+    Start the server first (e.g., `uvicorn api:app --port 8000` from the repository root). Each client streams
+    audio in real time with a threshold of 0 and no debouncing, so the server sends an event for every batch
+    of frames it predicts, and the latency of each event is measured from when the last sample of its frame
+    was sent.
+    """
+    import asyncio
+    import json
+    import websockets
+
+    audio = _random_audio(int(16000*args.duration))
+    n_frames = audio.shape[0]//1280
+    url = f"{args.url}?threshold=0&debounce_time=0"
+
+    async def client(latencies, start_offset):
+        async with websockets.connect(url, max_size=None) as ws:
+            json.loads(await ws.recv())  # the "ready" message
+            send_times = {}
+
+            async def receive_events():
+                async for message in ws:
+                    event = json.loads(message)
+                    frame_end = round(event["time"]*16000)
+                    latencies.append(time.perf_counter() - send_times[frame_end])
+                    if frame_end >= n_frames*1280:
+                        return
+
+            receiver = asyncio.ensure_future(receive_events())
+            await asyncio.sleep(start_offset)
+            start = time.perf_counter()
+            for i in range(0, n_frames*1280, args.chunk_size):
+                delay = start + i/16000 - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await ws.send(audio[i:i+args.chunk_size].tobytes())
+                sent = time.perf_counter()
+                for frame_end in range((i//1280 + 1)*1280, min(i + args.chunk_size, n_frames*1280) + 1, 1280):
+                    send_times[frame_end] = sent
+            try:
+                await asyncio.wait_for(receiver, timeout=args.max_latency_ms/1000 + 5)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(n_connections):
+        latencies: list = []
+        rng = np.random.RandomState(n_connections)
+        await asyncio.gather(*[client(latencies, rng.uniform(0, args.chunk_size/16000))
+                               for _ in range(n_connections)])
+        return np.array(latencies)
+
+    capacity = 0
+    for n_connections in args.connections:
+        latencies = asyncio.run(run(n_connections))
+        p50, p99 = np.percentile(latencies, 50)*1000, np.percentile(latencies, 99)*1000
+        print(f"{n_connections} connections: {len(latencies)} events, detection latency p50 {p50:.1f} ms, "
+              f"p99 {p99:.1f} ms")
+        if p99 <= args.max_latency_ms:
+            capacity = n_connections
+    print(f"Capacity: {capacity} concurrent real-time connections with p99 latency <= {args.max_latency_ms} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark openWakeWord inference paths.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("streaming-buffers", help="Per-frame cost of the AudioFeatures streaming buffers")
+    p.add_argument("--frames", type=int, default=2000, help="Number of 80 ms frames to process")
+    p.add_argument("--warmup", type=int, default=200, help="Number of frames to process before measuring")
+    p.set_defaults(func=benchmark_streaming_buffers)
+
+    p = subparsers.add_parser("multistream", help="Tick latency and capacity of MultiStreamModel")
+    p.add_argument("--models", nargs="+", required=True, help="Paths to the ONNX wakeword models")
+    p.add_argument("--streams", type=int, default=64, help="Number of concurrent streams")
+    p.add_argument("--frames", type=int, default=200, help="Number of 80 ms frames to process per stream")
+    p.add_argument("--ncpu", type=int, default=1, help="Number of threads for the feature models")
+    p.set_defaults(func=benchmark_multistream)
+
+    p = subparsers.add_parser("offline-scoring", help="Offline vs. streaming scoring with Model.predict_clip")
+    p.add_argument("--models", nargs="+", required=True, help="Paths to the ONNX wakeword models")
+    p.add_argument("--clips", type=int, default=20, help="Number of random clips to score")
+    p.add_argument("--clip_duration", type=float, default=5.0, help="Duration of each clip (in seconds)")
+    p.add_argument("--tolerance", type=float, default=1e-3, help="Maximum allowed score and feature difference")
+    p.set_defaults(func=benchmark_offline_scoring)
+
+    p = subparsers.add_parser("false-positive-mining", help="Parallel false-positive mining vs. streaming")
+    p.add_argument("--models", nargs="+", required=True, help="Paths to the ONNX wakeword models")
+    p.add_argument("--files", type=int, default=4, help="Number of random audio files to mine")
+    p.add_argument("--duration", type=float, default=10.0, help="Duration of each file (in minutes)")
+    p.add_argument("--threshold", type=float, default=0.5, help="Minimum score of a false positive")
+    p.add_argument("--ncpu", type=int, default=os.cpu_count(), help="Number of worker processes")
+    p.add_argument("--segment_duration", type=float, default=300, help="Duration of each scored segment (in seconds)")
+    p.set_defaults(func=benchmark_false_positive_mining)
+
+    p = subparsers.add_parser("feature-pipeline", help="Overlapped vs. sequential feature extraction")
+    p.add_argument("--clips", type=int, default=512, help="Number of 2 second clips")
+    p.add_argument("--batch_size", type=int, default=64, help="Number of clips per generator batch")
+    p.add_argument("--augmentation_ms", type=float, default=500, help="Simulated augmentation time per batch (in ms)")
+    p.add_argument("--augmentation_workers", type=int, default=1, help="Number of parallel generators")
+    p.add_argument("--embedding_workers", type=int, default=1, help="Number of embedding threads")
+    p.add_argument("--prefetch_batches", type=int, default=4, help="Maximum number of batches in each queue")
+    p.add_argument("--ncpu", type=int, default=1, help="ncpu argument of embed_clips")
+    p.set_defaults(func=benchmark_feature_pipeline)
+
+    p = subparsers.add_parser("embed-clips", help="Throughput of AudioFeatures.embed_clips on 2 second clips")
+    p.add_argument("--clips", type=int, default=512, help="Number of 2 second clips")
+    p.add_argument("--batch_size", type=int, default=64, help="batch_size argument of embed_clips")
+    p.add_argument("--ncpu", type=int, default=1, help="ncpu argument of embed_clips")
+    p.set_defaults(func=benchmark_embed_clips)
+
+    p = subparsers.add_parser("noise-suppression", help="Per-frame cost of the noise suppression stages")
+    p.add_argument("--frames", type=int, default=2000, help="Number of 80 ms frames to process")
+    p.set_defaults(func=benchmark_noise_suppression)
+
+    p = subparsers.add_parser("melspectrogram", help="Per-hop latency of the melspectrogram frontends")
+    p.add_argument("--frames", type=int, default=500, help="Number of 80 ms frames to process")
+    p.set_defaults(func=benchmark_melspectrogram)
+
+    p = subparsers.add_parser("startup", help="Time-to-first-prediction of a new Model")
+    p.add_argument("--models", nargs="+", required=True, help="Paths to the ONNX wakeword models")
+    p.add_argument("--instances", type=int, default=4, help="Number of Model instances to create in one process")
+    p.add_argument("--cache_dir", type=str, default=None,
+                   help="Directory for the optimized ONNX models (default: a new temporary directory)")
+    p.set_defaults(func=benchmark_startup)
+
+    p = subparsers.add_parser("autotune", help="Find and save the fastest inference parameters for this host")
+    p.add_argument("--models", nargs="*", default=[], help="Paths to the ONNX wakeword models used for streaming")
+    p.add_argument("--frames", type=int, default=200, help="Number of 80 ms frames to time streaming prediction")
+    p.add_argument("--clips", type=int, default=128, help="Number of 2 second clips to time batch embedding")
+    p.add_argument("--batch_sizes", nargs="+", type=int, default=[16, 32, 64, 128, 256],
+                   help="Batch sizes to benchmark for batch embedding")
+    p.add_argument("--output", type=str, default=None,
+                   help="Path of the saved profile (default: the profile loaded automatically by Model)")
+    p.set_defaults(func=benchmark_autotune)
+
+    p = subparsers.add_parser("quantization", help="INT8 quantized models compared to float32")
+    p.add_argument("--models", nargs="+", required=True, help="Paths to the float32 ONNX wakeword models")
+    p.add_argument("--positive_features", required=True,
+                   help="Features of positive clips (e.g., positive_features_test.npy), of shape (N, frames, 96)")
+    p.add_argument("--false_positive_features", required=True,
+                   help="Continuous false positive validation features, of shape (frames, 96)")
+    p.add_argument("--calibration_features", nargs="*", default=None,
+                   help="Feature files for static quantization (e.g., positive_features_train.npy "
+                        "negative_features_train.npy). Defaults to the evaluation features.")
+    p.add_argument("--calibration_audio", nargs="*", default=None,
+                   help="WAV files for static quantization of the feature models")
+    p.add_argument("--modes", nargs="+", default=["dynamic", "static"], help="Quantization modes to compare")
+    p.add_argument("--threshold", type=float, default=0.5, help="Score threshold for recall and false positives")
+    p.add_argument("--feature_models", action="store_true", help="Also quantize the melspectrogram and embedding models")
+    p.add_argument("--output_dir", type=str, default=None, help="Directory of the quantized models")
+    p.set_defaults(func=benchmark_quantization)
+
+    p = subparsers.add_parser("async-detect", help="Event loop lag and queue depth of the async Model.detect")
+    p.add_argument("--models", nargs="+", required=True, help="Paths to the ONNX wakeword models")
+    p.add_argument("--frames", type=int, default=500, help="Number of 80 ms frames to stream")
+    p.add_argument("--chunk_size", type=int, default=1280, help="Number of samples in each audio chunk")
+    p.add_argument("--speed", type=float, default=4.0, help="How many times faster than real time to send audio")
+    p.add_argument("--max_queue_frames", type=int, default=25, help="Maximum number of queued frames")
+    p.set_defaults(func=benchmark_async_detect)
+
+    p = subparsers.add_parser("websocket-load", help="Load test of the WebSocket detection endpoint of api.py")
+    p.add_argument("--url", type=str, default="ws://localhost:8000/wakewords/detect/hola-pepito",
+                   help="URL of the detection endpoint")
+    p.add_argument("--connections", nargs="+", type=int, default=[1, 2, 4, 8, 16, 32, 64],
+                   help="Numbers of concurrent connections to test")
+    p.add_argument("--duration", type=float, default=10.0, help="Duration of the audio streamed by each connection")
+    p.add_argument("--chunk_size", type=int, default=1280, help="Number of samples in each message")
+    p.add_argument("--max_latency_ms", type=float, default=200.0,
+                   help="The maximum p99 detection latency of a supported number of connections")
+    p.set_defaults(func=benchmark_websocket_load)
+
+    args = parser.parse_args()
+    args.func(args)
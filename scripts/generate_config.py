@@ -48,6 +48,9 @@ def generate_training_config_yaml(wakeword_dir, data_dir: str, wakeword: str, da
         "model_name": f"{wakeword}_v{data_version}_{CODE_VERSION}_{model_version}",
         "augmentation_batch_size": 128,
         "augmentation_rounds": 500,
+        "augmentation_workers": 1,
+        "embedding_workers": 1,
+        "feature_store": False,
         "rir_paths": [
             f"{data_dir}/train/mit_rirs"
         ],
@@ -0,0 +1,25 @@
+from openwakeword.utils import mine_false_positives
+import argparse
+import glob
+import os
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mine false-positive predictions from negative audio as hard negative features.")
+    parser.add_argument("--input_folder", type=str, required=True, help="Folder with 16-bit 16khz WAV files (searched recursively)")
+    parser.add_argument("--output_folder", type=str, required=True, help="Feature store folder to append the false positives to")
+    parser.add_argument("--models", type=str, nargs="+", required=True, help="Paths of the wakeword models")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Minimum score of a stored frame. default: 0.5")
+    parser.add_argument("--ncpu", type=int, default=os.cpu_count(), help="Number of worker processes. default: all CPUs")
+    parser.add_argument("--segment_duration", type=float, default=300, help="(in s) audio scored by a worker at a time. default: 300s")
+    parser.add_argument("--export", type=str, default=None, help="Also copy the whole feature store to this .npy file")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.input_folder, "**", "*.wav"), recursive=True))
+    summary = mine_false_positives(files, args.models, args.output_folder, threshold=args.threshold, ncpu=args.ncpu,
+                                   segment_duration=args.segment_duration)
+    print(f"Found {summary['n_hits']} false positives in {summary['hours']:.2f} hours of audio "
+          f"({summary['n_files']} files)")
+
+    if args.export:
+        from openwakeword.feature_store import FeatureStore
+        FeatureStore(args.output_folder).save_npy(args.export)
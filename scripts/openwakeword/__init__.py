@@ -64,8 +64,8 @@ def get_pretrained_model_paths(inference_framework="tflite"):
         return [MODELS[i]["model_path"].replace(".tflite", ".onnx") for i in MODELS.keys()]
 
 
-from openwakeword.model import Model
+from openwakeword.model import Model, MultiStreamModel
 from openwakeword.vad import VAD
 from openwakeword.custom_verifier_model import train_custom_verifier
 
-__all__ = ['Model', 'VAD', 'train_custom_verifier']
\ No newline at end of file
+__all__ = ['Model', 'MultiStreamModel', 'VAD', 'train_custom_verifier']
\ No newline at end of file
@@ -0,0 +1,226 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This file contains a host autotuner, which benchmarks ONNX Runtime session options and batch
+# parameters on the current machine and saves the fastest combination as a profile that is loaded
+# automatically by `openwakeword.Model` and `openwakeword.utils.AudioFeatures` (unless `autotune_profile=False`).
+
+# Imports
+import json
+import logging
+import os
+import platform
+import time
+from typing import List, Optional, Union
+
+import numpy as np
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "openwakeword", "autotune_profile.json")
+
+# Profiles loaded from disk, keyed by path and modification time
+_loaded_profiles: dict = {}
+
+
+def get_host_fingerprint():
+    """Gets a description of the current host, used to ignore profiles tuned on other machines or runtimes"""
+    import onnxruntime as ort
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "onnxruntime": ort.__version__
+    }
+
+
+def load_profile(path: Optional[str] = None):
+    """
+    Loads an autotune profile.
+
+    Args:
+        path (str): The path of the profile (default: `DEFAULT_PROFILE_PATH`)
+
+    Returns:
+        Optional[dict]: The profile, or None if the file doesn't exist or the profile was created
+                        on a different host
+    """
+    path = path or DEFAULT_PROFILE_PATH
+    if not os.path.exists(path):
+        return None
+
+    key = (path, os.path.getmtime(path))
+    if key not in _loaded_profiles:
+        with open(path, "r") as f:
+            profile = json.load(f)
+        if profile.get("host") != get_host_fingerprint():
+            logging.warning(f"The autotune profile '{path}' was created on a different host and will be ignored. "
+                            "Run the autotuner again to create a profile for this host.")
+            profile = None
+        _loaded_profiles[key] = profile
+
+    return _loaded_profiles[key]
+
+
+def resolve_profile(autotune_profile: Union[bool, str, dict, None]):
+    """
+    Gets the profile selected by the `autotune_profile` argument of `Model` and `AudioFeatures`.
+
+    Args:
+        autotune_profile (Union[bool, str, dict, None]): True to load the profile from the default path (if it
+                                                         exists), a path to load the profile from, a profile
+                                                         dictionary, or False/None to not use a profile
+
+    Returns:
+        dict: The profile (empty if no profile is used)
+    """
+    if isinstance(autotune_profile, dict):
+        return autotune_profile
+    elif isinstance(autotune_profile, str):
+        return load_profile(autotune_profile) or {}
+    elif autotune_profile:
+        return load_profile() or {}
+    return {}
+
+
+def save_profile(profile: dict, path: Optional[str] = None):
+    """Saves an autotune profile (by default to `DEFAULT_PROFILE_PATH`)"""
+    path = path or DEFAULT_PROFILE_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+
+def _get_thread_counts():
+    """Powers of 2 up to the number of CPUs, and the number of CPUs"""
+    n_cpus = os.cpu_count() or 1
+    return sorted(set([2**i for i in range(0, int(np.log2(n_cpus)) + 1)] + [n_cpus]))
+
+
+def _get_candidate_session_options():
+    """The ONNX Runtime session options to benchmark"""
+    candidates = []
+    for n_threads in _get_thread_counts():
+        for execution_mode, inter_op_num_threads in [("sequential", 1), ("parallel", 2)]:
+            if execution_mode == "parallel" and (os.cpu_count() or 1) < 2:
+                continue
+            for optimization_level in ["extended", "all"]:
+                candidates.append({
+                    "intra_op_num_threads": n_threads,
+                    "inter_op_num_threads": inter_op_num_threads,
+                    "execution_mode": execution_mode,
+                    "graph_optimization_level": optimization_level
+                })
+    return candidates
+
+
+def _time_streaming(session_options: dict, wakeword_models: List[str], n_frames: int):
+    """The seconds per 80 ms frame of streaming prediction with the given session options"""
+    import openwakeword
+    from openwakeword.utils import AudioFeatures
+
+    profile = {"streaming": {"session_options": session_options}}
+    if wakeword_models:
+        predictor = openwakeword.Model(wakeword_models=wakeword_models, inference_framework="onnx",
+                                       autotune_profile=profile)
+        predict = predictor.predict
+    else:
+        predictor = AudioFeatures(inference_framework="onnx", autotune_profile=profile)
+        predict = predictor.__call__
+
+    audio = (np.random.RandomState(0).randn(1280*(n_frames + 10))*2000).astype(np.int16)
+    for i in range(0, 1280*10, 1280):
+        predict(audio[i:i+1280])
+
+    start = time.perf_counter()
+    for i in range(1280*10, audio.shape[0], 1280):
+        predict(audio[i:i+1280])
+    elapsed = time.perf_counter() - start
+
+    predictor.close()
+    return elapsed/n_frames
+
+
+def _time_batch(session_options: dict, batch_size: int, ncpu: int, clips: np.ndarray):
+    """The seconds per clip of `AudioFeatures.embed_clips` with the given parameters"""
+    from openwakeword.utils import AudioFeatures
+
+    F = AudioFeatures(inference_framework="onnx", autotune_workload="batch",
+                      autotune_profile={"batch": {"session_options": session_options}})
+    F.embed_clips(clips[0:min(batch_size, clips.shape[0])], batch_size=batch_size, ncpu=ncpu)
+
+    start = time.perf_counter()
+    F.embed_clips(clips, batch_size=batch_size, ncpu=ncpu)
+    elapsed = time.perf_counter() - start
+
+    F.close()
+    return elapsed/clips.shape[0]
+
+
+def autotune(
+        wakeword_models: List[str] = [],
+        n_frames: int = 200,
+        n_clips: int = 128,
+        clip_duration: float = 2.0,
+        batch_sizes: List[int] = [16, 32, 64, 128, 256],
+        verbose: bool = True
+        ):
+    """
+    Benchmarks ONNX Runtime session options (intra/inter-op threads, execution mode, and graph optimization
+    level) for streaming prediction, and session options, batch size, and the number of CPUs for batch
+    embedding with `AudioFeatures.embed_clips`, on the current host.
+
+    Args:
+        wakeword_models (List[str]): Paths to ONNX wakeword models used when timing streaming prediction with
+                                     `Model.predict`. If empty, only the feature models are timed.
+        n_frames (int): The number of 80 ms frames used to time streaming prediction
+        n_clips (int): The number of clips used to time batch embedding
+        clip_duration (float): The duration of each clip (in seconds) used to time batch embedding
+        batch_sizes (List[int]): The batch sizes to benchmark for batch embedding
+        verbose (bool): Whether to log (at the INFO level) the time of each configuration
+
+    Returns:
+        dict: The profile with the fastest configurations, which can be saved with `save_profile`
+    """
+    # Streaming prediction
+    streaming_results = []
+    for session_options in _get_candidate_session_options():
+        seconds_per_frame = _time_streaming(session_options, wakeword_models, n_frames)
+        streaming_results.append((seconds_per_frame, session_options))
+        if verbose:
+            logging.info(f"streaming {session_options}: {seconds_per_frame*1e3:.3f} ms/frame")
+    streaming_time, streaming_options = min(streaming_results, key=lambda x: x[0])
+
+    # Batch embedding, using the fastest execution mode and optimization level from streaming prediction.
+    # The product of the session threads and ncpu is limited to the number of CPUs.
+    clips = (np.random.RandomState(0).randn(n_clips, int(16000*clip_duration))*2000).astype(np.int16)
+    batch_results = []
+    for n_threads in _get_thread_counts():
+        for ncpu in _get_thread_counts():
+            if n_threads*ncpu > (os.cpu_count() or 1):
+                continue
+            session_options = dict(streaming_options, intra_op_num_threads=n_threads)
+            for batch_size in batch_sizes:
+                seconds_per_clip = _time_batch(session_options, batch_size, ncpu, clips)
+                batch_results.append((seconds_per_clip, session_options, batch_size, ncpu))
+                if verbose:
+                    logging.info(f"batch {session_options}, batch_size={batch_size}, ncpu={ncpu}: "
+                                 f"{seconds_per_clip*1e3:.3f} ms/clip")
+    batch_time, batch_options, batch_size, ncpu = min(batch_results, key=lambda x: x[0])
+
+    return {
+        "host": get_host_fingerprint(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "streaming": {"session_options": streaming_options, "seconds_per_frame": streaming_time},
+        "batch": {"session_options": batch_options, "batch_size": batch_size, "ncpu": ncpu,
+                  "seconds_per_clip": batch_time}
+    }
@@ -26,6 +26,7 @@ from sklearn.preprocessing import FunctionTransformer, StandardScaler
 from tqdm import tqdm
 
 import openwakeword
+from openwakeword.verifier import LinearVerifier
 
 
 # Define functions to prepare data for speaker dependent verifier model
@@ -78,7 +79,7 @@ def get_reference_clip_features(
             if predictions[model_name] >= threshold:
                 features = oww_model.preprocessor.get_features(  # type: ignore[has-type]
                     oww_model.model_inputs[model_name]           # type: ignore[has-type]
-                )
+                ).copy()
                 positive_data[model_name].append(features)
 
     if len(positive_data[model_name]) == 0:
@@ -129,7 +130,9 @@ def train_custom_verifier(
                                         of the target wake word/phrase.
         negative_reference_clips (List[Union[str, os.PathLike]]): The path(s) to single-channel 16khz, 16-bit WAV files
                                         of miscellaneous speech not containing the target wake word/phrase.
-        output_path (str): The location to save the trained verifier model (as a Python pickle file (.pkl))
+        output_path (str): The location to save the trained verifier model (as a Python pickle file (.pkl)).
+                           A compact version of the verifier model that doesn't require scikit-learn is also
+                           saved next to it, with the same name and a .npz extension.
         model_name (str): The name or path of the trained openWakeWord model that the verifier model will be
                           based on. If only a name, it must be one of the pre-trained models included in the
                           openWakeWord release.
@@ -171,7 +174,8 @@ def train_custom_verifier(
         np.array([1]*positive_features.shape[0] + [0]*negative_features.shape[0])
     )
 
-    # Save logistic regression model to specified output location
+    # Save logistic regression model to specified output location, along with the compact verifier model
     print("Done!")
     with open(output_path, "wb") as f:
         pickle.dump(lr_model, f)
+    LinearVerifier.from_pipeline(lr_model).save(os.path.splitext(output_path)[0] + ".npz")
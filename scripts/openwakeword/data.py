@@ -28,7 +28,8 @@ import pronouncing
 import torch
 import audiomentations
 import torch_audiomentations
-from numpy.lib.format import open_memmap
+from openwakeword.feature_store import open_features
+from openwakeword.utils import truncate_npy
 from speechbrain.dataio.dataio import read_audio
 from speechbrain.processing.signal_processing import reverberate
 import torchaudio
@@ -571,7 +572,8 @@ def augment_clips(
             "RIR": 0.5
         },
         background_clip_paths: List[str] = [],
-        RIR_paths: List[str] = []
+        RIR_paths: List[str] = [],
+        start_batch: int = 0
         ):
     """
     Applies audio augmentations to the specified audio clips, returning a generator that applies
@@ -607,6 +609,8 @@ def augment_clips(
         background_clip_paths (List[str]) = The paths to background audio files to mix with the input files
         RIR_paths (List[str]) = The paths to room impulse response functions (RIRs) to convolve with the input files,
                                 producing a version of the input clip with different acoustic characteristics.
+        start_batch (int): The index of the first batch to augment, to resume from a batch of an earlier run
+                           (e.g., in `openwakeword.utils.compute_features_from_generator`)
 
     Returns:
         ndarray: A batch of augmented audio clips of size (batch_size, total_length)
@@ -667,7 +671,7 @@ def augment_clips(
         ])
 
     # Iterate through all clips and augment them
-    for i in range(0, len(clip_paths), batch_size):
+    for i in range(start_batch*batch_size, len(clip_paths), batch_size):
         batch = clip_paths[i:i+batch_size]
         augmented_clips = []
         for clip in batch:
@@ -732,7 +736,8 @@ def create_fixed_size_clip(x, n_samples, sr=16000, start=None, end_jitter=.200):
 # Load batches of data from mmaped numpy arrays
 class mmap_batch_generator:
     """
-    A generator class designed to dynamically build batches from mmaped numpy arrays.
+    A generator class designed to dynamically build batches from mmaped numpy arrays
+    (or feature stores, see `openwakeword.feature_store.FeatureStore`).
 
     The generator will return tuples of (data, labels) with a batch size determined
     by the `n_per_class` initialization argument. When a mmaped numpy array has been
@@ -750,8 +755,9 @@ class mmap_batch_generator:
         Initialize the generator object
 
         Args:
-            data_files (dict): A dictionary of labels (as keys) and on-disk numpy array paths (as values).
-                               Keys should be integer strings representing class labels.
+            data_files (dict): A dictionary of labels (as keys) and on-disk numpy array or feature store
+                               directory paths (as values). Keys should be integer strings representing
+                               class labels.
             label_files (dict): A dictionary where the keys are the class labels and the values are the per-example
                                 labels. The values must be the same shape as the correponding numpy data arrays
                                 from the `data_files` argument.
@@ -785,7 +791,7 @@ class mmap_batch_generator:
         self.label_transform_funcs = label_transform_funcs
 
         # Get array mmaps and store their shapes (but load files < 1 GB total size into memory)
-        self.data = {label: np.load(fl, mmap_mode='r') for label, fl in data_files.items()}
+        self.data = {label: open_features(fl) for label, fl in data_files.items()}
         self.labels = {label: np.load(fl) for label, fl in label_files.items()}
         self.data_counter = {label: 0 for label in data_files.keys()}
         self.original_shapes = {label: self.data[label].shape for label in self.data.keys()}
@@ -855,8 +861,8 @@ class mmap_batch_generator:
 # Function to remove empty rows from the end of a mmap array
 def trim_mmap(mmap_path):
     """
-    AA Trims blank rows from the end of a mmaped numpy array by creates new mmap array without the blank rows.
-    Note that a copy is created and disk usage will briefly double as the function runs.
+    Trims blank rows from the end of a mmaped numpy array in place, by finding the last row that isn't
+    all zeros and truncating the file after it (see `openwakeword.utils.truncate_npy`), without a copy.
 
     Args:
         mmap_path (str): The path to mmap array file to trim
@@ -864,32 +870,20 @@ def trim_mmap(mmap_path):
     Returns:
         None
     """
-    # Identify the last full row in the mmaped file
-    mmap_file1 = np.load(mmap_path, mmap_mode='r')
-    i = -1
-    while np.all(mmap_file1[i, :, :] == 0):
-        i -= 1
-
-    N_new = mmap_file1.shape[0] + i + 1
-
-    # Create new mmap_file and copy over data in batches
-    output_file2 = mmap_path.strip(".npy") + "2.npy"
-    mmap_file2 = open_memmap(output_file2, mode='w+', dtype=np.float32,
-                             shape=(N_new, mmap_file1.shape[1], mmap_file1.shape[2]))
-
-    for i in tqdm(range(0, mmap_file1.shape[0], 1024), total=mmap_file1.shape[0]//1024, desc="Trimming empty rows"):
-        if i + 1024 > N_new:
-            mmap_file2[i:N_new] = mmap_file1[i:N_new].copy()
-            mmap_file2.flush()
-        else:
-            mmap_file2[i:i+1024] = mmap_file1[i:i+1024].copy()
-            mmap_file2.flush()
-    print("YOLO")
-    # Remove old mmaped file
-    os.remove(mmap_path)
-
-    # Rename new mmap file to match original
-    os.rename(output_file2, mmap_path)
+    # Identify the last full row in the mmaped file, checking blocks of rows from the end
+    mmap_file = np.load(mmap_path, mmap_mode='r')
+    n_rows = mmap_file.shape[0]
+    block_size = 1024
+    while n_rows > 0:
+        block_start = max(0, n_rows - block_size)
+        nonzero_rows = np.flatnonzero(mmap_file[block_start:n_rows].reshape(n_rows - block_start, -1).any(axis=1))
+        if nonzero_rows.shape[0] > 0:
+            n_rows = block_start + nonzero_rows[-1] + 1
+            break
+        n_rows = block_start
+    del mmap_file
+
+    truncate_npy(mmap_path, n_rows)
 
 
 # Generate words that sound similar ("adversarial") to the input phrase using phoneme overlap
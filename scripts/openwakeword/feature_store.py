@@ -0,0 +1,469 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This file contains an on-disk store of audio features made of fixed-size .npy shards and a JSON manifest,
+# which can be appended to (by several processes at once) and read by row like a single array. It is used
+# for the features computed by `openwakeword.utils.compute_features_from_generator` and the false positives
+# mined by `openwakeword.utils.mine_false_positives`, and can be read anywhere that .npy feature files are
+# (see `open_features`).
+
+# Imports
+import contextlib
+import json
+import os
+from typing import List, Optional, Union
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+try:
+    import fcntl
+except ImportError:  # e.g., on Windows, where only one process at a time can append to a store
+    fcntl = None
+
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".lock"
+
+# The metadata of each row: the index of the source (in the "sources" of its shard), the sample offset
+# of the row in the source, the index of the label (in the "labels" of its shard), and the score
+METADATA_DTYPE = np.dtype([("source", "<i4"), ("offset", "<i8"), ("label", "<i4"), ("score", "<f4")])
+
+
+def is_feature_store(path: str):
+    """Checks whether a path is a feature store directory"""
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def open_features(path: str):
+    """
+    Opens a feature store or a .npy file of features for reading, without loading the features into memory.
+
+    Args:
+        path (str): The path of the feature store directory or .npy file
+
+    Returns:
+        Union[FeatureStore, ndarray]: An object with a `shape` that can be indexed by row (a memory-mapped
+                                      array for .npy files)
+    """
+    if is_feature_store(path):
+        return FeatureStore(path)
+    return np.load(path, mmap_mode='r')
+
+
+def load_features(path: str):
+    """Loads all of the features of a feature store or a .npy file into memory"""
+    if is_feature_store(path):
+        return FeatureStore(path)[:]
+    return np.load(path)
+
+
+class FeatureStore():
+    """
+    A directory of audio features with one example per row, stored in .npy shards of `shard_size` rows
+    (with the metadata of each row in a second .npy file per shard) and a manifest with the dtype and shape
+    of the rows and, for each shard, the number of rows and the names of the sources and labels of its rows.
+
+    Each object appending to a store writes to shards of its own, so several processes can append to a
+    store at the same time (the manifest is updated under a file lock). Rows are only visible to readers
+    once the manifest has been written by `flush` (or `close`), so a store that was not closed (e.g., after
+    a crash) contains the rows of the last flush. Readers see the rows that existed when the store was
+    opened, until `refresh` is called.
+    """
+    def __init__(self, path: str, mode: str = "r", row_shape: Optional[tuple] = None, dtype: str = "float32",
+                 shard_size: int = 4096):
+        """
+        Initialize the FeatureStore object.
+
+        Args:
+            path (str): The directory of the store
+            mode (str): "r" to read an existing store, "a" to append to a store (creating it if needed),
+                        or "w" to create a new store (deleting the rows of an existing store)
+            row_shape (tuple): The shape of each row, e.g. (16, 96) for 16 frames of audio features. Required
+                               to create a store, and must match the existing rows when appending.
+            dtype (str): The dtype of the rows of a new store
+            shard_size (int): The number of rows of each shard of a new store
+        """
+        if mode not in ("r", "a", "w"):
+            raise ValueError(f"Unknown mode '{mode}', must be 'r', 'a', or 'w'!")
+
+        self.path = path
+        self.mode = mode
+        self._shards: dict = {}  # shard name -> (rows, metadata) memmaps
+        self._own_shards: dict = {}  # shard name -> manifest entry, for the shards written by this object
+        self._flushed_shards: dict = {}  # shard name -> manifest entry of an own shard as of the last flush
+        self._current_shard: Optional[dict] = None  # the manifest entry of the shard that rows are appended to
+
+        if mode == "r":
+            if not is_feature_store(path):
+                raise ValueError(f"'{path}' is not a feature store (it has no {MANIFEST_NAME} file)!")
+            self._read_manifest()
+        else:
+            os.makedirs(path, exist_ok=True)
+            with self._lock():
+                if mode == "w" and is_feature_store(path):
+                    if row_shape is None:
+                        raise ValueError("The row shape is required to create a new feature store!")
+                    self._read_manifest()
+                    self._delete_shards()
+                if is_feature_store(path):
+                    self._read_manifest()
+                elif row_shape is None:
+                    raise ValueError("The row shape is required to create a new feature store!")
+                else:
+                    self.manifest = {
+                        "version": 2,
+                        "dtype": np.dtype(dtype).str,
+                        "row_shape": list(row_shape),
+                        "shard_size": shard_size,
+                        "shards": []
+                    }
+                    self._write_manifest()
+
+        if row_shape is not None and tuple(row_shape) != self.row_shape:
+            raise ValueError(f"The rows of the store '{path}' have shape {self.row_shape}, not {tuple(row_shape)}!")
+        self._update_visible_shards()
+
+    @property
+    def row_shape(self):
+        return tuple(self.manifest["row_shape"])
+
+    @property
+    def dtype(self):
+        return np.dtype(self.manifest["dtype"])
+
+    @property
+    def shape(self):
+        return (len(self),) + self.row_shape
+
+    @property
+    def ndim(self):
+        return len(self.row_shape) + 1
+
+    @property
+    def sources(self):
+        """The names of the sources of the rows (e.g., audio files), in order of appearance"""
+        return list(self._source_index.keys())
+
+    @property
+    def labels(self):
+        """The names of the labels of the rows, in order of appearance"""
+        return list(self._label_index.keys())
+
+    def __len__(self):
+        return int(self._row_offsets[-1])
+
+    @contextlib.contextmanager
+    def _lock(self):
+        """Holds an exclusive lock on the store while updating the manifest"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, LOCK_NAME), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_manifest(self):
+        """Reads the manifest from disk, keeping the (possibly unflushed) entries of the shards of this object"""
+        with open(os.path.join(self.path, MANIFEST_NAME), "r") as f:
+            manifest = json.load(f)
+
+        # Version 1 manifests have the sources and labels of all shards in one list
+        if manifest.get("version", 1) == 1:
+            for shard in manifest["shards"]:
+                shard["sources"] = list(manifest["sources"])
+                shard["labels"] = list(manifest["labels"])
+            del manifest["sources"], manifest["labels"]
+            manifest["version"] = 2
+
+        manifest["shards"] = [self._own_shards.get(shard["name"], shard) for shard in manifest["shards"]]
+        self.manifest = manifest
+
+    def _write_manifest(self):
+        """
+        Replaces the manifest atomically, so that readers never see a partially written file. The shards of
+        this object are written as of the last flush, so that readers never see rows that aren't on disk yet.
+        """
+        manifest = dict(self.manifest, shards=[self._flushed_shards.get(shard["name"], shard)
+                                               for shard in self.manifest["shards"]])
+        manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        temporary_path = f"{manifest_path}.{os.getpid()}.{id(self)}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temporary_path, manifest_path)
+
+    def _snapshot_own_shards(self):
+        """Copies the manifest entries of the shards of this object, once their rows are on disk"""
+        self._flushed_shards = {name: dict(shard, sources=list(shard["sources"]), labels=list(shard["labels"]))
+                                for name, shard in self._own_shards.items()}
+
+    def _delete_shards(self):
+        """Deletes the shard files and the manifest of the store"""
+        for shard in self.manifest["shards"]:
+            for file_name in [f"{shard['name']}.npy", f"{shard['name']}_metadata.npy"]:
+                if os.path.exists(os.path.join(self.path, file_name)):
+                    os.remove(os.path.join(self.path, file_name))
+        os.remove(os.path.join(self.path, MANIFEST_NAME))
+
+    def _update_visible_shards(self):
+        """Updates the shards (and their rows) that are read, from the current manifest"""
+        self._visible_shards = [(shard["name"], shard["n_rows"], list(shard["sources"]), list(shard["labels"]))
+                                for shard in self.manifest["shards"] if shard["n_rows"] > 0]
+        self._row_offsets = np.cumsum([0] + [i[1] for i in self._visible_shards])
+
+        # Map the source and label indices of each shard to the indices of the whole store
+        self._source_index: dict = {}
+        self._label_index: dict = {}
+        self._name_maps = []
+        for _, _, sources, labels in self._visible_shards:
+            source_map = [self._source_index.setdefault(i, len(self._source_index)) for i in sources]
+            label_map = [self._label_index.setdefault(i, len(self._label_index)) for i in labels]
+            self._name_maps.append((np.array(source_map + [-1], dtype=np.int32),
+                                    np.array(label_map + [-1], dtype=np.int32)))
+
+    def refresh(self):
+        """Reads the manifest again, to see the rows flushed by other writers since the store was opened"""
+        if self.mode == "r":
+            self._read_manifest()
+        else:
+            with self._lock():
+                self._read_manifest()
+        self._update_visible_shards()
+
+    def _open_shard(self, name: str):
+        """Gets the memmaps of the rows and metadata of a shard, creating the shard files if needed"""
+        if name not in self._shards:
+            rows_path = os.path.join(self.path, f"{name}.npy")
+            metadata_path = os.path.join(self.path, f"{name}_metadata.npy")
+            if os.path.exists(rows_path):
+                mmap_mode = "r+" if name in self._own_shards else "r"
+                self._shards[name] = (np.load(rows_path, mmap_mode=mmap_mode),
+                                      np.load(metadata_path, mmap_mode=mmap_mode))
+            else:
+                # Shards are created at their full size, but the unwritten part of the files doesn't use disk space
+                shard_size = self.manifest["shard_size"]
+                self._shards[name] = (
+                    open_memmap(rows_path, mode="w+", dtype=self.dtype, shape=(shard_size,) + self.row_shape),
+                    open_memmap(metadata_path, mode="w+", dtype=METADATA_DTYPE, shape=(shard_size,))
+                )
+        return self._shards[name]
+
+    def _get_writable_shard(self):
+        """Gets the manifest entry of the shard to append to, adding a new shard to the store if needed"""
+        if self._current_shard is None or self._current_shard["n_rows"] >= self.manifest["shard_size"]:
+            with self._lock():
+                self._read_manifest()
+                shard = {"name": f"shard_{len(self.manifest['shards']):05d}", "n_rows": 0, "sources": [],
+                         "labels": []}
+                self.manifest["shards"].append(shard)
+                self._own_shards[shard["name"]] = shard
+                self._flushed_shards[shard["name"]] = dict(shard, sources=[], labels=[])
+                self._write_manifest()
+            self._current_shard = shard
+        return self._current_shard
+
+    @staticmethod
+    def _get_name_index(name: Optional[str], names: List[str]):
+        if name is None:
+            return -1
+        if name not in names:
+            names.append(name)
+        return names.index(name)
+
+    def append(self, rows: np.ndarray, source: Optional[str] = None, offsets: Optional[np.ndarray] = None,
+               label: Optional[str] = None, scores: Optional[np.ndarray] = None):
+        """
+        Appends rows to the store. The rows are visible to readers after the next `flush`.
+
+        Args:
+            rows (ndarray): The rows to append, of shape (n_rows,) + `row_shape`
+            source (str): The source of the rows (e.g., the path of an audio file)
+            offsets (ndarray): The sample offset of each row in the source
+            label (str): The label of the rows (e.g., the wakeword model that predicted them)
+            scores (ndarray): The score of each row
+
+        Returns:
+            None
+        """
+        if self.mode == "r":
+            raise ValueError("The feature store was opened for reading only!")
+        if rows.shape[1:] != self.row_shape:
+            raise ValueError(f"The rows of the store have shape {self.row_shape}, not {rows.shape[1:]}!")
+
+        metadata = np.zeros(rows.shape[0], dtype=METADATA_DTYPE)
+        metadata["offset"] = -1 if offsets is None else offsets
+        metadata["score"] = np.nan if scores is None else scores
+
+        shard_size = self.manifest["shard_size"]
+        start = 0
+        while start < rows.shape[0]:
+            shard = self._get_writable_shard()
+            shard_rows, shard_metadata = self._open_shard(shard["name"])
+            n_shard_rows = shard["n_rows"]
+            n = min(shard_size - n_shard_rows, rows.shape[0] - start)
+            metadata["source"][start:start + n] = self._get_name_index(source, shard["sources"])
+            metadata["label"][start:start + n] = self._get_name_index(label, shard["labels"])
+            shard_rows[n_shard_rows:n_shard_rows + n] = rows[start:start + n]
+            shard_metadata[n_shard_rows:n_shard_rows + n] = metadata[start:start + n]
+            shard["n_rows"] += n
+            start += n
+
+    def flush(self):
+        """Writes the appended rows to disk and then adds them to the manifest"""
+        if self.mode == "r":
+            return
+        for name in self._own_shards.keys():
+            if name in self._shards:
+                for memmap in self._shards[name]:
+                    memmap.flush()
+
+        with self._lock():
+            self._read_manifest()
+            self._snapshot_own_shards()
+            self._write_manifest()
+        self._update_visible_shards()
+
+    def truncate(self, n_rows: int):
+        """
+        Removes the rows of the store after the first `n_rows` rows (e.g., rows flushed after a checkpoint
+        of the writer), while no other object is appending to the store. The rows are removed from the
+        manifest, the files of the shards left without rows are deleted, and the rows appended next fill
+        the rest of the last shard that is kept.
+
+        Args:
+            n_rows (int): The number of rows to keep
+
+        Returns:
+            None
+        """
+        if self.mode == "r":
+            raise ValueError("The feature store was opened for reading only!")
+
+        self.flush()
+        with self._lock():
+            self._read_manifest()
+            n_remaining = n_rows
+            for shard in self.manifest["shards"]:
+                shard["n_rows"] = min(shard["n_rows"], n_remaining)
+                n_remaining -= shard["n_rows"]
+
+            # Delete the shards after the last row, and append to the rest of the last shard
+            shards = self.manifest["shards"]
+            while shards and shards[-1]["n_rows"] == 0:
+                self._forget_shard(shards[-1]["name"])
+                for file_name in [f"{shards[-1]['name']}.npy", f"{shards[-1]['name']}_metadata.npy"]:
+                    if os.path.exists(os.path.join(self.path, file_name)):
+                        os.remove(os.path.join(self.path, file_name))
+                shards.pop()
+            self._current_shard = None
+            if shards and shards[-1]["n_rows"] < self.manifest["shard_size"]:
+                self._forget_shard(shards[-1]["name"])  # to reopen it for writing
+                self._own_shards[shards[-1]["name"]] = shards[-1]
+                self._current_shard = shards[-1]
+            self._snapshot_own_shards()
+            self._write_manifest()
+        self._update_visible_shards()
+
+    def _forget_shard(self, name: str):
+        """Closes the files of a shard, and stops tracking it as a shard of this object"""
+        self._shards.pop(name, None)
+        self._own_shards.pop(name, None)
+        self._flushed_shards.pop(name, None)
+        if self._current_shard is not None and self._current_shard["name"] == name:
+            self._current_shard = None
+
+    def close(self):
+        """Flushes the store (when appending) and closes the shard files"""
+        self.flush()
+        self._shards = {}
+        self._current_shard = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _read(self, ndx: Union[int, slice, np.ndarray], metadata: bool = False):
+        """Reads rows (or their metadata) by index"""
+        n_rows = len(self)
+        row_shape = () if metadata else self.row_shape
+        dtype = METADATA_DTYPE if metadata else self.dtype
+        scalar = False
+        if isinstance(ndx, slice):
+            ndx = np.arange(*ndx.indices(n_rows))
+        elif np.isscalar(ndx):
+            ndx, scalar = np.array([ndx], dtype=np.int64), True
+        ndx = np.asarray(ndx, dtype=np.int64)
+        ndx = np.where(ndx < 0, ndx + n_rows, ndx)
+        if ndx.size and (ndx.min() < 0 or ndx.max() >= n_rows):
+            raise IndexError(f"Row index out of bounds for a feature store with {n_rows} rows")
+
+        output = np.empty(ndx.shape + row_shape, dtype=dtype)
+        shard_ndcs = np.searchsorted(self._row_offsets, ndx, side="right") - 1
+        for shard_ndx in np.unique(shard_ndcs):
+            mask = shard_ndcs == shard_ndx
+            local_ndcs = ndx[mask] - self._row_offsets[shard_ndx]
+            shard = self._open_shard(self._visible_shards[shard_ndx][0])
+
+            # Read contiguous indices as a slice
+            if local_ndcs[-1] - local_ndcs[0] + 1 == local_ndcs.shape[0] and np.all(np.diff(local_ndcs) == 1):
+                values = shard[int(metadata)][local_ndcs[0]:local_ndcs[-1] + 1]
+            else:
+                values = shard[int(metadata)][local_ndcs]
+
+            if metadata:
+                values = values.copy()
+                source_map, label_map = self._name_maps[shard_ndx]
+                values["source"] = source_map[values["source"]]
+                values["label"] = label_map[values["label"]]
+            output[mask] = values
+
+        return output[0] if scalar else output
+
+    def __getitem__(self, ndx: Union[int, slice, np.ndarray, tuple]):
+        """Gets rows by index, slice, or an array of indices (optionally followed by indices within the rows)"""
+        if isinstance(ndx, tuple):
+            return self._read(ndx[0])[(slice(None),)*(not isinstance(ndx[0], (int, np.integer))) + ndx[1:]]
+        return self._read(ndx)
+
+    def get_metadata(self, ndx: Union[int, slice, np.ndarray] = slice(None)):
+        """
+        Gets the metadata of rows by index, slice, or an array of indices.
+
+        Returns:
+            ndarray: A structured array with the "source" and "label" indices (into `sources` and `labels`,
+                     or -1 if not known), sample "offset" (or -1), and "score" (or NaN) of each row
+        """
+        return self._read(ndx, metadata=True)
+
+    def save_npy(self, output_file: str, batch_size: int = 4096):
+        """
+        Copies all of the rows of the store to a single .npy file, like the feature files created by
+        `openwakeword.utils.compute_features_from_generator`.
+
+        Args:
+            output_file (str): The path of the .npy file
+            batch_size (int): The number of rows to copy at a time
+
+        Returns:
+            None
+        """
+        fp = open_memmap(output_file, mode="w+", dtype=self.dtype, shape=self.shape)
+        for i in range(0, len(self), batch_size):
+            fp[i:i + batch_size] = self[i:i + batch_size]
+        fp.flush()
+        del fp
@@ -0,0 +1,171 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Imports
+import bisect
+import json
+import numpy as np
+from typing import Dict
+
+
+class LatencyHistogram():
+    """
+    A fixed-size histogram of latencies (in nanoseconds) with logarithmically spaced buckets,
+    so that recording a value is a single bisection and memory use doesn't grow over time.
+    Percentiles are estimated from the bucket bounds, with a relative error of about 9%.
+    """
+    def __init__(self, min_ns: int = 1_000, max_ns: int = 100_000_000_000, buckets_per_octave: int = 8):
+        """
+        Initialize the LatencyHistogram object.
+
+        Args:
+            min_ns (int): The upper bound of the smallest bucket (in nanoseconds)
+            max_ns (int): The upper bound of the largest bucket (in nanoseconds). Larger values
+                          are counted in an overflow bucket.
+            buckets_per_octave (int): The number of buckets for each doubling of the latency
+        """
+        n_buckets = int(np.ceil(np.log2(max_ns/min_ns)*buckets_per_octave)) + 1
+        self.bounds = [int(min_ns*2**(i/buckets_per_octave)) for i in range(n_buckets)]
+        self.counts = [0]*(n_buckets + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, value_ns: int):
+        """Adds a latency value (in nanoseconds) to the histogram"""
+        self.counts[bisect.bisect_left(self.bounds, value_ns)] += 1
+        self.count += 1
+        self.total_ns += value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+
+    def percentile(self, q: float):
+        """Estimates the q-th percentile (0-100) of the recorded latencies, in nanoseconds"""
+        if self.count == 0:
+            return 0.0
+        target = q/100*self.count
+        cumulative = 0
+        for ndx, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and count > 0:
+                return float(min(self.bounds[ndx], self.max_ns) if ndx < len(self.bounds) else self.max_ns)
+        return float(self.max_ns)
+
+    def reset(self):
+        """Removes all recorded values"""
+        self.counts = [0]*len(self.counts)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+
+class LatencyRecorder():
+    """
+    Collects per-stage latency histograms (e.g., melspectrogram, embedding, each model) and the
+    duration of the processed audio, and summarizes them as percentiles and a real-time factor.
+    Can be shared by `openwakeword.Model` and `openwakeword.utils.AudioFeatures` objects with
+    their `enable_instrumentation` methods.
+    """
+    def __init__(self, sr: int = 16000):
+        """
+        Initialize the LatencyRecorder object.
+
+        Args:
+            sr (int): The sample rate of the audio (default: 16000 khz)
+        """
+        self.sr = sr
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.audio_samples = 0
+
+    def record(self, stage: str, value_ns: int):
+        """Adds a latency value (in nanoseconds) for the given stage"""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.record(value_ns)
+
+    def add_audio(self, n_samples: int):
+        """Adds to the amount of processed audio (in samples), used for the real-time factor"""
+        self.audio_samples += n_samples
+
+    def reset(self):
+        """Removes all recorded values"""
+        self.histograms = {}
+        self.audio_samples = 0
+
+    def real_time_factor(self, stage: str = "predict"):
+        """The total time spent in a stage divided by the duration of the processed audio"""
+        if stage not in self.histograms or self.audio_samples == 0:
+            return 0.0
+        return self.histograms[stage].total_ns/1e9/(self.audio_samples/self.sr)
+
+    def summary(self):
+        """
+        Summarizes the recorded latencies.
+
+        Returns:
+            dict: A dictionary with the count, mean, p50, p95, p99, and max latencies (in milliseconds)
+                  of each stage, and the real-time factor of the full `predict` call
+        """
+        stages = {}
+        for stage, histogram in self.histograms.items():
+            stages[stage] = {
+                "count": histogram.count,
+                "mean_ms": histogram.total_ns/max(histogram.count, 1)/1e6,
+                "p50_ms": histogram.percentile(50)/1e6,
+                "p95_ms": histogram.percentile(95)/1e6,
+                "p99_ms": histogram.percentile(99)/1e6,
+                "max_ms": histogram.max_ns/1e6
+            }
+
+        return {
+            "stages": stages,
+            "audio_seconds": self.audio_samples/self.sr,
+            "real_time_factor": self.real_time_factor()
+        }
+
+    def to_json(self, **kwargs):
+        """Exports the summary of the recorded latencies as a JSON string"""
+        return json.dumps(self.summary(), **kwargs)
+
+    def to_prometheus(self, prefix: str = "openwakeword"):
+        """
+        Exports the recorded latencies in the Prometheus text exposition format, as a summary
+        metric with p50/p95/p99 quantiles per stage and a gauge for the real-time factor.
+
+        Args:
+            prefix (str): The prefix of the metric names
+
+        Returns:
+            str: The metrics in the Prometheus text format
+        """
+        name = f"{prefix}_stage_latency_seconds"
+        lines = [f"# HELP {name} Latency of each openWakeWord processing stage.",
+                 f"# TYPE {name} summary"]
+        for stage, histogram in self.histograms.items():
+            for q in (50, 95, 99):
+                lines.append(f'{name}{{stage="{stage}",quantile="{q/100}"}} {histogram.percentile(q)/1e9:.9f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total_ns/1e9:.9f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+        lines.extend([
+            f"# HELP {prefix}_real_time_factor Processing time divided by the duration of the processed audio.",
+            f"# TYPE {prefix}_real_time_factor gauge",
+            f"{prefix}_real_time_factor {self.real_time_factor():.6f}",
+            f"# HELP {prefix}_audio_seconds_total Duration of the processed audio.",
+            f"# TYPE {prefix}_audio_seconds_total counter",
+            f"{prefix}_audio_seconds_total {self.audio_samples/self.sr:.3f}"
+        ])
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,149 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This file contains a NumPy implementation of the openWakeWord melspectrogram model, which can be used
+# instead of the ONNX/tflite model to compute melspectrograms (see `AudioFeatures(melspectrogram_frontend="numpy")`).
+
+# Imports
+import os
+import pathlib
+from typing import Optional
+
+import numpy as np
+
+try:
+    from scipy import fft  # lower per-call overhead than numpy.fft for small transforms
+except ImportError:
+    from numpy import fft
+
+DEFAULT_MELSPECTROGRAM_MODEL_PATH = os.path.join(pathlib.Path(__file__).parent.resolve(), "resources", "models",
+                                                 "melspectrogram.onnx")
+
+# Parameters loaded from the melspectrogram models, keyed by path and modification time
+_loaded_parameters: dict = {}
+
+
+def load_melspectrogram_parameters(model_path: str = DEFAULT_MELSPECTROGRAM_MODEL_PATH):
+    """
+    Loads the STFT window and mel filterbank of a (float32) ONNX melspectrogram model.
+
+    Args:
+        model_path (str): The path of the ONNX melspectrogram model
+
+    Returns:
+        tuple: The window (of shape (512,)) and the mel filterbank (of shape (257, 32))
+    """
+    key = (model_path, os.path.getmtime(model_path))
+    if key not in _loaded_parameters:
+        import onnx
+        from onnx import numpy_helper
+
+        initializers = {i.name: numpy_helper.to_array(i) for i in onnx.load(model_path).graph.initializer}
+        if "0.stft.conv_real.weight" not in initializers or "1.melW" not in initializers:
+            raise ValueError(f"The model '{model_path}' is not a float32 openWakeWord melspectrogram model!")
+
+        # The first row of the real DFT kernels (the DC component) is the window itself
+        window = initializers["0.stft.conv_real.weight"][0, 0].astype(np.float32)
+        mel_filterbank = initializers["1.melW"].astype(np.float32)
+        _loaded_parameters[key] = (window, mel_filterbank)
+
+    return _loaded_parameters[key]
+
+
+class NumpyMelSpectrogram():
+    """
+    Computes the same log-mel spectrogram as the openWakeWord melspectrogram model: an STFT with 512 sample
+    frames (a 400 sample Hann window, centered in the frame) and a 160 sample hop without padding, the power
+    spectrum, the model's 32 band mel filterbank, and conversion to decibels with a dynamic range of 80 dB.
+
+    The model limits the dynamic range relative to the maximum of its entire input, so its output for a frame
+    depends on how the audio is split into calls (and on the other examples of a batch). Here the range is
+    limited for each group of `top_db_frames` frames, counted back from the end of the input, instead. With
+    the default of 8 frames (one 80 ms streaming hop), the output of each hop is the same as that of the model,
+    and the results of streaming and of whole clips (of a whole number of hops) are identical.
+
+    Only the samples under the non-zero part of the window are read, so the cost per hop is a few small FFTs.
+    """
+    def __init__(self, model_path: str = DEFAULT_MELSPECTROGRAM_MODEL_PATH, top_db: Optional[float] = 80.0,
+                 top_db_frames: int = 8):
+        """
+        Initialize the NumpyMelSpectrogram object.
+
+        Args:
+            model_path (str): The path of the ONNX melspectrogram model to load the window and filterbank from
+            top_db (float): The dynamic range (in dB) below the maximum of each group of frames. If None,
+                            the range isn't limited.
+            top_db_frames (int): The number of frames in each group used to limit the dynamic range
+        """
+        window, self.mel_filterbank = load_melspectrogram_parameters(model_path)
+        nonzero = np.nonzero(window)[0]
+        self.window_offset = int(nonzero[0])
+        self.window = window[nonzero[0]:nonzero[-1] + 1]
+        self.frame_size = window.shape[0]
+        self.hop_size = 160
+        self.top_db = top_db
+        self.top_db_frames = top_db_frames
+
+    def __call__(self, x: np.ndarray):
+        """
+        Computes the log-mel spectrogram of a batch of audio, with the same output shape as the model.
+
+        Args:
+            x (ndarray): The audio, of shape (batch, samples)
+
+        Returns:
+            list: A list with an array of shape (batch, 1, frames, 32), like the outputs of an ONNX session
+        """
+        return [self.melspectrogram(x)[:, None]]
+
+    def melspectrogram(self, x: np.ndarray):
+        """
+        Computes the log-mel spectrogram of a batch of audio.
+
+        Args:
+            x (ndarray): The audio, of shape (batch, samples)
+
+        Returns:
+            ndarray: The log-mel spectrogram (in dB), of shape (batch, frames, 32)
+        """
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        n_frames = (x.shape[1] - self.frame_size)//self.hop_size + 1
+        if n_frames < 1:
+            return np.zeros((x.shape[0], 0, self.mel_filterbank.shape[1]), dtype=np.float32)
+
+        # Frames are views of the input, and shifting the window within the frame doesn't change the power spectrum
+        frames = np.lib.stride_tricks.as_strided(
+            x[:, self.window_offset:], (x.shape[0], n_frames, self.window.shape[0]),
+            (x.strides[0], self.hop_size*x.strides[1], x.strides[1]), writeable=False
+        )
+        spectrum = fft.rfft(frames*self.window, n=self.frame_size, axis=2)
+        power = spectrum.real**2
+        power += spectrum.imag**2
+        melspec = power.astype(np.float32) @ self.mel_filterbank
+
+        np.maximum(melspec, 1e-10, out=melspec)
+        np.log10(melspec, out=melspec)
+        melspec *= 10
+
+        # Limit the dynamic range of each group of frames
+        if self.top_db is not None and n_frames <= self.top_db_frames:
+            np.maximum(melspec, melspec.max(axis=(1, 2), keepdims=True) - self.top_db, out=melspec)
+        elif self.top_db is not None:
+            first_group_size = n_frames % self.top_db_frames or self.top_db_frames
+            group_starts = np.concatenate(([0], np.arange(first_group_size, n_frames, self.top_db_frames)))
+            floor = np.maximum.reduceat(melspec.max(axis=2), group_starts, axis=1) - self.top_db
+            floor = np.repeat(floor, np.diff(group_starts, append=n_frames), axis=1)
+            np.maximum(melspec, floor[:, :, None], out=melspec)
+
+        return melspec
@@ -15,17 +15,49 @@
 # Imports
 import numpy as np
 import openwakeword
-from openwakeword.utils import AudioFeatures, re_arg
+from openwakeword.utils import AudioFeatures, RingBuffer, re_arg, get_batchable_onnx_model, fuse_onnx_models
+from openwakeword.instrumentation import LatencyRecorder
+from openwakeword.verifier import LinearVerifier
+from openwakeword.sessions import session_registry
+from openwakeword.autotune import resolve_profile
+from openwakeword.quantization import get_quantized_model_path, FEATURE_MODELS_DIR
+from openwakeword.noise_suppression import NoiseSuppressor, SpeexNoiseSuppressor, SpectralSubtractionNoiseSuppressor
 
 import wave
 import os
 import logging
 import functools
 import pickle
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from collections import deque, defaultdict
-from functools import partial
 import time
-from typing import List, Union, DefaultDict, Dict
+import weakref
+from typing import List, Union, Dict, Optional, AsyncIterable
+
+
+class _DetectEvents():
+    """
+    The async iterator of detection events returned by `Model.detect`. It can also be closed explicitly with
+    `aclose`, or used as an async context manager that closes it on exit.
+    """
+    def __init__(self):
+        self._events = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._events.__anext__()
+
+    async def aclose(self):
+        await self._events.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
 
 
 # Define main model class
@@ -40,10 +72,18 @@ class Model():
             wakeword_models: List[str] = [],
             class_mapping_dicts: List[dict] = [],
             enable_speex_noise_suppression: bool = False,
+            noise_suppression: Optional[str] = None,
             vad_threshold: float = 0,
             custom_verifier_models: dict = {},
             custom_verifier_threshold: float = 0.1,
             inference_framework: str = "tflite",
+            fuse_models: bool = False,
+            energy_threshold: float = 0,
+            vad_gating: bool = False,
+            gate_skip_embeddings: bool = False,
+            onnx_cache_dir: Optional[str] = None,
+            autotune_profile: Union[bool, str, dict, None] = True,
+            precision: str = "float32",
             **kwargs
             ):
         """Initialize the openWakeWord model object.
@@ -60,7 +100,10 @@ class Model():
                                                    model performance when reasonably stationary background noise
                                                    is present in the environment where openWakeWord will be used.
                                                    It is very lightweight, so enabling it doesn't significantly
-                                                   impact efficiency.
+                                                   impact efficiency. Equivalent to `noise_suppression="speex"`.
+            noise_suppression (str): The noise suppression applied to all incoming audio, either "speex" (requires
+                                     the `speexdsp_ns` package) or "spectral_subtraction" (a pure NumPy alternative,
+                                     which delays the audio by 10 ms). The default (None) disables noise suppression.
             vad_threshold (float): Whether to use a voice activity detection model (VAD) from Silero
                                    (https://github.com/snakers4/silero-vad) to filter predictions.
                                    For every input audio frame, a VAD score is obtained and only those model predictions
@@ -69,7 +112,10 @@ class Model():
             custom_verifier_models (dict): A dictionary of paths to custom verifier models, where
                                            the keys are the model names (corresponding to the openwakeword.MODELS
                                            attribute) and the values are the filepaths of the
-                                           custom verifier models.
+                                           custom verifier models. These can be the compact verifier files
+                                           (.npz) or the scikit-learn pickle files (.pkl) created by
+                                           `openwakeword.train_custom_verifier`. Pickled models are converted
+                                           to compact verifiers when possible.
             custom_verifier_threshold (float): The score threshold to use a custom verifier model. If the score
                                                from a model for a given frame is greater than this value, the
                                                associated custom verifier model will also predict on that frame, and
@@ -78,6 +124,36 @@ class Model():
                                        "tflite" or "onnx". The default is "tflite" as this results in better
                                        efficiency on common platforms (x86, ARM64), but in some deployment
                                        scenarios ONNX models may be preferable.
+            fuse_models (bool): Whether to combine all of the ONNX models that use the same number of input
+                                feature frames into a single graph, so that they are run with one inference
+                                call per frame instead of one call per model. Useful when many models are loaded.
+                                The prediction output is unchanged, but timing information is reported per
+                                group of fused models. Only supported with the "onnx" inference framework.
+            energy_threshold (float): The minimum RMS amplitude (of 16-bit PCM audio) for model inference.
+                                      When the RMS of each of the last 16 inputs to `predict` (~1.3 seconds for
+                                      80 ms inputs) is below this value, the VAD and wakeword models are skipped
+                                      and scores of 0 are returned. The default value (0) disables this gate.
+            vad_gating (bool): Whether to run the VAD model (see `vad_threshold`) before the wakeword models, and
+                               skip the wakeword models for frames whose scores would be set to zero by the VAD.
+                               Scores of skipped frames are stored as zero in the prediction buffer, which
+                               can slightly change the behavior of the `patience` argument of `predict`.
+            gate_skip_embeddings (bool): Whether to also defer computing audio embeddings while the energy or VAD
+                                         gate is closed. The embeddings for the most recent frames are computed
+                                         when the gate opens again, so the features used by the models are the same.
+            onnx_cache_dir (str): A directory to cache the optimized ONNX models in, so that later loads (including
+                                  in other processes) skip graph optimization. ONNX sessions are always shared
+                                  with other objects in the process that use the same models
+                                  (see `openwakeword.sessions.SessionRegistry`).
+            autotune_profile (Union[bool, str, dict, None]): The autotune profile with the ONNX session options to
+                                                             use for the wakeword and feature models (see
+                                                             `openwakeword.autotune`). True (the default) loads the
+                                                             profile for this host if it exists, a string loads the
+                                                             profile at that path, and False or None uses
+                                                             single-threaded sessions.
+            precision (str): The precision of the ONNX models, either "float32" (the default) or "int8". With "int8",
+                             the quantized version of each wakeword model (created with `openwakeword.quantization`
+                             and saved next to the original model with an "_int8" suffix) is loaded, along with
+                             the quantized melspectrogram and embedding models if they exist.
             kwargs (dict): Any other keyword arguments to pass the the preprocessor instance
         """
         # Get model paths for pre-trained models if user doesn't provide models to load
@@ -104,9 +180,15 @@ class Model():
         self.model_inputs = {}
         self.model_outputs = {}
         self.model_prediction_function = {}
+        self.model_supports_batching = {}
         self.class_mapping = {}
         self.custom_verifier_models = {}
         self.custom_verifier_threshold = custom_verifier_threshold
+        self._shared_sessions: list = []
+
+        # Get the session options for the models from the autotune profile, if any
+        profile = resolve_profile(autotune_profile)
+        session_options = profile.get("streaming", {}).get("session_options", {})
 
         # Do imports for  inference framework
         if inference_framework == "tflite":
@@ -114,6 +196,9 @@ class Model():
                 import tflite_runtime.interpreter as tflite
 
                 def tflite_predict(tflite_interpreter, input_index, output_index, x):
+                    if tflite_interpreter.get_input_details()[0]['shape'][0] != x.shape[0]:
+                        tflite_interpreter.resize_tensor_input(input_index, x.shape, strict=False)
+                        tflite_interpreter.allocate_tensors()
                     tflite_interpreter.set_tensor(input_index, x)
                     tflite_interpreter.invoke()
                     return tflite_interpreter.get_tensor(output_index)[None, ]
@@ -132,7 +217,7 @@ class Model():
 
         if inference_framework == "onnx":
             try:
-                import onnxruntime as ort
+                import onnxruntime  # noqa: F401
 
                 def onnx_predict(onnx_model, x):
                     return onnx_model.run(None, {onnx_model.get_inputs()[0].name: x})
@@ -140,18 +225,53 @@ class Model():
             except ImportError:
                 raise ValueError("Tried to import onnxruntime, but it was not found. Please install it using `pip install onnxruntime`")
 
+        # Use the quantized models, if requested
+        if precision == "int8":
+            if inference_framework != "onnx":
+                raise ValueError("INT8 precision is only supported with the onnx inference framework!")
+            quantized_models = [get_quantized_model_path(i) for i in wakeword_models]
+            missing_models = [i for i in quantized_models if not os.path.exists(i)]
+            if missing_models != []:
+                raise ValueError(f"Could not find the quantized models {missing_models}! "
+                                 "Create them with `openwakeword.quantization.quantize_onnx_model`.")
+            wakeword_models = quantized_models
+
+            for name, filename in [("melspec", "melspectrogram.onnx"), ("embedding", "embedding_model.onnx")]:
+                if name == "melspec" and kwargs.get("melspectrogram_frontend", "model") != "model":
+                    continue
+                quantized_path = get_quantized_model_path(os.path.join(FEATURE_MODELS_DIR, filename))
+                if os.path.exists(quantized_path) and kwargs.get(f"{name}_model_path", "") == "":
+                    kwargs[f"{name}_model_path"] = quantized_path
+        elif precision != "float32":
+            raise ValueError(f"Unknown precision '{precision}', must be 'float32' or 'int8'!")
+
+        model_paths = {}
         for mdl_path, mdl_name in zip(wakeword_models, wakeword_model_names):
             # Load openwakeword models
+            model_paths[mdl_name] = mdl_path
             if inference_framework == "onnx":
                 if ".tflite" in mdl_path:
                     raise ValueError("The onnx inference framework is selected, but tflite models were provided!")
 
-                sessionOptions = ort.SessionOptions()
-                sessionOptions.inter_op_num_threads = 1
-                sessionOptions.intra_op_num_threads = 1
-
-                self.models[mdl_name] = ort.InferenceSession(mdl_path, sess_options=sessionOptions,
-                                                             providers=["CPUExecutionProvider"])
+                # Load the model with a dynamic batch dimension when possible, falling back to the
+                # original model if the graph can't predict on more than one example at a time
+                self.models[mdl_name] = session_registry.acquire(
+                    ("batchable", mdl_path), functools.partial(get_batchable_onnx_model, mdl_path),
+                    cache_dir=onnx_cache_dir, session_options=session_options
+                )
+                self._shared_sessions.append(self.models[mdl_name])
+                input_shape = self.models[mdl_name].get_inputs()[0].shape
+                try:
+                    self.models[mdl_name].run(None, {
+                        self.models[mdl_name].get_inputs()[0].name: np.zeros([2] + input_shape[1:], dtype=np.float32)
+                    })
+                    self.model_supports_batching[mdl_name] = True
+                except Exception:
+                    session_registry.release(self._shared_sessions.pop())
+                    self.models[mdl_name] = session_registry.acquire(mdl_path, cache_dir=onnx_cache_dir,
+                                                                     session_options=session_options)
+                    self._shared_sessions.append(self.models[mdl_name])
+                    self.model_supports_batching[mdl_name] = False
 
                 self.model_inputs[mdl_name] = self.models[mdl_name].get_inputs()[0].shape[1]
                 self.model_outputs[mdl_name] = self.models[mdl_name].get_outputs()[0].shape[1]
@@ -162,7 +282,8 @@ class Model():
                 if ".onnx" in mdl_path:
                     raise ValueError("The tflite inference framework is selected, but onnx models were provided!")
 
-                self.models[mdl_name] = tflite.Interpreter(model_path=mdl_path, num_threads=1)
+                self.models[mdl_name] = tflite.Interpreter(model_path=mdl_path,
+                                                           num_threads=session_options.get("intra_op_num_threads", 1))
                 self.models[mdl_name].allocate_tensors()
 
                 self.model_inputs[mdl_name] = self.models[mdl_name].get_input_details()[0]['shape'][1]
@@ -173,6 +294,7 @@ class Model():
 
                 pred_function = functools.partial(tflite_predict, self.models[mdl_name], tflite_input_index, tflite_output_index)
                 self.model_prediction_function[mdl_name] = pred_function
+                self.model_supports_batching[mdl_name] = True
 
             if class_mapping_dicts and class_mapping_dicts[wakeword_models.index(mdl_path)].get(mdl_name, None):
                 self.class_mapping[mdl_name] = class_mapping_dicts[wakeword_models.index(mdl_path)]
@@ -184,7 +306,9 @@ class Model():
             # Load custom verifier models
             if isinstance(custom_verifier_models, dict):
                 if custom_verifier_models.get(mdl_name, False):
-                    self.custom_verifier_models[mdl_name] = pickle.load(open(custom_verifier_models[mdl_name], 'rb'))
+                    self.custom_verifier_models[mdl_name] = self._load_custom_verifier(
+                        custom_verifier_models[mdl_name]
+                    )
 
             if len(self.custom_verifier_models.keys()) < len(custom_verifier_models.keys()):
                 raise ValueError(
@@ -194,43 +318,206 @@ class Model():
                     " that has the same base models but doesn't have custom verifier models."
                 )
 
-        # Create buffer to store frame predictions
-        self.prediction_buffer: DefaultDict[str, deque] = defaultdict(partial(deque, maxlen=30))
-
-        # Initialize SpeexDSP noise canceller
+        # Get the output label(s) of each model, and the associated model output column
+        self.label_columns: List[tuple] = []
+        for mdl_name in self.models.keys():
+            if self.model_outputs[mdl_name] == 1:
+                self.label_columns.append((mdl_name, mdl_name, 0))
+            else:
+                for int_label, cls in self.class_mapping[mdl_name].items():
+                    self.label_columns.append((cls, mdl_name, int(int_label)))
+
+        # Index the labels, so that per-frame lookups don't scan the class mappings of every model
+        self.labels = [label for label, _, _ in self.label_columns]
+        self.label_index = {label: ndx for ndx, label in enumerate(self.labels)}
+        self.label_parent_models = {label: mdl for label, mdl, _ in self.label_columns}
+        # The labels of each model are contiguous in `labels`, so each model's scores are written to a slice
+        # of the score array (with the model's output columns in label order, or None if already in order)
+        self.model_label_columns = {}
+        for mdl in self.models.keys():
+            ndcs = [ndx for ndx, (_, i, _) in enumerate(self.label_columns) if i == mdl]
+            columns = [column for _, i, column in self.label_columns if i == mdl]
+            self.model_label_columns[mdl] = (slice(ndcs[0], ndcs[-1] + 1),
+                                             None if columns == list(range(len(columns))) else np.array(columns))
+
+        # Combine models with the same input size into a single graph, if requested
+        self.fused_models: List[tuple] = []
+        if fuse_models and inference_framework != "onnx":
+            logging.warning("Fusing models is only supported with the onnx inference framework, "
+                            "models will be run individually.")
+        elif fuse_models:
+            model_groups = defaultdict(list)
+            for mdl_name in self.models.keys():
+                model_groups[self.model_inputs[mdl_name]].append(mdl_name)
+
+            for model_group in model_groups.values():
+                if len(model_group) < 2:
+                    continue
+                group_paths = tuple(model_paths[i] for i in model_group)
+                try:
+                    fused_model = session_registry.acquire(("fused",) + group_paths,
+                                                           functools.partial(fuse_onnx_models, list(group_paths)),
+                                                           cache_dir=onnx_cache_dir, session_options=session_options)
+                    self._shared_sessions.append(fused_model)
+                except Exception as e:
+                    logging.warning(f"Could not fuse the models {model_group}, they will be run individually: {e}")
+                    continue
+                self.fused_models.append((model_group, functools.partial(onnx_predict, fused_model),
+                                          all([self.model_supports_batching[i] for i in model_group])))
+
+        # Create buffers to store frame predictions (the scores of each label in `labels`, for the last 30 frames)
+        self.prediction_history = RingBuffer(30, (len(self.labels),), dtype=np.float32)
+        self.n_predictions = 0
+        self.scores = np.zeros(len(self.labels), dtype=np.float32)
+        self._compiled_arguments: tuple = ({}, {}, None)
+
+        # Initialize noise suppression
         if enable_speex_noise_suppression:
-            from speexdsp_ns import NoiseSuppression
-            self.speex_ns = NoiseSuppression.create(160, 16000)
+            noise_suppression = "speex"
+        if noise_suppression == "speex":
+            self.noise_suppressor: Optional[NoiseSuppressor] = SpeexNoiseSuppressor(160, 16000)
+        elif noise_suppression == "spectral_subtraction":
+            self.noise_suppressor = SpectralSubtractionNoiseSuppressor(160, 16000)
+        elif noise_suppression is None:
+            self.noise_suppressor = None
         else:
-            self.speex_ns = None
+            raise ValueError(f"Unknown noise suppression method '{noise_suppression}'!")
+        self._noise_suppression_output = np.zeros(1280*4 + 160, dtype=np.int16)  # grows with larger inputs
 
         # Initialize Silero VAD
         self.vad_threshold = vad_threshold
         if vad_threshold > 0:
-            self.vad = openwakeword.VAD()
+            self.vad = openwakeword.VAD(onnx_cache_dir=onnx_cache_dir)
+
+        # Initialize the energy and VAD gates, and counters of the frames skipped by each gate
+        if vad_gating and vad_threshold <= 0:
+            raise ValueError("The `vad_gating` argument requires a `vad_threshold` greater than 0!")
+        self.energy_threshold = energy_threshold
+        self.vad_gating = vad_gating
+        self.gate_skip_embeddings = gate_skip_embeddings
+        self.input_energies: deque = deque(maxlen=16)
+        self.gate_counters = {"frames": 0, "energy_skipped": 0, "vad_skipped": 0, "embeddings_skipped": 0}
 
         # Create AudioFeatures object
-        self.preprocessor = AudioFeatures(inference_framework=inference_framework, **kwargs)
+        self.preprocessor = AudioFeatures(inference_framework=inference_framework, onnx_cache_dir=onnx_cache_dir,
+                                          autotune_profile=profile, autotune_workload="streaming", **kwargs)
+        self.preprocessor.embedding_backfill_frames = max(list(self.model_inputs.values()) + [1])
+
+        # Latency instrumentation is disabled until `enable_instrumentation` is called
+        self.latency_recorder = None
+
+        # The executor and queue metrics of the async `detect` interface (created on first use)
+        self._detect_executor: Optional[ThreadPoolExecutor] = None
+        self._detecting: Optional[weakref.ref] = None  # the events of the active `detect` call
+        self.detect_stats: dict = {}
+
+    def enable_instrumentation(self, recorder: Optional[LatencyRecorder] = None):
+        """
+        Enables the collection of per-stage latencies (noise suppression, melspectrogram, embedding,
+        each model, custom verifier models, VAD, and the full `predict` call) in low-overhead histograms.
+        When disabled (the default), the only cost is a check of the `latency_recorder` attribute.
+
+        Args:
+            recorder (LatencyRecorder): The recorder to store latencies in. If not provided, a new one is created.
+                                        A recorder can be shared by multiple model objects.
+
+        Returns:
+            LatencyRecorder: The recorder object, which can summarize the latencies (`summary`) and export
+                             them as JSON (`to_json`) or in the Prometheus text format (`to_prometheus`)
+        """
+        self.latency_recorder = recorder if recorder is not None else LatencyRecorder()
+        self.preprocessor.enable_instrumentation(self.latency_recorder)
+        return self.latency_recorder
+
+    def disable_instrumentation(self):
+        """Disables the collection of per-stage latencies"""
+        self.latency_recorder = None
+        self.preprocessor.disable_instrumentation()
+
+    @staticmethod
+    def _load_custom_verifier(path: str):
+        """Loads a custom verifier model, converting scikit-learn pipelines to compact verifiers when possible"""
+        if path.endswith(".npz"):
+            return LinearVerifier.load(path)
+
+        with open(path, 'rb') as f:
+            verifier_model = pickle.load(f)
+        try:
+            return LinearVerifier.from_pipeline(verifier_model)
+        except (AttributeError, ValueError):
+            logging.warning(f"The custom verifier model '{path}' couldn't be converted to a compact verifier, "
+                            "and will be scored with scikit-learn.")
+            return verifier_model
+
+    def _get_verifier_score(self, mdl: str):
+        """Gets the score of the custom verifier model of `mdl` on the current audio features"""
+        features = self.preprocessor.get_features(self.model_inputs[mdl])
+        verifier_model = self.custom_verifier_models[mdl]
+        if isinstance(verifier_model, LinearVerifier):
+            return verifier_model.score(features)
+        return verifier_model.predict_proba(features)[0][-1]
 
     def get_parent_model_from_label(self, label):
         """Gets the parent model associated with a given prediction label"""
-        parent_model = ""
-        for mdl in self.class_mapping.keys():
-            if label in self.class_mapping[mdl].values():
-                parent_model = mdl
-            elif label in self.class_mapping.keys() and label == mdl:
-                parent_model = mdl
+        return self.label_parent_models.get(label, "")
+
+    @property
+    def prediction_buffer(self):
+        """The scores of the last 30 frames for each label, as a dictionary of deques"""
+        history = self.prediction_history.view()
+        return {label: deque(history[:, ndx].tolist(), maxlen=30) for ndx, label in enumerate(self.labels)}
 
-        return parent_model
+    def _compile_arguments(self, patience: dict, threshold: dict):
+        """
+        Gets arrays of the threshold (infinite if not provided) and patience (0 if not provided) of each label
+        for the `patience` and `threshold` arguments of `predict`, and a mask of the frames of each label's
+        patience window. The arrays are reused while the arguments are unchanged.
+        """
+        if self._compiled_arguments[2] is not None and patience == self._compiled_arguments[0] and \
+           threshold == self._compiled_arguments[1]:
+            return self._compiled_arguments[2]
+
+        parent_models = [self.label_parent_models[label] for label in self.labels]
+        if any(mdl in patience and mdl not in threshold for mdl in parent_models):
+            raise ValueError("Error! A threshold must be provided via the `threshold` argument for every model "
+                             "in the `patience` argument!")
+        thresholds = np.array([threshold.get(mdl, np.inf) for mdl in parent_models], dtype=np.float32)
+        patiences = np.array([patience.get(mdl, 0) for mdl in parent_models], dtype=np.int64)
+        n_window = max(patiences.max(initial=0), 1)
+        patience_windows = np.arange(n_window)[:, None] >= n_window - patiences
+        self._compiled_arguments = (dict(patience), dict(threshold), (thresholds, patiences, patience_windows))
+        return thresholds, patiences, patience_windows
+
+    def close(self):
+        """Releases the shared ONNX sessions used by the model, including those of the preprocessor and VAD"""
+        for session in self._shared_sessions:
+            session_registry.release(session)
+        self._shared_sessions = []
+        self.preprocessor.close()
+        if self.vad_threshold > 0:
+            self.vad.close()
+        if self._detect_executor is not None:
+            self._detect_executor.shutdown(wait=False)
+            self._detect_executor = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
 
     def reset(self):
         """Reset the prediction and audio feature buffers. Useful for re-initializing the model, though may not be efficient
         when called too frequently."""
-        self.prediction_buffer = defaultdict(partial(deque, maxlen=30))
+        self.prediction_history.clear()
+        self.n_predictions = 0
+        self.input_energies.clear()
         self.preprocessor.reset()
+        if self.noise_suppressor is not None:
+            self.noise_suppressor.reset()
 
     def predict(self, x: np.ndarray, patience: dict = {},
-                threshold: dict = {}, debounce_time: float = 0.0, timing: bool = False):
+                threshold: dict = {}, debounce_time: float = 0.0, timing: bool = False, return_array: bool = False):
         """Predict with all of the wakeword models on the input audio frames
 
         Args:
@@ -252,6 +539,9 @@ class Model():
                                    after a non-zero prediction. Can preven multiple detections of the same wake-word.
             timing (bool): Whether to return timing information of the models. Can be useful to debug and
                            assess how efficiently models are running on the current hardware.
+            return_array (bool): Whether to return the scores as an array (in the order of the `labels` attribute)
+                                 instead of a dictionary. The array is preallocated and overwritten by the next
+                                 call, so copy it if the scores need to be kept.
 
         Returns:
             dict: A dictionary of scores between 0 and 1 for each model, where 0 indicates no
@@ -268,74 +558,142 @@ class Model():
             timing_dict["models"] = {}
             feature_start = time.time()
 
-        # Get audio features (optionally with Speex noise suppression)
-        if self.speex_ns:
-            n_prepared_samples = self.preprocessor(self._suppress_noise_with_speex(x))
+        recorder = self.latency_recorder
+        if recorder is not None:
+            predict_start = time.perf_counter_ns()
+            recorder.add_audio(x.shape[0])
+
+        # Gate model inference on the input audio, first with a near-free energy test and then with the VAD
+        energy_gate_closed = False
+        if self.energy_threshold > 0:
+            self.input_energies.append(np.sqrt(np.mean(np.square(x, dtype=np.float32))) if x.shape[0] > 0 else 0.0)
+            energy_gate_closed = max(self.input_energies) < self.energy_threshold
+
+        if self.vad_threshold > 0:
+            if timing:
+                vad_start = time.time()
+            if recorder is not None:
+                stage_start = time.perf_counter_ns()
+
+            if energy_gate_closed:
+                self.vad.prediction_buffer.append(0.0)
+            else:
+                self.vad(x)
+
+            if timing:
+                timing_dict["models"]["vad"] = time.time() - vad_start
+            if recorder is not None:
+                recorder.record("vad", time.perf_counter_ns() - stage_start)
+
+            # Get frames from last 0.4 to 0.56 seconds (3 frames) before the current
+            # frame and get max VAD score
+            vad_frames = list(self.vad.prediction_buffer)[-7:-4]
+            vad_max_score = np.max(vad_frames) if len(vad_frames) > 0 else 0
+
+        vad_gate_closed = self.vad_gating and not energy_gate_closed and vad_max_score < self.vad_threshold
+        gate_closed = energy_gate_closed or vad_gate_closed
+
+        # Get audio features (optionally with noise suppression)
+        skip_embeddings = gate_closed and self.gate_skip_embeddings
+        if self.noise_suppressor is not None:
+            if recorder is not None:
+                stage_start = time.perf_counter_ns()
+            if self._noise_suppression_output.shape[0] < x.shape[0] + self.noise_suppressor.frame_size:
+                self._noise_suppression_output = np.zeros(x.shape[0] + self.noise_suppressor.frame_size,
+                                                          dtype=np.int16)
+            x_cleaned = self.noise_suppressor.process(x, out=self._noise_suppression_output)
+            if recorder is not None:
+                recorder.record("noise_suppression", time.perf_counter_ns() - stage_start)
+            n_prepared_samples = self.preprocessor(x_cleaned, skip_embeddings=skip_embeddings)
         else:
-            n_prepared_samples = self.preprocessor(x)
+            n_prepared_samples = self.preprocessor(x, skip_embeddings=skip_embeddings)
 
         if timing:
             timing_dict["models"]["preprocessor"] = time.time() - feature_start
 
+        # Update gate counters
+        if n_prepared_samples >= 1280:
+            n_frames = n_prepared_samples//1280
+            self.gate_counters["frames"] += n_frames
+            if energy_gate_closed:
+                self.gate_counters["energy_skipped"] += n_frames
+            if vad_gate_closed:
+                self.gate_counters["vad_skipped"] += n_frames
+            if skip_embeddings:
+                self.gate_counters["embeddings_skipped"] += n_frames
+
+        # Get predictions from fused model(s), if any
+        fused_predictions = {}
+        if n_prepared_samples >= 1280 and not gate_closed:
+            for model_group, pred_function, supports_batching in self.fused_models:
+                if timing:
+                    model_start = time.time()
+                if recorder is not None:
+                    stage_start = time.perf_counter_ns()
+
+                group_predictions = self._get_model_predictions(
+                    pred_function, self.model_inputs[model_group[0]], n_prepared_samples, supports_batching
+                )
+                fused_predictions.update(zip(model_group, group_predictions))
+
+                if recorder is not None:
+                    recorder.record("model:" + " + ".join(model_group), time.perf_counter_ns() - stage_start)
+
+                if timing:
+                    timing_dict["models"][" + ".join(model_group)] = time.time() - model_start
+
         # Get predictions from model(s)
-        predictions = {}
+        scores = self.scores
+        history = self.prediction_history.view()
         for mdl in self.models.keys():
             if timing:
                 model_start = time.time()
 
             # Run model to get predictions
-            if n_prepared_samples > 1280:
-                group_predictions = []
-                for i in np.arange(n_prepared_samples//1280-1, -1, -1):
-                    group_predictions.extend(
-                        self.model_prediction_function[mdl](
-                            self.preprocessor.get_features(
-                                    self.model_inputs[mdl],
-                                    start_ndx=-self.model_inputs[mdl] - i
-                            )
-                        )
-                    )
-                prediction = np.array(group_predictions).max(axis=0)[None, ]
-            elif n_prepared_samples == 1280:
-                prediction = self.model_prediction_function[mdl](
-                    self.preprocessor.get_features(self.model_inputs[mdl])
-                )
-            elif n_prepared_samples < 1280:  # get previous prediction if there aren't enough samples
-                if self.model_outputs[mdl] == 1:
-                    if len(self.prediction_buffer[mdl]) > 0:
-                        prediction = [[[self.prediction_buffer[mdl][-1]]]]
-                    else:
-                        prediction = [[[0]]]
-                elif self.model_outputs[mdl] != 1:
-                    n_classes = max([int(i) for i in self.class_mapping[mdl].keys()])
-                    prediction = [[[0]*(n_classes+1)]]
-
-            if self.model_outputs[mdl] == 1:
-                predictions[mdl] = prediction[0][0][0]
-            else:
-                for int_label, cls in self.class_mapping[mdl].items():
-                    predictions[cls] = prediction[0][0][int(int_label)]
-
-            # Update scores based on custom verifier model
-            if self.custom_verifier_models != {}:
-                for cls in predictions.keys():
-                    if predictions[cls] >= self.custom_verifier_threshold:
-                        parent_model = self.get_parent_model_from_label(cls)
-                        if self.custom_verifier_models.get(parent_model, False):
-                            verifier_prediction = self.custom_verifier_models[parent_model].predict_proba(
-                                self.preprocessor.get_features(self.model_inputs[mdl])
-                            )[0][-1]
-                            predictions[cls] = verifier_prediction
-
-            # Zero predictions for first 5 frames during model initialization
-            for cls in predictions.keys():
-                if len(self.prediction_buffer[cls]) < 5:
-                    predictions[cls] = 0.0
+            label_ndcs, columns = self.model_label_columns[mdl]
+            if gate_closed:
+                scores[label_ndcs] = 0.0
+            elif mdl in fused_predictions:
+                prediction = np.asarray(fused_predictions[mdl]).reshape(-1)
+                scores[label_ndcs] = prediction if columns is None else prediction[columns]
+            elif n_prepared_samples >= 1280:
+                if recorder is not None:
+                    stage_start = time.perf_counter_ns()
+                prediction = self._get_model_predictions(
+                    self.model_prediction_function[mdl], self.model_inputs[mdl], n_prepared_samples,
+                    self.model_supports_batching[mdl]
+                )[0]
+                prediction = np.asarray(prediction).reshape(-1)
+                scores[label_ndcs] = prediction if columns is None else prediction[columns]
+                if recorder is not None:
+                    recorder.record(f"model:{mdl}", time.perf_counter_ns() - stage_start)
+            else:  # get previous prediction if there aren't enough samples
+                if self.model_outputs[mdl] == 1 and history.shape[0] > 0:
+                    scores[label_ndcs] = history[-1][label_ndcs]
+                else:
+                    scores[label_ndcs] = 0.0
 
             # Get timing information
             if timing:
                 timing_dict["models"][mdl] = time.time() - model_start
 
+        # Update scores based on custom verifier models, scoring each verifier at most once per frame
+        if self.custom_verifier_models != {}:
+            verifier_scores: Dict[str, float] = {}
+            for ndx, (cls, mdl, _) in enumerate(self.label_columns):
+                if mdl in self.custom_verifier_models and scores[ndx] >= self.custom_verifier_threshold:
+                    if mdl not in verifier_scores:
+                        if recorder is not None:
+                            stage_start = time.perf_counter_ns()
+                        verifier_scores[mdl] = self._get_verifier_score(mdl)
+                        if recorder is not None:
+                            recorder.record("custom_verifier", time.perf_counter_ns() - stage_start)
+                    scores[ndx] = verifier_scores[mdl]
+
+        # Zero predictions for first 5 frames during model initialization
+        if self.n_predictions < 5:
+            scores[:] = 0.0
+
         # Update scores based on thresholds or patience arguments
         if patience != {} or debounce_time > 0:
             if threshold == {}:
@@ -343,49 +701,77 @@ class Model():
                                  "values must be provided via the `threshold` argument!")
             if patience != {} and debounce_time > 0:
                 raise ValueError("Error! The `patience` and `debounce_time` arguments cannot be used together!")
-            for mdl in predictions.keys():
-                parent_model = self.get_parent_model_from_label(mdl)
-                if predictions[mdl] != 0.0:
-                    if parent_model in patience.keys():
-                        scores = np.array(self.prediction_buffer[mdl])[-patience[parent_model]:]
-                        if (scores >= threshold[parent_model]).sum() < patience[parent_model]:
-                            predictions[mdl] = 0.0
-                    elif debounce_time > 0:
-                        if parent_model in threshold.keys():
-                            n_frames = int(np.ceil(debounce_time/(n_prepared_samples/16000)))
-                            recent_predictions = np.array(self.prediction_buffer[mdl])[-n_frames:]
-                            if predictions[mdl] >= threshold[parent_model] and \
-                               (recent_predictions >= threshold[parent_model]).sum() > 0:
-                                predictions[mdl] = 0.0
+            thresholds, patiences, patience_windows = self._compile_arguments(patience, threshold)
+            if patience != {}:
+                # The number of frames above the threshold in the last `patience` frames of each label
+                recent_history = history[-patience_windows.shape[0]:]
+                counts = ((recent_history >= thresholds) &
+                          patience_windows[patience_windows.shape[0] - recent_history.shape[0]:]).sum(axis=0)
+                scores[(counts < patiences) & (scores != 0.0)] = 0.0
+            else:
+                n_frames = int(np.ceil(debounce_time/(max(n_prepared_samples, 1280)/16000)))
+                recently_detected = (history[-n_frames:] >= thresholds).any(axis=0)
+                scores[recently_detected & (scores != 0.0) & (scores >= thresholds)] = 0.0
 
         # Update prediction buffer
-        for mdl in predictions.keys():
-            self.prediction_buffer[mdl].append(predictions[mdl])
+        self.prediction_history.extend(scores)
+        self.n_predictions += 1
 
-        # (optionally) get voice activity detection scores and update model scores
+        # (optionally) update model scores based on the voice activity detection scores
         if self.vad_threshold > 0:
-            if timing:
-                vad_start = time.time()
-
-            self.vad(x)
+            if vad_max_score < self.vad_threshold:
+                scores[:] = 0.0
 
-            if timing:
-                timing_dict["models"]["vad"] = time.time() - vad_start
-
-            # Get frames from last 0.4 to 0.56 seconds (3 frames) before the current
-            # frame and get max VAD score
-            vad_frames = list(self.vad.prediction_buffer)[-7:-4]
-            vad_max_score = np.max(vad_frames) if len(vad_frames) > 0 else 0
-            for mdl in predictions.keys():
-                if vad_max_score < self.vad_threshold:
-                    predictions[mdl] = 0.0
+        if recorder is not None:
+            recorder.record("predict", time.perf_counter_ns() - predict_start)
 
+        predictions = scores if return_array else dict(zip(self.labels, scores.tolist()))
         if timing:
             return predictions, timing_dict
         else:
             return predictions
 
-    def predict_clip(self, clip: Union[str, np.ndarray], padding: int = 1, chunk_size=1280, **kwargs):
+    def _get_model_predictions(self, pred_function, n_input_frames: int, n_prepared_samples: int,
+                               supports_batching: bool = False):
+        """
+        Runs a model prediction function on the audio features of the most recently processed audio.
+        When more than one 80 ms frame (1280 samples) was processed, the model predicts on the features
+        of each frame and the maximum score across the frames is returned.
+
+        Args:
+            pred_function (Callable): The model prediction function
+            n_input_frames (int): The number of feature frames used as input by the model
+            n_prepared_samples (int): The number of samples processed by the preprocessor
+            supports_batching (bool): Whether the model can predict on the windows of all of the frames
+                                      in a single batch, instead of one call per frame
+
+        Returns:
+            list: A list with one array of shape (1, 1, n_classes) for each output of the model
+        """
+        n_windows = n_prepared_samples//1280
+        if n_windows == 1:
+            outputs = pred_function(self.preprocessor.get_features(n_input_frames))
+            return [np.asarray(i).reshape(1, 1, -1) for i in outputs]
+
+        if supports_batching:
+            feature_buffer = self.preprocessor.feature_buffer
+            x = np.lib.stride_tricks.sliding_window_view(
+                feature_buffer[len(feature_buffer) - n_input_frames - n_windows + 1:], n_input_frames, axis=0
+            )
+            outputs = pred_function(np.ascontiguousarray(x.transpose(0, 2, 1)))
+            return [np.asarray(i).reshape(n_windows, -1).max(axis=0).reshape(1, 1, -1) for i in outputs]
+
+        frame_predictions = []
+        for i in np.arange(n_windows-1, -1, -1):
+            frame_predictions.append(
+                pred_function(self.preprocessor.get_features(n_input_frames, start_ndx=-n_input_frames - i))
+            )
+
+        return [np.array([outputs[ndx] for outputs in frame_predictions]).max(axis=0)[None, ]
+                for ndx in range(len(frame_predictions[0]))]
+
+    def predict_clip(self, clip: Union[str, np.ndarray], padding: int = 1, chunk_size=1280, offline: bool = False,
+                     **kwargs):
         """Predict on an full audio clip, simulating streaming prediction.
         The input clip must bit a 16-bit, 16 khz, single-channel WAV file.
 
@@ -395,6 +781,12 @@ class Model():
             padding (int): How many seconds of silence to pad the start/end of the clip with
                             to make sure that short clips can be processed correctly (default: 1)
             chunk_size (int): The size (in samples) of each chunk of audio to pass to the model
+            offline (bool): Whether to score the entire clip at once instead of simulating streaming.
+                            The melspectrogram, embedding, and wakeword models predict on all of the frames
+                            in large batches, which greatly reduces the number of model calls when evaluating
+                            many clips. The results match those of streaming prediction with a newly initialized
+                            (or reset) model, and the streaming state of the model is not changed. Custom verifier models, VAD, noise suppression,
+                            and the arguments of the `predict` method are not supported in this mode.
             kwargs: Any keyword arguments to pass to the class `predict` method
 
         Returns:
@@ -417,6 +809,15 @@ class Model():
                 )
             )
 
+        # Score all frames at once, if requested
+        if offline:
+            if chunk_size != 1280 or kwargs != {}:
+                raise ValueError("The `offline` mode only supports the default `chunk_size` (1280), and doesn't support"
+                                 " additional arguments for the `predict` method.")
+            scores = self._get_offline_scores(data)
+            labels = [label for label, _, _ in self.label_columns]
+            return [dict(zip(labels, frame_scores)) for frame_scores in scores.tolist()]
+
         # Iterate through clip, getting predictions
         predictions = []
         step_size = chunk_size
@@ -425,6 +826,225 @@ class Model():
 
         return predictions
 
+    def detect(
+            self,
+            audio: AsyncIterable,
+            threshold: Union[float, dict] = 0.5,
+            debounce_time: float = 1.0,
+            max_queue_frames: int = 25,
+            max_batch_frames: int = 10,
+            drop_when_behind: bool = False
+            ):
+        """
+        Detect wakewords in an asynchronous stream of audio, for use in asyncio applications:
+
+            async for event in model.detect(audio_iterator):
+                print(event["label"], event["score"], event["time"])
+
+        Audio is split into 80 ms frames and placed in a bounded queue, and inference runs on a dedicated
+        single-thread executor so that the event loop is never blocked. When inference falls behind, all of
+        the queued frames (up to `max_batch_frames`) are predicted in a single executor call, and when the queue
+        is full, reading from `audio` pauses until there is room (or, with `drop_when_behind`, the oldest queued
+        frame is dropped). The queue depth and other metrics are kept in the `detect_stats` attribute.
+
+        Only one `detect` call can be active on a model at a time, as the model keeps the state of the stream.
+        A call becomes active when its events are first iterated, and stops being active when they are closed
+        (or when the iteration ends or is stopped with `break`, if there is no other reference to them).
+
+        Args:
+            audio (AsyncIterable): An async iterable of 16-bit, 16 khz audio chunks of any length, either as
+                                   Numpy arrays or as bytes of little-endian PCM data
+            threshold (Union[float, dict]): The score threshold of a detection, either a single value or a
+                                            dictionary where the keys are the model names and the values are
+                                            the thresholds
+            debounce_time (float): The time (in seconds) to wait before detecting a model again after a detection
+                                   (see the `predict` method)
+            max_queue_frames (int): The maximum number of 80 ms frames waiting for inference
+            max_batch_frames (int): The maximum number of frames predicted in a single executor call
+            drop_when_behind (bool): Whether to drop the oldest queued frame instead of pausing the audio stream
+                                     when the queue is full. Useful for live sources that can't be paused,
+                                     at the cost of gaps in the audio seen by the model.
+
+        Returns:
+            An async iterator of detection events, which are dictionaries with the "label", the "score", the index
+            of the 80 ms "frame", and the "time" (in seconds from the start of the stream) at the end of the frame.
+            Frames dropped with `drop_when_behind` still count towards the frame index and time.
+        """
+        events = _DetectEvents()
+        events._events = self._detect(weakref.ref(events), audio, threshold, debounce_time, max_queue_frames,
+                                      max_batch_frames, drop_when_behind)
+        return events
+
+    async def _detect(self, owner, audio, threshold, debounce_time, max_queue_frames, max_batch_frames,
+                      drop_when_behind):
+        # The events of an earlier call that were dropped without being closed (e.g., after a `break`) are no
+        # longer referenced, so the call isn't active (its generator is closed later by the event loop)
+        if self._detecting is not None and self._detecting() is not None:
+            raise ValueError("Error! Only one `detect` call can be active on a model at a time.")
+        self._detecting = owner
+
+        thresholds = {mdl: threshold.get(mdl, 0.5) if isinstance(threshold, dict) else threshold
+                      for mdl in self.models.keys()}
+        label_thresholds = {label: thresholds[mdl] for label, mdl, _ in self.label_columns}
+
+        if self._detect_executor is None:
+            self._detect_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="openwakeword-detect")
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_frames)
+        stats = self.detect_stats = {"queue_depth": 0, "max_queue_depth": 0, "frames_received": 0,
+                                     "frames_processed": 0, "frames_dropped": 0, "backpressure_waits": 0,
+                                     "batches": 0, "inference_seconds": 0.0}
+
+        def predict_frames(frames):
+            start = time.perf_counter()
+            predictions = [self.predict(frame, threshold=thresholds, debounce_time=debounce_time)
+                           for frame in frames]
+            return predictions, time.perf_counter() - start
+
+        # Frames are queued with their index in the stream, so that dropped frames keep the time of detections
+
+        async def read_audio():
+            remainder = np.empty(0, dtype=np.int16)
+            try:
+                async for chunk in audio:
+                    if isinstance(chunk, (bytes, bytearray, memoryview)):
+                        chunk = np.frombuffer(chunk, dtype=np.int16)
+                    remainder = np.concatenate((remainder, np.asarray(chunk, dtype=np.int16)))
+                    n_frames = remainder.shape[0]//1280
+                    for i in range(n_frames):
+                        frame_ndx = stats["frames_received"]
+                        stats["frames_received"] += 1
+                        if queue.full():
+                            if drop_when_behind:
+                                queue.get_nowait()
+                                stats["frames_dropped"] += 1
+                            else:
+                                stats["backpressure_waits"] += 1
+                        await queue.put((frame_ndx, remainder[i*1280:(i+1)*1280]))
+                        stats["queue_depth"] = queue.qsize()
+                        stats["max_queue_depth"] = max(stats["max_queue_depth"], stats["queue_depth"])
+                    remainder = remainder[n_frames*1280:]
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await queue.put(None)
+                raise
+            await queue.put(None)
+
+        reader = asyncio.ensure_future(read_audio())
+        try:
+            finished = False
+            while not finished:
+                frames = [await queue.get()]
+                while not queue.empty() and len(frames) < max_batch_frames:
+                    frames.append(queue.get_nowait())
+                if frames[-1] is None:
+                    finished = True
+                    frames.pop()
+                stats["queue_depth"] = queue.qsize()
+                if not frames:
+                    continue
+
+                predictions, elapsed = await loop.run_in_executor(self._detect_executor, predict_frames,
+                                                                  [frame for _, frame in frames])
+                stats["frames_processed"] += len(frames)
+                stats["batches"] += 1
+                stats["inference_seconds"] += elapsed
+                for (frame_ndx, _), prediction in zip(frames, predictions):
+                    for label, score in prediction.items():
+                        if score >= label_thresholds[label]:
+                            yield {"label": label, "score": float(score), "frame": frame_ndx,
+                                   "time": (frame_ndx + 1)*0.08}
+
+            # Raise any errors from reading the audio
+            await reader
+        finally:
+            reader.cancel()
+            if self._detecting is owner:
+                self._detecting = None
+
+    def get_detect_stats(self):
+        """
+        Summarizes the queue metrics of the current (or last) `detect` call.
+
+        Returns:
+            dict: The current and maximum queue depth (in 80 ms frames), the number of frames received, processed,
+                  and dropped, how many times reading the audio paused because the queue was full, the mean
+                  number of frames per executor call, and the real-time factor (inference time / audio duration)
+        """
+        stats = dict(self.detect_stats)
+        if stats.get("frames_processed", 0) > 0:
+            stats["mean_batch_frames"] = stats["frames_processed"]/stats["batches"]
+            stats["real_time_factor"] = stats["inference_seconds"]/(stats["frames_processed"]*0.08)
+        return stats
+
+    def _get_offline_scores(self, data: np.ndarray, batch_size: int = 64, return_features: bool = False):
+        """
+        Scores an entire audio clip with batched model calls, matching the frames of streaming prediction
+        (with `predict`) in 1280 sample chunks on a newly initialized model.
+
+        Args:
+            data (ndarray): The 16-bit, 16 khz audio data to score
+            batch_size (int): The maximum number of frames per embedding model call
+            return_features (bool): Whether to also return the audio features
+
+        Returns:
+            ndarray: An array of shape (n_frames, n_labels) with the scores for each label in `label_columns`.
+                     If `return_features` is True, a tuple of the scores and an array with the initial features
+                     followed by the features of each frame, so that the last N features of frame i (the
+                     equivalent of `preprocessor.get_features(N)` after streaming it) end at row
+                     `n_initial_features + i + 1`.
+        """
+        if self.custom_verifier_models != {} or self.vad_threshold > 0 or self.noise_suppressor is not None:
+            raise ValueError("Offline scoring doesn't support custom verifier models, VAD, or noise suppression!")
+
+        n_frames = len(range(0, data.shape[0] - 1280, 1280))
+        scores = np.zeros((n_frames, len(self.label_columns)), dtype=np.float32)
+        if n_frames == 0:
+            return (scores, self.preprocessor._get_initial_features()) if return_features else scores
+
+        # Melspectrogram of each 80 ms frame, as in streaming prediction: the first frame from its 1280 samples, and
+        # the others from their 1280 samples and the 480 before them, computed separately since the melspectrogram
+        # model limits the dynamic range relative to the maximum of its input. The frames follow the initial
+        # (streaming) melspectrogram buffer, and the embedding window of frame i ends with the last melspectrogram
+        # frame of samples [0, 1280*(i+1)).
+        melspec = [np.ones((76, 32), dtype=np.float32), self.preprocessor._get_melspectrogram(data[0:1280])]
+        if n_frames > 1:
+            hops = np.lib.stride_tricks.sliding_window_view(data[1280 - 160*3:1280*n_frames], 1280 + 160*3)[::1280]
+            melspec.append(self.preprocessor._get_melspectrogram_batch(hops).reshape(-1, 32))
+        melspec = np.vstack(melspec)
+        windows = np.lib.stride_tricks.sliding_window_view(melspec, 76, axis=0)[5::8][0:n_frames]
+        windows = np.ascontiguousarray(windows.transpose(0, 2, 1)[:, :, :, None])
+        embeddings = np.vstack([self.preprocessor.embedding_model_predict(windows[i:i+batch_size]).reshape(-1, 96)
+                                for i in range(0, n_frames, batch_size)])
+
+        # Feature windows for all frames, after the initial feature buffer
+        initial_features = self.preprocessor._get_initial_features()
+        features = np.vstack((initial_features, embeddings)).astype(np.float32)
+
+        model_scores = {}
+        for mdl in self.models.keys():
+            n_input_frames = self.model_inputs[mdl]
+            x = np.lib.stride_tricks.sliding_window_view(features, n_input_frames, axis=0)
+            x = x[initial_features.shape[0] + 1 - n_input_frames:].transpose(0, 2, 1)
+            if self.model_supports_batching[mdl]:
+                model_scores[mdl] = np.asarray(
+                    self.model_prediction_function[mdl](np.ascontiguousarray(x))[0]).reshape(n_frames, -1)
+            else:
+                model_scores[mdl] = np.vstack([
+                    np.asarray(self.model_prediction_function[mdl](i[None, ])[0]).reshape(1, -1) for i in x
+                ])
+
+        for ndx, (_, mdl, column) in enumerate(self.label_columns):
+            scores[:, ndx] = model_scores[mdl][:, column]
+
+        # Zero predictions for first 5 frames during model initialization
+        scores[0:5] = 0.0
+
+        if return_features:
+            return scores, features
+        return scores
+
     def _get_positive_prediction_frames(
             self,
             file: str,
@@ -464,7 +1084,7 @@ class Model():
             for lbl in predictions.keys():
                 if predictions[lbl] >= threshold:
                     mdl = self.get_parent_model_from_label(lbl)
-                    features = self.preprocessor.get_features(self.model_inputs[mdl])
+                    features = self.preprocessor.get_features(self.model_inputs[mdl]).copy()
                     if return_type == 'features':
                         positive_data[lbl].append(features)
                     if return_type == 'audio':
@@ -478,27 +1098,226 @@ class Model():
 
         return positive_data_combined
 
-    def _suppress_noise_with_speex(self, x: np.ndarray, frame_size: int = 160):
+
+class MultiStreamModel():
+    """
+    A model class for running openWakeWord on many independent audio streams at once. Each stream keeps
+    its own audio, melspectrogram, and feature buffers, but for every 80 ms frame the melspectrogram,
+    embedding, and wakeword models are run with a single batched call across all of the active streams.
+    """
+    def __init__(
+            self,
+            wakeword_models: List[str] = [],
+            class_mapping_dicts: List[dict] = [],
+            inference_framework: str = "onnx",
+            max_latency_history: int = 1000,
+            **kwargs
+            ):
+        """Initialize the multi-stream openWakeWord model object.
+
+        Args:
+            wakeword_models (List[str]): A list of paths of ONNX/tflite models to load (see `Model`)
+            class_mapping_dicts (List[dict]): A list of dictionaries with integer to string class mappings for
+                                              each model in the `wakeword_models` arguments (see `Model`)
+            inference_framework (str): The inference framework to use when for model prediction. Options are
+                                       "tflite" or "onnx". The default is "onnx", as the ONNX melspectrogram
+                                       model supports batched inputs.
+            max_latency_history (int): How many of the most recent frame (tick) latencies to keep when
+                                       computing statistics with the `get_stats` method.
+            kwargs (dict): Any other keyword arguments to pass the the preprocessor instance
+        """
+        self.model = Model(wakeword_models=wakeword_models, class_mapping_dicts=class_mapping_dicts,
+                           inference_framework=inference_framework, **kwargs)
+        self.preprocessor = self.model.preprocessor
+
+        self.labels = self.model.labels
+
+        # Initial state copied into every new stream
+        self._initial_features = self.preprocessor._get_initial_features()
+
+        self.streams: Dict = {}
+        self.tick_latencies: deque = deque(maxlen=max_latency_history)
+        self.tick_batch_sizes: deque = deque(maxlen=max_latency_history)
+
+    def add_stream(self, stream_id):
+        """Creates the buffers for a new stream. Streams are also created automatically by `predict`."""
+        self.streams[stream_id] = {
+            "raw_data_buffer": RingBuffer(1280*4, dtype=np.int16),
+            "melspectrogram_buffer": RingBuffer(self.preprocessor.melspectrogram_max_len, (32,), dtype=np.float32),
+            "feature_buffer": RingBuffer(self.preprocessor.feature_buffer_max_len, (96,), dtype=np.float32),
+            "remainder": np.empty(0, dtype=np.int16),
+            "n_frames": 0,
+            "last_scores": np.zeros(len(self.labels), dtype=np.float32),
+            "vad_scores": deque(maxlen=125)
+        }
+        self.reset_stream(stream_id)
+
+    def reset_stream(self, stream_id):
+        """Resets the buffers of an existing stream"""
+        stream = self.streams[stream_id]
+        stream["raw_data_buffer"].clear()
+        stream["raw_data_buffer"].extend(np.zeros(160*3, dtype=np.int16))
+        stream["melspectrogram_buffer"].clear()
+        stream["melspectrogram_buffer"].extend(np.ones((76, 32), dtype=np.float32))
+        stream["feature_buffer"].clear()
+        stream["feature_buffer"].extend(self._initial_features)
+        stream["remainder"] = np.empty(0, dtype=np.int16)
+        stream["n_frames"] = 0
+        stream["last_scores"][:] = 0
+        stream["vad_scores"].clear()
+        if self.model.vad_threshold > 0:
+            self.model.vad.reset_stream(stream_id)
+
+    def remove_stream(self, stream_id):
+        """Removes a stream and its buffers"""
+        self.streams.pop(stream_id, None)
+        if self.model.vad_threshold > 0:
+            self.model.vad.remove_stream(stream_id)
+
+    def _predict_melspectrogram_batch(self, x):
         """
-        Runs the input audio through the SpeexDSP noise suppression algorithm.
-        Note that this function updates the state of the existing Speex noise
-        suppression object, and isn't intended to be called externally.
+        Computes the melspectrogram of a batch of audio, returning an array of shape (N, frames, 32).
+
+        The ONNX melspectrogram model limits the dynamic range relative to the maximum of its entire input, so
+        the batch is computed with the version of the model that does this for each stream separately (or with
+        one call per stream, if it isn't available), so that the streams don't change each other's features.
+        """
+        predict = self.preprocessor._get_batch_melspectrogram_predict()
+        if predict is not None:
+            spec = predict(x)[0]
+        else:
+            spec = np.concatenate([self.preprocessor.melspec_model_predict(i[None, ])[0] for i in x])
+        return spec.reshape(x.shape[0], -1, 32)/10 + 2  # same transform as AudioFeatures._get_melspectrogram
+
+    def _predict_model_batch(self, mdl, x):
+        """Predicts with a wakeword model on a batch of feature windows, returning an array of shape (N, outputs)"""
+        if self.model.model_supports_batching[mdl]:
+            return np.asarray(self.model.model_prediction_function[mdl](x)[0]).reshape(x.shape[0], -1)
+        else:
+            return np.vstack([np.asarray(self.model.model_prediction_function[mdl](i[None, ])[0]).reshape(1, -1)
+                              for i in x])
+
+    def _tick(self, stream_ids, offset):
+        """Processes one 80 ms frame from each of the provided streams in a single batch"""
+        start = time.perf_counter()
+        streams = [self.streams[i] for i in stream_ids]
+        batch_size = len(streams)
+
+        # Batched melspectrogram from the last 1760 samples (1280 new + 480 of context) of each stream
+        raw = np.empty((batch_size, 1280 + 160*3), dtype=np.float32)
+        for ndx, stream in enumerate(streams):
+            stream["raw_data_buffer"].extend(stream["remainder"][offset:offset+1280])
+            raw[ndx] = stream["raw_data_buffer"][-1280 - 160*3:]
+        melspecs = self._predict_melspectrogram_batch(raw)
+
+        # Batched embeddings from the last 76 melspectrogram frames of each stream
+        windows = np.empty((batch_size, 76, 32, 1), dtype=np.float32)
+        for ndx, stream in enumerate(streams):
+            stream["melspectrogram_buffer"].extend(melspecs[ndx])
+            windows[ndx, :, :, 0] = stream["melspectrogram_buffer"][-76:]
+        embeddings = self.preprocessor.embedding_model_predict(windows).reshape(batch_size, 96)
+        for ndx, stream in enumerate(streams):
+            stream["feature_buffer"].extend(embeddings[ndx])
+            stream["n_frames"] += 1
+
+        # Batched predictions with each wakeword model
+        model_scores = {}
+        for mdl in self.model.models.keys():
+            n_input_frames = self.model.model_inputs[mdl]
+            x = np.stack([stream["feature_buffer"][-n_input_frames:] for stream in streams])
+            model_scores[mdl] = self._predict_model_batch(mdl, x)
+
+        scores = np.empty((batch_size, len(self.labels)), dtype=np.float32)
+        for ndx, (_, mdl, column) in enumerate(self.model.label_columns):
+            scores[:, ndx] = model_scores[mdl][:, column]
+
+        # Zero predictions for first 5 frames during model initialization
+        for ndx, stream in enumerate(streams):
+            if stream["n_frames"] <= 5:
+                scores[ndx] = 0.0
+
+        # (optionally) get batched voice activity detection scores for all streams, and zero the scores
+        # of streams without voice activity from 0.4 to 0.56 seconds before the current frame (as in `Model`)
+        if self.model.vad_threshold > 0:
+            vad_scores = self.model.vad.predict_streams(
+                {i: stream["remainder"][offset:offset+1280] for i, stream in zip(stream_ids, streams)},
+                frame_size=160*4
+            )
+            for ndx, (stream_id, stream) in enumerate(zip(stream_ids, streams)):
+                stream["vad_scores"].append(vad_scores[stream_id])
+                vad_frames = list(stream["vad_scores"])[-7:-4]
+                if (max(vad_frames) if len(vad_frames) > 0 else 0) < self.model.vad_threshold:
+                    scores[ndx] = 0.0
+
+        self.tick_latencies.append(time.perf_counter() - start)
+        self.tick_batch_sizes.append(batch_size)
+        return scores
+
+    def predict(self, x: dict):
+        """Predict with all of the wakeword models on the input audio frames of each stream
 
         Args:
-            x (ndarray): The 16-bit, 16khz audio to process. Must always be an
-                         integer multiple of `frame_size`.
-            frame_size (int): The frame size to use for the Speex Noise suppressor.
-                              Must match the frame size specified during the
-                              initialization of the noise suppressor.
+            x (dict): A dictionary where the keys are stream ids and the values are Numpy arrays of
+                      16-bit, 16 khz audio. As with `Model.predict`, the audio should ideally be
+                      multiples of 80 ms (1280 samples); shorter inputs are accumulated until a full
+                      frame is available. New stream ids are added automatically.
+
+        Returns:
+            dict: A dictionary where the keys are the stream ids and the values are dictionaries of
+                  scores for each label. When more than one 80 ms frame is processed for a stream,
+                  the maximum score across the frames is returned, and when no complete frame is
+                  available, the previous scores are returned.
+        """
+        n_hops = {}
+        for stream_id, audio in x.items():
+            if not isinstance(audio, np.ndarray):
+                raise ValueError("The input audio data must by Numpy arrays, instead received an object of "
+                                 f"type {type(audio)} for stream '{stream_id}'.")
+            if stream_id not in self.streams:
+                self.add_stream(stream_id)
+            stream = self.streams[stream_id]
+            stream["remainder"] = np.concatenate((stream["remainder"], audio.astype(np.int16)))
+            n_hops[stream_id] = stream["remainder"].shape[0]//1280
+
+        # Process frames across all streams, in order
+        max_scores: Dict = {}
+        for hop in range(max(n_hops.values(), default=0)):
+            stream_ids = [i for i in n_hops.keys() if n_hops[i] > hop]
+            scores = self._tick(stream_ids, hop*1280)
+            for stream_id, score in zip(stream_ids, scores):
+                max_scores[stream_id] = np.maximum(max_scores[stream_id], score) if hop > 0 else score
+
+        predictions = {}
+        for stream_id in x.keys():
+            stream = self.streams[stream_id]
+            stream["remainder"] = stream["remainder"][n_hops[stream_id]*1280:]
+            if stream_id in max_scores:
+                stream["last_scores"][:] = max_scores[stream_id]
+            predictions[stream_id] = dict(zip(self.labels, stream["last_scores"].tolist()))
+
+        return predictions
+
+    def get_stats(self):
+        """
+        Summarizes the latency of the recent batched frames (ticks), and estimates how many real-time
+        streams can be processed per CPU core.
 
         Returns:
-            ndarray: The input audio with noise suppression applied
+            dict: A dictionary with the number of streams, the mean batch size, the p50/p95/p99 tick latency
+                  (in milliseconds), the real-time factor (tick latency / 80 ms), and the estimated number of
+                  real-time streams per core.
         """
-        cleaned = []
-        for i in range(0, x.shape[0], frame_size):
-            chunk = x[i:i+frame_size]
-            cleaned.append(self.speex_ns.process(chunk.tobytes()))
-
-        cleaned_bytestring = b''.join(cleaned)
-        cleaned_array = np.frombuffer(cleaned_bytestring, np.int16)
-        return cleaned_array
+        if len(self.tick_latencies) == 0:
+            return {}
+
+        latencies = np.array(self.tick_latencies)
+        batch_sizes = np.array(self.tick_batch_sizes)
+        return {
+            "n_streams": len(self.streams),
+            "mean_batch_size": float(batch_sizes.mean()),
+            "tick_latency_p50_ms": float(np.percentile(latencies, 50)*1000),
+            "tick_latency_p95_ms": float(np.percentile(latencies, 95)*1000),
+            "tick_latency_p99_ms": float(np.percentile(latencies, 99)*1000),
+            "real_time_factor": float(latencies.mean()/0.08),
+            "streams_per_core": float((batch_sizes*0.08/latencies).mean()/self.preprocessor.ncpu)
+        }
@@ -0,0 +1,204 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This file contains streaming noise suppression stages that can be used to pre-process
+# the audio passed to openWakeWord models.
+
+# Imports
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+
+
+class NoiseSuppressor(ABC):
+    """
+    Base class for streaming noise suppressors that process audio in fixed-size frames.
+
+    Inputs of any length can be passed to `process`: the samples after the last complete frame
+    are kept in an internal remainder and processed with the next input. The input buffer is
+    preallocated, and only grows when an input is larger than any previous input. The output is
+    written to the buffer passed as `out` (so that streaming doesn't allocate), or to a new array.
+    """
+    def __init__(self, frame_size: int = 160, sample_rate: int = 16000, max_input_samples: int = 1280*4):
+        """
+        Initialize the NoiseSuppressor object.
+
+        Args:
+            frame_size (int): The number of samples in each frame processed by the algorithm
+            sample_rate (int): The sample rate of the audio (default: 16000 khz)
+            max_input_samples (int): The initial capacity of the input buffer (in samples)
+        """
+        self.frame_size = frame_size
+        self.sample_rate = sample_rate
+        self._input = np.zeros(max_input_samples + frame_size, dtype=np.int16)
+        self.n_remainder = 0
+
+    def reset(self):
+        """Clears the internal remainder and the state of the algorithm"""
+        self.n_remainder = 0
+
+    @abstractmethod
+    def _process_frames(self, x: np.ndarray, out: np.ndarray):
+        """Processes `x` (an integer number of frames) and writes the result to `out`"""
+
+    def process(self, x: np.ndarray, out: Optional[np.ndarray] = None):
+        """
+        Runs the input audio through the noise suppression algorithm.
+
+        Args:
+            x (ndarray): The 16-bit, 16khz audio to process, of any length
+            out (ndarray): An int16 buffer to write the processed audio to, which must be able to hold
+                           `x.shape[0] + frame_size - 1` samples. If None, a new array is returned.
+
+        Returns:
+            ndarray: The processed audio for all of the complete frames available (including
+                     the remainder of previous inputs), which is the start of `out` if it is provided
+        """
+        n_samples = self.n_remainder + x.shape[0]
+        if n_samples > self._input.shape[0]:
+            self._input = np.concatenate((self._input[0:self.n_remainder], np.zeros(n_samples - self.n_remainder,
+                                                                                     dtype=np.int16)))
+
+        self._input[self.n_remainder:n_samples] = x
+        n_frame_samples = (n_samples//self.frame_size)*self.frame_size
+        if out is None:
+            out = np.empty(n_frame_samples, dtype=np.int16)
+        elif out.shape[0] < n_frame_samples:
+            raise ValueError(f"The output buffer has {out.shape[0]} samples, but {n_frame_samples} are needed!")
+        if n_frame_samples > 0:
+            self._process_frames(self._input[0:n_frame_samples], out[0:n_frame_samples])
+
+        # Move the remaining samples to the start of the input buffer
+        self.n_remainder = n_samples - n_frame_samples
+        self._input[0:self.n_remainder] = self._input[n_frame_samples:n_samples]
+
+        return out[0:n_frame_samples]
+
+    def __call__(self, x: np.ndarray, out: Optional[np.ndarray] = None):
+        return self.process(x, out=out)
+
+
+class SpeexNoiseSuppressor(NoiseSuppressor):
+    """
+    Noise suppression with the SpeexDSP library (requires the `speexdsp_ns` package).
+    The output for each frame is written directly to the output buffer, without joining and
+    re-parsing the frames.
+    """
+    def __init__(self, frame_size: int = 160, sample_rate: int = 16000, **kwargs):
+        from speexdsp_ns import NoiseSuppression
+        self._noise_suppression_class = NoiseSuppression
+        self.speex_ns = NoiseSuppression.create(frame_size, sample_rate)
+        super().__init__(frame_size=frame_size, sample_rate=sample_rate, **kwargs)
+
+    def reset(self):
+        """Clears the internal remainder and re-initializes the Speex noise suppressor"""
+        super().reset()
+        self.speex_ns = self._noise_suppression_class.create(self.frame_size, self.sample_rate)
+
+    def _process_frames(self, x, out):
+        # The Speex bindings only accept byte strings, so convert the input once and pass slices of it
+        data = x.tobytes()
+        n_bytes = 2*self.frame_size
+        for i in range(0, x.shape[0]//self.frame_size):
+            out[i*self.frame_size:(i+1)*self.frame_size] = np.frombuffer(
+                self.speex_ns.process(data[i*n_bytes:(i+1)*n_bytes]), np.int16
+            )
+
+
+class SpectralSubtractionNoiseSuppressor(NoiseSuppressor):
+    """
+    A pure NumPy noise suppressor for hosts without the SpeexDSP library, using spectral subtraction
+    with a minimum-statistics noise estimate.
+
+    Frames are analyzed with a 50% overlapping square-root Hann window (twice the frame size) and
+    re-synthesized with overlap-add, so the output is delayed by one frame (10 ms by default) relative
+    to the input.
+    """
+    def __init__(self,
+                 frame_size: int = 160,
+                 sample_rate: int = 16000,
+                 over_subtraction: float = 2.0,
+                 gain_floor: float = 0.1,
+                 smoothing: float = 0.7,
+                 noise_rise: float = 0.002,
+                 **kwargs
+                 ):
+        """
+        Initialize the SpectralSubtractionNoiseSuppressor object.
+
+        Args:
+            frame_size (int): The number of samples in each frame (the hop size of the analysis)
+            sample_rate (int): The sample rate of the audio (default: 16000 khz)
+            over_subtraction (float): The multiplier of the noise estimate subtracted from each frame
+            gain_floor (float): The minimum gain applied to each frequency bin (0.1 = -20 dB)
+            smoothing (float): The exponential smoothing factor of the power spectrum used to track the noise
+            noise_rise (float): The maximum relative increase of the noise estimate per frame
+            kwargs: Any other keyword arguments to pass to `NoiseSuppressor`
+        """
+        super().__init__(frame_size=frame_size, sample_rate=sample_rate, **kwargs)
+        self.over_subtraction = over_subtraction
+        self.gain_floor = gain_floor
+        self.smoothing = smoothing
+        self.noise_rise = noise_rise
+
+        window_size = 2*frame_size
+        self.window = np.sqrt(np.hanning(window_size + 1)[0:window_size]).astype(np.float32)
+        self.reset()
+
+    def reset(self):
+        """Clears the internal remainder and the noise estimate"""
+        super().reset()
+        self._samples = np.zeros(self.frame_size + self._input.shape[0], dtype=np.float32)
+        self._overlap = np.zeros(self.frame_size, dtype=np.float32)
+        self._smoothed_power = None
+        self._noise_power = None
+
+    def _process_frames(self, x, out):
+        n_frames = x.shape[0]//self.frame_size
+        if self._samples.shape[0] < x.shape[0] + self.frame_size:
+            self._samples = np.concatenate((self._samples[0:self.frame_size],
+                                            np.zeros(x.shape[0], dtype=np.float32)))
+
+        # Analyze all of the frames at once, using the last frame of the previous input as the first half-window
+        samples = self._samples[0:x.shape[0] + self.frame_size]
+        samples[self.frame_size:] = x
+        frames = np.lib.stride_tricks.sliding_window_view(samples, 2*self.frame_size)[::self.frame_size]
+        spectrum = np.fft.rfft(frames*self.window, axis=1)
+        power = spectrum.real**2 + spectrum.imag**2
+
+        # Track the noise power as the (slowly rising) minimum of the smoothed power spectrum
+        noise = np.empty_like(power)
+        if self._noise_power is None:
+            self._smoothed_power = power[0].copy()
+            self._noise_power = power[0].copy()
+        for i in range(n_frames):
+            self._smoothed_power *= self.smoothing
+            self._smoothed_power += (1 - self.smoothing)*power[i]
+            np.minimum(self._smoothed_power, self._noise_power*(1 + self.noise_rise), out=self._noise_power)
+            noise[i] = self._noise_power
+
+        gain = np.sqrt(np.maximum(1 - self.over_subtraction*noise/np.maximum(power, 1e-6), self.gain_floor**2))
+        frames_cleaned = np.fft.irfft(spectrum*gain, n=2*self.frame_size, axis=1)*self.window
+
+        # Overlap-add the frames into the output (in the first half of each frame, which isn't needed afterwards)
+        output = frames_cleaned[:, 0:self.frame_size]
+        output[0] += self._overlap
+        output[1:] += frames_cleaned[:-1, self.frame_size:]
+        self._overlap[:] = frames_cleaned[-1, self.frame_size:]
+        np.clip(output, -32768, 32767, out=output)
+        out.reshape(n_frames, self.frame_size)[:] = output
+
+        # Keep the last frame for the next input
+        samples[0:self.frame_size] = samples[-self.frame_size:]
@@ -0,0 +1,187 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This file contains functions to create INT8 quantized versions of the openWakeWord ONNX models
+# (the melspectrogram and embedding feature models, and the wakeword models) with onnxruntime's
+# quantization tools. Quantized models are saved next to the original models with an "_int8"
+# suffix, which is where `openwakeword.Model(..., precision="int8")` looks for them.
+
+# Imports
+import os
+import pathlib
+from typing import List, Optional
+
+import numpy as np
+
+FEATURE_MODELS_DIR = os.path.join(pathlib.Path(__file__).parent.resolve(), "resources", "models")
+
+
+def get_quantized_model_path(model_path: str, precision: str = "int8"):
+    """Gets the path of the quantized version of a model (e.g., "model.onnx" -> "model_int8.onnx")"""
+    stem, extension = os.path.splitext(model_path)
+    return f"{stem}_{precision}{extension}"
+
+
+def quantize_onnx_model(
+        model_path: str,
+        output_path: Optional[str] = None,
+        mode: str = "dynamic",
+        calibration_data: Optional[np.ndarray] = None,
+        per_channel: bool = False
+        ):
+    """
+    Quantizes the weights (and for static quantization, the activations) of an ONNX model to INT8.
+
+    Args:
+        model_path (str): The path to the float32 ONNX model
+        output_path (str): The path of the quantized model (default: `get_quantized_model_path(model_path)`)
+        mode (str): Either "dynamic" (INT8 weights, with activations quantized on the fly) or "static"
+                    (INT8 weights and activations, with activation ranges from `calibration_data`)
+        calibration_data (ndarray): Representative inputs of the model, with the examples along the first axis.
+                                    Required for static quantization.
+        per_channel (bool): Whether to quantize the weights per output channel
+
+    Returns:
+        str: The path of the quantized model
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+
+    output_path = output_path or get_quantized_model_path(model_path)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    if mode == "dynamic":
+        quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8, per_channel=per_channel)
+    elif mode == "static":
+        if calibration_data is None or len(calibration_data) == 0:
+            raise ValueError("Static quantization requires calibration data!")
+
+        model_input = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0]
+
+        class ArrayDataReader(CalibrationDataReader):
+            """Provides the calibration examples to the quantizer one at a time"""
+            def __init__(self, data):
+                self.examples = iter(data)
+
+            def get_next(self):
+                example = next(self.examples, None)
+                if example is None:
+                    return None
+                return {model_input.name: example[None, ].astype(np.float32)}
+
+        quantize_static(model_path, output_path, ArrayDataReader(calibration_data), quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=per_channel,
+                        calibrate_method=CalibrationMethod.MinMax)
+    else:
+        raise ValueError(f"Unknown quantization mode '{mode}', must be 'dynamic' or 'static'!")
+
+    return output_path
+
+
+def load_calibration_features(feature_files: List[str], n_input_frames: int, max_examples: int = 1000,
+                              seed: int = 0):
+    """
+    Gets random windows of audio features for calibrating wakeword models, from feature files created
+    by the training pipeline (e.g., "positive_features_train.npy" and "negative_features_train.npy"
+    of shape (N, frames, 96), or continuous features of shape (frames, 96)), or from feature stores.
+
+    Args:
+        feature_files (List[str]): The paths of the .npy feature files or feature store directories
+        n_input_frames (int): The number of feature frames of each window (the input size of the model)
+        max_examples (int): The maximum number of windows from each file
+        seed (int): The random seed used to select the windows
+
+    Returns:
+        ndarray: An array of shape (n_windows, n_input_frames, 96)
+    """
+    from openwakeword.feature_store import open_features
+
+    rng = np.random.RandomState(seed)
+    windows = []
+    for feature_file in feature_files:
+        data = open_features(feature_file)
+        if data.ndim == 2:
+            starts = rng.randint(0, data.shape[0] - n_input_frames + 1, min(max_examples, data.shape[0]))
+            windows.extend([data[i:i+n_input_frames] for i in starts])
+        else:
+            rows = rng.choice(data.shape[0], min(max_examples, data.shape[0]), replace=False)
+            starts = rng.randint(0, data.shape[1] - n_input_frames + 1, rows.shape[0])
+            windows.extend([data[i, j:j+n_input_frames] for i, j in zip(sorted(rows), starts)])
+
+    return np.array(windows, dtype=np.float32)
+
+
+def get_feature_model_calibration_data(clips: List[np.ndarray], max_examples: int = 1000, seed: int = 0):
+    """
+    Gets calibration inputs for the melspectrogram and embedding models from audio clips, matching the
+    inputs used during streaming prediction (1760 sample windows and 76 frame melspectrogram windows).
+
+    Args:
+        clips (List[ndarray]): The 16-bit, 16 khz audio clips
+        max_examples (int): The maximum number of inputs for each model
+        seed (int): The random seed used to select the inputs
+
+    Returns:
+        dict: The calibration inputs for the "melspectrogram" and "embedding" models
+    """
+    from openwakeword.utils import AudioFeatures
+
+    F = AudioFeatures(inference_framework="onnx", autotune_profile=False)
+    audio_windows, melspec_windows = [], []
+    for clip in clips:
+        audio_windows.extend([clip[i:i+1760] for i in range(0, clip.shape[0] - 1760 + 1, 1280)])
+        melspec = F._get_melspectrogram(clip)
+        melspec_windows.extend([melspec[i:i+76] for i in range(0, melspec.shape[0] - 76 + 1, 8)])
+    F.close()
+
+    rng = np.random.RandomState(seed)
+    audio_ndcs = rng.permutation(len(audio_windows))[0:max_examples]
+    melspec_ndcs = rng.permutation(len(melspec_windows))[0:max_examples]
+    return {
+        "melspectrogram": np.array([audio_windows[i] for i in audio_ndcs], dtype=np.float32),
+        "embedding": np.array([melspec_windows[i] for i in melspec_ndcs], dtype=np.float32)[..., None]
+    }
+
+
+def quantize_feature_models(mode: str = "dynamic", calibration_clips: Optional[List[np.ndarray]] = None,
+                            output_dir: Optional[str] = None, **kwargs):
+    """
+    Quantizes the melspectrogram and embedding models included with openWakeWord.
+
+    Args:
+        mode (str): The quantization mode (see `quantize_onnx_model`)
+        calibration_clips (List[ndarray]): Representative 16-bit, 16 khz audio clips, required for
+                                           static quantization
+        output_dir (str): The directory of the quantized models (default: next to the original models)
+        kwargs: Any other keyword arguments to pass to `quantize_onnx_model`
+
+    Returns:
+        dict: The paths of the quantized "melspectrogram" and "embedding" models
+    """
+    calibration_data = {}
+    if mode == "static":
+        if calibration_clips is None:
+            raise ValueError("Static quantization of the feature models requires calibration clips!")
+        calibration_data = get_feature_model_calibration_data(calibration_clips)
+
+    output_paths = {}
+    for name, filename in [("melspectrogram", "melspectrogram.onnx"), ("embedding", "embedding_model.onnx")]:
+        model_path = os.path.join(FEATURE_MODELS_DIR, filename)
+        output_path = get_quantized_model_path(model_path)
+        if output_dir is not None:
+            output_path = os.path.join(output_dir, os.path.basename(output_path))
+        output_paths[name] = quantize_onnx_model(model_path, output_path, mode=mode,
+                                                 calibration_data=calibration_data.get(name), **kwargs)
+
+    return output_paths
@@ -0,0 +1,156 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This file contains a process-wide registry of ONNX Runtime inference sessions, so that
+# openWakeWord objects using the same models share sessions instead of loading them again.
+
+# Imports
+import hashlib
+import os
+import platform
+import threading
+from typing import Callable, Dict, Hashable, List, Optional, Union
+
+# The names of the ONNX Runtime execution modes and graph optimization levels that can be used in session options
+EXECUTION_MODES = {"sequential": "ORT_SEQUENTIAL", "parallel": "ORT_PARALLEL"}
+GRAPH_OPTIMIZATION_LEVELS = {"disable": "ORT_DISABLE_ALL", "basic": "ORT_ENABLE_BASIC",
+                             "extended": "ORT_ENABLE_EXTENDED", "all": "ORT_ENABLE_ALL"}
+
+
+class SessionRegistry():
+    """
+    A process-wide, reference-counted registry of ONNX Runtime inference sessions, keyed by the
+    model and the session options. Sessions are created on the first `acquire` call for a key,
+    returned again by later calls, and dropped by the registry once every `acquire` has been
+    matched by a `release`.
+
+    Optionally, the optimized graph of each model can be cached on disk (with ONNX Runtime's
+    `optimized_model_filepath` option), so that later loads (including in other processes)
+    skip graph optimization.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sessions: Dict[tuple, list] = {}  # key -> [session, reference count]
+        self._session_keys: Dict[int, tuple] = {}  # id(session) -> key
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def acquire(self,
+                model_key: Hashable,
+                model_loader: Optional[Callable[[], Union[str, bytes]]] = None,
+                n_threads: int = 1,
+                providers: List[str] = ["CPUExecutionProvider"],
+                cache_dir: Optional[str] = None,
+                session_options: Optional[dict] = None
+                ):
+        """
+        Gets a shared inference session, creating it if needed.
+
+        Args:
+            model_key (Hashable): Identifies the model, usually its path. Models that are transformed
+                                  before loading (e.g., with a dynamic batch dimension) need a key that
+                                  also identifies the transformation, like `("batchable", path)`.
+            model_loader (Callable): A function returning the model path or serialized model bytes to load.
+                                     If not provided, `model_key` is used as the model path.
+            n_threads (int): The number of intra-op and inter-op threads of the session
+            providers (List[str]): The ONNX Runtime execution providers of the session
+            cache_dir (str): A directory for the optimized models. If not provided, optimized
+                             models are not cached.
+            session_options (dict): Other session options, which override `n_threads`. The supported keys are
+                                    "intra_op_num_threads", "inter_op_num_threads", "execution_mode"
+                                    ("sequential" or "parallel") and "graph_optimization_level"
+                                    ("disable", "basic", "extended", or "all").
+
+        Returns:
+            onnxruntime.InferenceSession: The inference session
+        """
+        session_options = dict(session_options or {})
+        key = (model_key, n_threads, tuple(providers), cache_dir, tuple(sorted(session_options.items())))
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                loader = model_loader if model_loader is not None else (lambda: model_key)
+                session = self._create_session(model_key, loader, n_threads, providers, cache_dir, session_options)
+                entry = self._sessions[key] = [session, 0]
+                self._session_keys[id(session)] = key
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, session):
+        """Releases a session returned by `acquire`, dropping it from the registry when it is no longer used"""
+        with self._lock:
+            key = self._session_keys.get(id(session))
+            if key is None:
+                return
+            entry = self._sessions[key]
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._sessions[key]
+                del self._session_keys[id(session)]
+
+    def clear(self):
+        """Drops all of the sessions from the registry"""
+        with self._lock:
+            self._sessions = {}
+            self._session_keys = {}
+
+    @staticmethod
+    def _get_cache_path(model_key: Hashable, providers: List[str], cache_dir: str, optimization_level: str):
+        """Gets the path of the cached optimized model, which changes if the model files or runtime change"""
+        import onnxruntime as ort
+
+        paths = [model_key] if isinstance(model_key, str) else [i for i in model_key if isinstance(i, str)]
+        file_stats = [(i, os.path.getsize(i), os.path.getmtime(i)) for i in paths if os.path.isfile(i)]
+        fingerprint = repr((model_key, file_stats, tuple(providers), optimization_level, ort.__version__,
+                            platform.machine()))
+        name = os.path.splitext(os.path.basename(paths[-1]))[0] if paths else "model"
+        return os.path.join(cache_dir, f"{name}_{hashlib.sha1(fingerprint.encode()).hexdigest()[0:16]}.onnx")
+
+    @classmethod
+    def _create_session(cls, model_key, model_loader, n_threads, providers, cache_dir, session_options):
+        import onnxruntime as ort
+
+        sessionOptions = ort.SessionOptions()
+        sessionOptions.inter_op_num_threads = session_options.get("inter_op_num_threads", n_threads)
+        sessionOptions.intra_op_num_threads = session_options.get("intra_op_num_threads", n_threads)
+        if "execution_mode" in session_options:
+            sessionOptions.execution_mode = getattr(ort.ExecutionMode,
+                                                    EXECUTION_MODES[session_options["execution_mode"]])
+        optimization_level = session_options.get("graph_optimization_level", "all")
+        sessionOptions.graph_optimization_level = getattr(ort.GraphOptimizationLevel,
+                                                          GRAPH_OPTIMIZATION_LEVELS[optimization_level])
+
+        if cache_dir is None:
+            return ort.InferenceSession(model_loader(), sess_options=sessionOptions, providers=providers)
+
+        cache_path = cls._get_cache_path(model_key, providers, cache_dir, optimization_level)
+        if os.path.exists(cache_path):
+            sessionOptions.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            return ort.InferenceSession(cache_path, sess_options=sessionOptions, providers=providers)
+
+        # Write the optimized model to a temporary file first, so that other processes never load a partial file.
+        # The cache is specific to this host, so the warning about hardware-specific optimizations is silenced.
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+        sessionOptions.optimized_model_filepath = temporary_path
+        sessionOptions.log_severity_level = 3
+        session = ort.InferenceSession(model_loader(), sess_options=sessionOptions, providers=providers)
+        if os.path.exists(temporary_path):
+            os.replace(temporary_path, cache_path)
+        return session
+
+
+# The registry shared by all openWakeWord objects in the process
+session_registry = SessionRegistry()
@@ -13,10 +13,12 @@ import logging
 from tqdm import tqdm
 import yaml
 from pathlib import Path
+from functools import partial
 import openwakeword
 from openwakeword.data import generate_adversarial_texts, augment_clips, mmap_batch_generator
-from openwakeword.utils import compute_features_from_generator
+from openwakeword.utils import compute_features_from_generator, get_feature_checkpoint_path
 from openwakeword.utils import AudioFeatures
+from openwakeword.feature_store import is_feature_store, open_features, load_features
 
 
 # Base model class for an openwakeword model
@@ -532,7 +534,7 @@ class Model(nn.Module):
         """
 
         # Get features from clips
-        F = AudioFeatures(device='cpu', ncpu=4)
+        F = AudioFeatures(device='cpu', ncpu=4, autotune_workload="batch")
         features = F.embed_clips(clips, batch_size=16)
 
         # Predict on features
@@ -1435,6 +1437,21 @@ def main(Model, convert_onnx_to_tflite, args: argparse.Namespace, audio_folder=N
     for background_path, duplication_rate in zip(config["background_paths"], config["background_paths_duplication_rate"]):
         background_paths.extend([i.path for i in os.scandir(background_path)]*duplication_rate)
 
+    # Get the paths of the computed audio features, which are feature store directories (see `openwakeword.feature_store`)
+    # if "feature_store" is set in the config or they already exist, and otherwise .npy files
+    use_feature_store = False if ("feature_store" not in config or config["feature_store"] == None) else config["feature_store"]
+
+    def get_features_path(name):
+        path = os.path.join(augmented_audio_folder, name)
+        return path if use_feature_store or is_feature_store(path) else path + ".npy"
+
+    # Features are complete once they exist without the checkpoint of an interrupted `compute_features_from_generator`
+    def features_complete(name):
+        path = get_features_path(name)
+        return os.path.exists(path) and not os.path.exists(get_feature_checkpoint_path(path))
+
+    feature_names = ["positive_features_train", "positive_features_test", "negative_features_train", "negative_features_test"]
+
     # if args.generate_clips is True:
     #     # Generate positive clips for training
     #     logging.info("#"*50 + "\nGenerating positive clips for training\n" + "#"*50)
@@ -1533,7 +1550,7 @@ def main(Model, convert_onnx_to_tflite, args: argparse.Namespace, audio_folder=N
         negative_train_output_dir = os.path.join(audio_folder, "negative_train")
         negative_test_output_dir = os.path.join(audio_folder, "negative_test")
 
-        if not os.path.exists(os.path.join(augmented_audio_folder, "positive_features_train.npy")) or args.overwrite is True:
+        if not all(features_complete(name) for name in feature_names) or args.overwrite is True:
             # Load default augmentation probabilities
             default_augmentation_probabilities = {
                 "SevenBandParametricEQ": 0.25,
@@ -1549,29 +1566,38 @@ def main(Model, convert_onnx_to_tflite, args: argparse.Namespace, audio_folder=N
                                             if "augmentation_probabilities" not in config or "augmentation_probabilities" == None \
                                             else config["augmentation_probabilities"]
 
+            # Split the clips between parallel augmentation generators (consumed by `compute_features_from_generator`,
+            # which starts them at the batch to resume from)
+            n_augmentation_workers = 1 if ("augmentation_workers" not in config or config["augmentation_workers"] == None) \
+                                       else config["augmentation_workers"]
+
             positive_clips_train = [str(i) for i in Path(positive_train_output_dir).glob("*.wav")]*config["augmentation_rounds"]
-            positive_clips_train_generator = augment_clips(positive_clips_train, total_length=config["total_length"],
-                                                           batch_size=config["augmentation_batch_size"],
-                                                           background_clip_paths=background_paths,
-                                                           RIR_paths=rir_paths, augmentation_probabilities=augmentation_probabilities, config=config)
+            positive_clips_train_generator = [partial(augment_clips, positive_clips_train[k::n_augmentation_workers], total_length=config["total_length"],
+                                                                     batch_size=config["augmentation_batch_size"],
+                                                                     background_clip_paths=background_paths,
+                                                                     RIR_paths=rir_paths, augmentation_probabilities=augmentation_probabilities, config=config)
+                                              for k in range(n_augmentation_workers)]
 
             positive_clips_test = [str(i) for i in Path(positive_test_output_dir).glob("*.wav")]*config["augmentation_rounds"]
-            positive_clips_test_generator = augment_clips(positive_clips_test, total_length=config["total_length"],
-                                                          batch_size=config["augmentation_batch_size"],
-                                                          background_clip_paths=background_paths,
-                                                          RIR_paths=rir_paths, augmentation_probabilities=augmentation_probabilities, config=config)
+            positive_clips_test_generator = [partial(augment_clips, positive_clips_test[k::n_augmentation_workers], total_length=config["total_length"],
+                                                                    batch_size=config["augmentation_batch_size"],
+                                                                    background_clip_paths=background_paths,
+                                                                    RIR_paths=rir_paths, augmentation_probabilities=augmentation_probabilities, config=config)
+                                             for k in range(n_augmentation_workers)]
 
             negative_clips_train = [str(i) for i in Path(negative_train_output_dir).glob("*.wav")]*config["augmentation_rounds"]
-            negative_clips_train_generator = augment_clips(negative_clips_train, total_length=config["total_length"],
-                                                           batch_size=config["augmentation_batch_size"],
-                                                           background_clip_paths=background_paths,
-                                                           RIR_paths=rir_paths, augmentation_probabilities=augmentation_probabilities, config=config)
+            negative_clips_train_generator = [partial(augment_clips, negative_clips_train[k::n_augmentation_workers], total_length=config["total_length"],
+                                                                     batch_size=config["augmentation_batch_size"],
+                                                                     background_clip_paths=background_paths,
+                                                                     RIR_paths=rir_paths, augmentation_probabilities=augmentation_probabilities, config=config)
+                                              for k in range(n_augmentation_workers)]
 
             negative_clips_test = [str(i) for i in Path(negative_test_output_dir).glob("*.wav")]*config["augmentation_rounds"]
-            negative_clips_test_generator = augment_clips(negative_clips_test, total_length=config["total_length"],
-                                                          batch_size=config["augmentation_batch_size"],
-                                                          background_clip_paths=background_paths,
-                                                          RIR_paths=rir_paths, augmentation_probabilities=augmentation_probabilities, config=config)
+            negative_clips_test_generator = [partial(augment_clips, negative_clips_test[k::n_augmentation_workers], total_length=config["total_length"],
+                                                                    batch_size=config["augmentation_batch_size"],
+                                                                    background_clip_paths=background_paths,
+                                                                    RIR_paths=rir_paths, augmentation_probabilities=augmentation_probabilities, config=config)
+                                             for k in range(n_augmentation_workers)]
 
             # Compute features and save to disk via memmapped arrays
             logging.info("#"*50 + "\nComputing openwakeword features for generated samples\n" + "#"*50)
@@ -1580,36 +1606,50 @@ def main(Model, convert_onnx_to_tflite, args: argparse.Namespace, audio_folder=N
                 n_cpus = 1
             else:
                 n_cpus = n_cpus//2
-            compute_features_from_generator(positive_clips_train_generator, n_total=len(positive_clips_train), #n_total=len(os.listdir(positive_train_output_dir)),
-                                            clip_duration=config["total_length"],
-                                            output_file=os.path.join(augmented_audio_folder, "positive_features_train.npy"),
-                                            device="gpu" if torch.cuda.is_available() else "cpu",
-                                            ncpu=n_cpus if not torch.cuda.is_available() else 1)
-
-            compute_features_from_generator(positive_clips_test_generator, n_total=len(positive_clips_test), # n_total=len(os.listdir(positive_test_output_dir)),
-                                            clip_duration=config["total_length"],
-                                            output_file=os.path.join(augmented_audio_folder, "positive_features_test.npy"),
-                                            device="gpu" if torch.cuda.is_available() else "cpu",
-                                            ncpu=n_cpus if not torch.cuda.is_available() else 1)
-            
-            compute_features_from_generator(negative_clips_train_generator, n_total=len(negative_clips_train), #n_total=len(os.listdir(negative_train_output_dir)),
-                                            clip_duration=config["total_length"],
-                                            output_file=os.path.join(augmented_audio_folder, "negative_features_train.npy"),
-                                            device="gpu" if torch.cuda.is_available() else "cpu",
-                                            ncpu=n_cpus if not torch.cuda.is_available() else 1)
-
-            compute_features_from_generator(negative_clips_test_generator, n_total=len(negative_clips_test), # n_total=len(os.listdir(negative_test_output_dir)),
-                                            clip_duration=config["total_length"],
-                                            output_file=os.path.join(augmented_audio_folder, "negative_features_test.npy"),
-                                            device="gpu" if torch.cuda.is_available() else "cpu",
-                                            ncpu=n_cpus if not torch.cuda.is_available() else 1)
+            n_embedding_workers = 1 if ("embedding_workers" not in config or config["embedding_workers"] == None) \
+                                    else config["embedding_workers"]
+            if not features_complete("positive_features_train") or args.overwrite is True:
+                compute_features_from_generator(positive_clips_train_generator, n_total=len(positive_clips_train), #n_total=len(os.listdir(positive_train_output_dir)),
+                                                clip_duration=config["total_length"],
+                                                output_file=get_features_path("positive_features_train"),
+                                                device="gpu" if torch.cuda.is_available() else "cpu",
+                                                ncpu=n_cpus if not torch.cuda.is_available() else 1,
+                                                n_embedding_workers=n_embedding_workers,
+                                                resume=args.overwrite is not True)
+
+            if not features_complete("positive_features_test") or args.overwrite is True:
+                compute_features_from_generator(positive_clips_test_generator, n_total=len(positive_clips_test), # n_total=len(os.listdir(positive_test_output_dir)),
+                                                clip_duration=config["total_length"],
+                                                output_file=get_features_path("positive_features_test"),
+                                                device="gpu" if torch.cuda.is_available() else "cpu",
+                                                ncpu=n_cpus if not torch.cuda.is_available() else 1,
+                                                n_embedding_workers=n_embedding_workers,
+                                                resume=args.overwrite is not True)
+
+            if not features_complete("negative_features_train") or args.overwrite is True:
+                compute_features_from_generator(negative_clips_train_generator, n_total=len(negative_clips_train), #n_total=len(os.listdir(negative_train_output_dir)),
+                                                clip_duration=config["total_length"],
+                                                output_file=get_features_path("negative_features_train"),
+                                                device="gpu" if torch.cuda.is_available() else "cpu",
+                                                ncpu=n_cpus if not torch.cuda.is_available() else 1,
+                                                n_embedding_workers=n_embedding_workers,
+                                                resume=args.overwrite is not True)
+
+            if not features_complete("negative_features_test") or args.overwrite is True:
+                compute_features_from_generator(negative_clips_test_generator, n_total=len(negative_clips_test), # n_total=len(os.listdir(negative_test_output_dir)),
+                                                clip_duration=config["total_length"],
+                                                output_file=get_features_path("negative_features_test"),
+                                                device="gpu" if torch.cuda.is_available() else "cpu",
+                                                ncpu=n_cpus if not torch.cuda.is_available() else 1,
+                                                n_embedding_workers=n_embedding_workers,
+                                                resume=args.overwrite is not True)
         else:
             logging.warning("Openwakeword features already exist, skipping data augmentation and feature generation")
 
     # Create openwakeword model
     if args.train_model is True:
         F = openwakeword.utils.AudioFeatures(device='cpu')
-        input_shape = np.load(os.path.join(augmented_audio_folder, "positive_features_test.npy")).shape[1:]
+        input_shape = open_features(get_features_path("positive_features_test")).shape[1:]
         config["hidden_layers"]  =         1 if ("hidden_layers"  not in config or config["hidden_layers"]  == None) else config["hidden_layers"]
         config["weighting_mode"] = "default" if ("weighting_mode" not in config or config["weighting_mode"] == None) else config["weighting_mode"]
 
@@ -1649,8 +1689,8 @@ def main(Model, convert_onnx_to_tflite, args: argparse.Namespace, audio_folder=N
                 label_transforms[key] = negative_label_transform
 
         # Add generated positive and adversarial negative clips to the feature data files dictionary
-        config["feature_data_files"]['positive'] = os.path.join(augmented_audio_folder, "positive_features_train.npy")
-        config["feature_data_files"]['adversarial_negative'] = os.path.join(augmented_audio_folder, "negative_features_train.npy")
+        config["feature_data_files"]['positive'] = get_features_path("positive_features_train")
+        config["feature_data_files"]['adversarial_negative'] = get_features_path("negative_features_train")
 
         # Make PyTorch data loaders for training and validation data
         batch_generator = mmap_batch_generator(
@@ -1675,7 +1715,7 @@ def main(Model, convert_onnx_to_tflite, args: argparse.Namespace, audio_folder=N
         X_train = torch.utils.data.DataLoader(IterDataset(batch_generator),
                                               batch_size=None, num_workers=0, prefetch_factor=None)
 
-        X_val_fp = np.load(config["false_positive_validation_data_path"])
+        X_val_fp = load_features(config["false_positive_validation_data_path"])
         X_val_fp = np.array([X_val_fp[i:i+input_shape[0]] for i in range(0, X_val_fp.shape[0]-input_shape[0], 1)])  # reshape to match model
         X_val_fp_labels = np.zeros(X_val_fp.shape[0]).astype(np.float32)
         X_val_fp = torch.utils.data.DataLoader(
@@ -1683,8 +1723,8 @@ def main(Model, convert_onnx_to_tflite, args: argparse.Namespace, audio_folder=N
             batch_size=len(X_val_fp_labels)
         )
 
-        X_val_pos = np.load(os.path.join(augmented_audio_folder, "positive_features_test.npy"))
-        X_val_neg = np.load(os.path.join(augmented_audio_folder, "negative_features_test.npy"))
+        X_val_pos = load_features(get_features_path("positive_features_test"))
+        X_val_neg = load_features(get_features_path("negative_features_test"))
         labels = np.hstack((np.ones(X_val_pos.shape[0]), np.zeros(X_val_neg.shape[0]))).astype(np.float32)
 
         X_val = torch.utils.data.DataLoader(
@@ -14,18 +14,105 @@
 
 # Imports
 import os
+import hashlib
+import json
 import numpy as np
 import pathlib
-from collections import deque
 from multiprocessing.pool import ThreadPool
-from multiprocessing import Process, Queue
+from multiprocessing import Pool
 import time
+import threading
+import wave
 import logging
 from tqdm import tqdm
 from numpy.lib.format import open_memmap
-from typing import Union, List, Callable, Deque
+from typing import Union, List, Callable, Optional
 import requests
 import openwakeword
+from openwakeword.sessions import session_registry
+from openwakeword.autotune import resolve_profile
+
+# The initial feature buffer contents for each set of feature models, computed once per process
+# (see `AudioFeatures._get_initial_features`)
+_initial_features_cache: dict = {}
+
+# The maximum number of windows in each call of the embedding model on CPU (larger batches are slower, as the
+# intermediate tensors no longer fit in the CPU cache)
+EMBEDDING_MAX_CPU_BATCH_SIZE = 16
+
+class RingBuffer():
+    """
+    A fixed-capacity buffer of Numpy rows for streaming state. New rows are appended to the end and
+    the most recent `max_len` rows are always available as a single contiguous view, so reading the
+    buffer never copies. Storage is preallocated at twice the capacity, and when the end of the storage
+    is reached the retained rows are moved back to the start (amortized, and without new allocations).
+    """
+    def __init__(self, max_len: int, row_shape: tuple = (), dtype=np.float32):
+        """
+        Initialize the RingBuffer object.
+
+        Args:
+            max_len (int): The maximum number of rows retained by the buffer
+            row_shape (tuple): The shape of each row (e.g., (32,) for melspectrogram frames)
+            dtype (np.dtype): The data type of the buffer
+        """
+        self.max_len = max_len
+        self.row_shape = tuple(row_shape)
+        self._data = np.zeros((2*max_len,) + self.row_shape, dtype=dtype)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def shape(self):
+        return (len(self),) + self.row_shape
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    def view(self):
+        """Returns a view (not a copy) of the rows currently stored in the buffer"""
+        return self._data[self._start:self._end]
+
+    def __getitem__(self, ndx):
+        return self.view()[ndx]
+
+    def clear(self):
+        """Removes all rows from the buffer"""
+        self._start = 0
+        self._end = 0
+
+    def extend(self, x: np.ndarray):
+        """
+        Appends rows to the end of the buffer, discarding the oldest rows beyond `max_len`.
+
+        Args:
+            x (ndarray): The rows to add, with shape (N, *row_shape). A single row without the
+                         leading dimension is also accepted.
+        """
+        x = np.asarray(x)
+        if x.ndim == len(self.row_shape):
+            x = x[None, ]
+        n = x.shape[0]
+        if n >= self.max_len:
+            self._data[0:self.max_len] = x[-self.max_len:]
+            self._start, self._end = 0, self.max_len
+            return
+
+        if self._end + n > self._data.shape[0]:
+            # Move the rows that will be retained back to the start of the storage.
+            # With a capacity of 2*max_len the source and target regions never overlap.
+            keep = min(len(self), self.max_len - n)
+            self._data[0:keep] = self._data[self._end-keep:self._end]
+            self._start, self._end = 0, keep
+
+        self._data[self._end:self._end+n] = x
+        self._end += n
+        self._start = max(self._start, self._end - self.max_len)
+
 
 # Base class for computing audio features using Google's speech_embedding
 # model (https://tfhub.dev/google/speech_embedding/1)
@@ -38,9 +125,14 @@ class AudioFeatures():
                  melspec_model_path: str = "",
                  embedding_model_path: str = "",
                  sr: int = 16000,
-                 ncpu: int = 1,
+                 ncpu: Optional[int] = None,
                  inference_framework: str = "onnx",
-                 device: str = 'cpu'
+                 device: str = 'cpu',
+                 onnx_cache_dir: Optional[str] = None,
+                 cache_initial_features: bool = False,
+                 autotune_profile: Union[bool, str, dict, None] = True,
+                 autotune_workload: str = "streaming",
+                 melspectrogram_frontend: str = "model"
                  ):
         """
         Initialize the AudioFeatures object.
@@ -49,7 +141,8 @@ class AudioFeatures():
             melspec_model_path (str): The path to the model for computing melspectograms from audio data
             embedding_model_path (str): The path to the model for Google's `speech_embedding` model
             sr (int): The sample rate of the audio (default: 16000 khz)
-            ncpu (int): The number of CPUs to use when computing melspectrograms and audio features (default: 1)
+            ncpu (int): The number of CPUs to use when computing melspectrograms and audio features. If not provided,
+                        the value from the autotune profile is used, or 1 if there isn't a profile.
             inference_framework (str): The inference framework to use when for model prediction. Options are
                                        "tflite" or "onnx". The default is "tflite" as this results in better
                                        efficiency on common platforms (x86, ARM64), but in some deployment
@@ -58,8 +151,43 @@ class AudioFeatures():
                           Note that depending on the inference framework selected and system configuration,
                           this setting may not have an effect. For example, to use a GPU with the ONNX
                           framework the appropriate onnxruntime package must be installed.
+            onnx_cache_dir (str): A directory to cache the optimized ONNX models in, so that later loads skip graph
+                                  optimization (see `openwakeword.sessions.SessionRegistry`). Not used with tflite.
+            cache_initial_features (bool): Whether to save the initial contents of the feature buffer to a file
+                                           next to the embedding model (and load them from it in later processes),
+                                           instead of computing them once per process.
+            autotune_profile (Union[bool, str, dict, None]): The autotune profile with the session options and
+                                                             batch parameters to use (see `openwakeword.autotune`).
+                                                             True (the default) loads the profile for this host if
+                                                             it exists, a string loads the profile at that path,
+                                                             and False or None disables the profile. Explicit
+                                                             arguments take precedence.
+            autotune_workload (str): Which tuned session options of the profile to use, either "streaming" (for
+                                     processing audio in small chunks) or "batch" (for `embed_clips`).
+            melspectrogram_frontend (str): How to compute melspectrograms, either "model" (the default, with the
+                                           melspectrogram model of the inference framework) or "numpy" (with
+                                           `openwakeword.melspectrogram.NumpyMelSpectrogram`, which matches the
+                                           ONNX model, has a lower per-frame latency, and gives identical results
+                                           in streaming and whole-clip mode).
         """
-        # Initialize the models with the appropriate framework
+        # Initialize the models with the appropriate framework. ONNX sessions are shared with other objects
+        # in the process that use the same models and options.
+        self.inference_framework = inference_framework
+        if melspectrogram_frontend not in ("model", "numpy"):
+            raise ValueError(f"Unknown melspectrogram frontend '{melspectrogram_frontend}', must be 'model' or 'numpy'!")
+        self.melspectrogram_frontend = melspectrogram_frontend
+        self._shared_sessions: list = []
+
+        # Get the session options and batch parameters from the autotune profile, if any
+        profile = resolve_profile(autotune_profile)
+        session_options = dict(profile.get(autotune_workload, {}).get("session_options", {}))
+        if ncpu is not None:
+            session_options.update(intra_op_num_threads=ncpu, inter_op_num_threads=ncpu)
+        else:
+            ncpu = session_options.get("intra_op_num_threads", 1)
+        self.ncpu = ncpu  # the threads of each model session
+        self.batch_size = profile.get("batch", {}).get("batch_size", 128)
+        self.batch_ncpu = profile.get("batch", {}).get("ncpu", 1)
         if inference_framework == "onnx":
             try:
                 import onnxruntime as ort
@@ -74,21 +202,22 @@ class AudioFeatures():
             if ".tflite" in melspec_model_path or ".tflite" in embedding_model_path:
                 raise ValueError("The onnx inference framework is selected, but tflite models were provided!")
 
-            # Initialize ONNX options
-            sessionOptions = ort.SessionOptions()
-            sessionOptions.inter_op_num_threads = ncpu
-            sessionOptions.intra_op_num_threads = ncpu
+            providers = ["CUDAExecutionProvider"] if device == "gpu" else ["CPUExecutionProvider"]
+            self._onnx_session_args = dict(n_threads=ncpu, providers=providers, cache_dir=onnx_cache_dir,
+                                           session_options=session_options)
 
             # Melspectrogram model
-            self.melspec_model = ort.InferenceSession(melspec_model_path, sess_options=sessionOptions,
-                                                      providers=["CUDAExecutionProvider"] if device == "gpu" else ["CPUExecutionProvider"])
-            self.onnx_execution_provider = self.melspec_model.get_providers()[0]
-            self.melspec_model_predict = lambda x: self.melspec_model.run(None, {'input': x})
+            if melspectrogram_frontend == "model":
+                self.melspec_model = session_registry.acquire(melspec_model_path, n_threads=ncpu, providers=providers,
+                                                              cache_dir=onnx_cache_dir, session_options=session_options)
+                self._shared_sessions.append(self.melspec_model)
+                self.melspec_model_predict = lambda x: self.melspec_model.run(None, {'input': x})
 
             # Audio embedding model
-            self.embedding_model = ort.InferenceSession(embedding_model_path, sess_options=sessionOptions,
-                                                        providers=["CUDAExecutionProvider"] if device == "gpu"
-                                                        else ["CPUExecutionProvider"])
+            self.embedding_model = session_registry.acquire(embedding_model_path, n_threads=ncpu, providers=providers,
+                                                            cache_dir=onnx_cache_dir, session_options=session_options)
+            self._shared_sessions.append(self.embedding_model)
+            self.onnx_execution_provider = self.embedding_model.get_providers()[0]
             self.embedding_model_predict = lambda x: self.embedding_model.run(None, {'input_1': x})[0].squeeze()
 
         elif inference_framework == "tflite":
@@ -159,22 +288,136 @@ class AudioFeatures():
 
             self.embedding_model_predict = tflite_embedding_predict
 
-        # Create databuffers with empty/random data
-        self.raw_data_buffer: Deque = deque(maxlen=sr*10)
-        self.melspectrogram_buffer = np.ones((76, 32))  # n_frames x num_features
+        # Replace the melspectrogram model with the NumPy implementation, if requested. Its parameters are loaded
+        # from a float32 ONNX melspectrogram model (the default model, unless another one was provided).
+        if melspectrogram_frontend == "numpy":
+            from openwakeword.melspectrogram import NumpyMelSpectrogram, DEFAULT_MELSPECTROGRAM_MODEL_PATH
+            if not melspec_model_path.endswith(".onnx"):
+                melspec_model_path = DEFAULT_MELSPECTROGRAM_MODEL_PATH
+            self.melspec_model_predict = NumpyMelSpectrogram(melspec_model_path)
+
+        # The melspectrogram model for batches (see `_get_batch_melspectrogram_predict`) and the worker pool
+        # of `embed_clips`, which are created when first needed
+        self._melspec_model_path = melspec_model_path
+        self._batch_melspec_model_predict: Optional[Callable] = None
+        self._batch_pool: Optional[ThreadPool] = None
+        self._batch_pool_size = 0
+        self._batch_lock = threading.Lock()
+
+        # Create preallocated databuffers with empty/random data
+        self._initial_features_key = (inference_framework, melspectrogram_frontend, melspec_model_path,
+                                      embedding_model_path)
+        self.cache_initial_features = cache_initial_features
+        self.raw_data_max_len = sr*10
+        self._raw_data_buffer = RingBuffer(self.raw_data_max_len, dtype=np.int16)
         self.melspectrogram_max_len = 10*97  # 97 is the number of frames in 1 second of 16hz audio
-        self.accumulated_samples = 0  # the samples added to the buffer since the audio preprocessor was last called
-        self.raw_data_remainder = np.empty(0)
-        self.feature_buffer = self._get_embeddings(np.random.randint(-1000, 1000, 16000*4).astype(np.int16))
+        self._melspectrogram_buffer = RingBuffer(self.melspectrogram_max_len, (32,), dtype=np.float32)
         self.feature_buffer_max_len = 120  # ~10 seconds of feature buffer history
+        self.embedding_backfill_frames = 16  # the most recent deferred embeddings to compute (see `_streaming_features`)
+        self._feature_buffer = RingBuffer(self.feature_buffer_max_len, (96,), dtype=np.float32)
+        self.reset()
+
+        # Latency instrumentation is disabled until `enable_instrumentation` is called
+        self.latency_recorder = None
+
+    def close(self):
+        """Releases the shared ONNX sessions of the feature models and stops the batch worker pool"""
+        for session in self._shared_sessions:
+            session_registry.release(session)
+        self._shared_sessions = []
+        self._batch_melspec_model_predict = None
+        if getattr(self, "_batch_pool", None) is not None:
+            self._batch_pool.terminate()
+            self._batch_pool = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def enable_instrumentation(self, recorder=None):
+        """
+        Enables the collection of melspectrogram and embedding latencies during streaming feature extraction.
+
+        Args:
+            recorder (LatencyRecorder): The recorder to store latencies in. If not provided, a new one is created.
+
+        Returns:
+            LatencyRecorder: The recorder object
+        """
+        from openwakeword.instrumentation import LatencyRecorder
+        self.latency_recorder = recorder if recorder is not None else LatencyRecorder()
+        return self.latency_recorder
+
+    def disable_instrumentation(self):
+        """Disables the collection of latencies"""
+        self.latency_recorder = None
+
+    @property
+    def raw_data_buffer(self):
+        """A view of the buffered raw audio data"""
+        return self._raw_data_buffer.view()
+
+    @property
+    def melspectrogram_buffer(self):
+        """A view of the buffered melspectrogram frames (n_frames x num_features)"""
+        return self._melspectrogram_buffer.view()
+
+    @property
+    def feature_buffer(self):
+        """A view of the buffered audio features (n_frames x embedding_dim)"""
+        return self._feature_buffer.view()
 
     def reset(self):
         """Reset the internal buffers"""
-        self.raw_data_buffer.clear()
-        self.melspectrogram_buffer = np.ones((76, 32))
-        self.accumulated_samples = 0
+        self._raw_data_buffer.clear()
+        self._melspectrogram_buffer.clear()
+        self._melspectrogram_buffer.extend(np.ones((76, 32), dtype=np.float32))  # n_frames x num_features
+        self.accumulated_samples = 0  # the samples added to the buffer since the audio preprocessor was last called
         self.raw_data_remainder = np.empty(0)
-        self.feature_buffer = self._get_embeddings(np.random.randint(-1000, 1000, 16000*4).astype(np.int16))
+        self.n_deferred_embeddings = 0  # frames whose embeddings were skipped (see `_streaming_features`)
+        self._feature_buffer.clear()
+        self._feature_buffer.extend(self._get_initial_features())
+
+    def _get_initial_features(self):
+        """
+        Gets the audio features used to fill the feature buffer when it is (re-)initialized, which are the
+        embeddings of 4 seconds of low-amplitude noise. The noise is generated with a fixed seed, so the
+        features are only computed once per process for each set of feature models (and optionally loaded from disk).
+
+        Returns:
+            np.ndarray: A read-only array of shape (41, 96) with the initial features
+        """
+        features = _initial_features_cache.get(self._initial_features_key)
+        if features is not None:
+            return features
+
+        cache_path = self._get_initial_features_cache_path() if self.cache_initial_features else None
+        if cache_path is not None and os.path.exists(cache_path):
+            features = np.load(cache_path)
+        else:
+            noise = np.random.RandomState(0).randint(-1000, 1000, 16000*4).astype(np.int16)
+            features = self._get_embeddings(noise).astype(np.float32)
+            if cache_path is not None:
+                try:
+                    np.save(cache_path, features)
+                except OSError as e:
+                    logging.warning(f"Could not save the initial audio features to '{cache_path}': {e}")
+
+        features.flags.writeable = False
+        _initial_features_cache[self._initial_features_key] = features
+        return features
+
+    def _get_initial_features_cache_path(self):
+        """Gets the path of the initial features file, which changes if the feature model files change"""
+        _, frontend, melspec_model_path, embedding_model_path = self._initial_features_key
+        file_stats = [(os.path.basename(i), os.path.getsize(i), os.path.getmtime(i))
+                      for i in (melspec_model_path, embedding_model_path)]
+        fingerprint = (self.inference_framework, file_stats) if frontend == "model" else \
+            (self.inference_framework, frontend, file_stats)
+        fingerprint = hashlib.sha1(repr(fingerprint).encode()).hexdigest()[0:16]
+        return os.path.join(os.path.dirname(embedding_model_path), f"initial_features_{fingerprint}.npy")
 
     def _get_melspectrogram(self, x: Union[np.ndarray, List], melspec_transform: Callable = lambda x: x/10 + 2):
         """
@@ -224,13 +467,10 @@ class AudioFeatures():
     def _get_embeddings(self, x: np.ndarray, window_size: int = 76, step_size: int = 8, **kwargs):
         """Function to compute the embeddings of the provide audio samples."""
         spec = self._get_melspectrogram(x, **kwargs)
-        windows = []
-        for i in range(0, spec.shape[0], 8):
-            window = spec[i:i+window_size]
-            if window.shape[0] == window_size:  # truncate short windows
-                windows.append(window)
 
-        batch = np.expand_dims(np.array(windows), axis=-1).astype(np.float32)
+        # Windows of the melspectrogram as a strided view, ignoring windows that are too short (truncates end of clip)
+        windows = np.lib.stride_tricks.sliding_window_view(spec, window_size, axis=0)[::step_size]
+        batch = np.ascontiguousarray(windows.transpose(0, 2, 1)[..., None], dtype=np.float32)
         embedding = self.embedding_model_predict(batch)
         return embedding
 
@@ -239,7 +479,43 @@ class AudioFeatures():
         x = (np.random.uniform(-1, 1, int(audio_length*sr))*32767).astype(np.int16)
         return self._get_embeddings(x).shape
 
-    def _get_melspectrogram_batch(self, x, batch_size=128, ncpu=1):
+    def _get_batch_pool(self, ncpu: int):
+        """Gets the worker pool used to split batches between `ncpu` threads, which is kept between calls"""
+        with self._batch_lock:
+            if self._batch_pool is None or self._batch_pool_size != ncpu:
+                if self._batch_pool is not None:
+                    self._batch_pool.close()
+                self._batch_pool = ThreadPool(processes=ncpu)
+                self._batch_pool_size = ncpu
+            return self._batch_pool
+
+    def _get_batch_melspectrogram_predict(self):
+        """
+        Gets a function computing the melspectrograms of a batch of clips in a single call, with the same results
+        as computing them for each clip on its own, or None if that isn't possible (e.g., with tflite models).
+
+        The ONNX melspectrogram model limits the dynamic range relative to the maximum of its entire input (i.e.,
+        the whole batch), so a version of the model that does this for each clip separately is used for batches.
+        """
+        if self.melspectrogram_frontend == "numpy":
+            return self.melspec_model_predict
+        if self.inference_framework != "onnx":
+            return None
+
+        with self._batch_lock:
+            if self._batch_melspec_model_predict is None:
+                model_path = self._melspec_model_path
+                model = get_batchable_melspectrogram_model(model_path)
+                if model is None:
+                    self._batch_melspec_model_predict = False
+                else:
+                    session = session_registry.acquire(("batchable_melspectrogram", model_path),
+                                                       model_loader=lambda: model, **self._onnx_session_args)
+                    self._shared_sessions.append(session)
+                    self._batch_melspec_model_predict = lambda x: session.run(None, {'input': x})
+            return self._batch_melspec_model_predict or None
+
+    def _get_melspectrogram_batch(self, x, batch_size=None, ncpu=None):
         """
         Compute the melspectrogram of the input audio samples in batches.
 
@@ -247,48 +523,54 @@ class AudioFeatures():
         batch size, and ncpu (if a CPU device is used). The user is encouraged
         to experiment with different values of these parameters to identify
         which combination is best for their data, as often differences of 1-4x are seen.
+        The autotuner (`openwakeword.autotune`) finds the best combination for the current host,
+        which is used when `batch_size` and `ncpu` aren't provided (if the autotune profile is enabled).
 
         Args:
             x (ndarray): A numpy array of 16 khz input audio data in shape (N, samples).
                         Assumes that all of the audio data is the same length (same number of samples).
             batch_size (int): The batch size to use when computing the melspectrogram
-            ncpu (int): The number of CPUs to use when computing the melspectrogram. This argument has
-                        no effect if the underlying model is executing on a GPU.
+            ncpu (int): The number of CPUs to use when computing the melspectrogram. Each batch is split
+                        between `ncpu` threads. This argument has no effect if the underlying model is
+                        executing on a GPU.
 
         Returns:
             ndarray: A numpy array of shape (N, frames, melbins) containing the melspectrogram of
                     all N input audio examples
         """
+        batch_size = batch_size or self.batch_size
+        ncpu = ncpu or self.batch_ncpu
+        predict = self._get_batch_melspectrogram_predict()
+        on_cpu = "CUDA" not in getattr(self, "onnx_execution_provider", "CPUExecutionProvider")
 
-        # Prepare ThreadPool object, if needed for multithreading
-        pool = None
-        if "CPU" in self.onnx_execution_provider:
-            pool = ThreadPool(processes=ncpu)
-
-        # Make batches
-        n_frames = int(np.ceil(x.shape[1]/160-3))
+        n_frames = (x.shape[1] - 512)//160 + 1
         mel_bins = 32  # fixed by melspectrogram model
         melspecs = np.empty((x.shape[0], n_frames, mel_bins), dtype=np.float32)
-        for i in range(0, max(batch_size, x.shape[0]), batch_size):
-            batch = x[i:i+batch_size]
 
-            if "CUDA" in self.onnx_execution_provider:
-                result = self._get_melspectrogram(batch)
-
-            elif pool:
-                chunksize = batch.shape[0]//ncpu if batch.shape[0] >= ncpu else 1
-                result = np.array(pool.map(self._get_melspectrogram,
-                                           batch, chunksize=chunksize))
-
-            melspecs[i:i+batch_size, :, :] = result.squeeze()
-
-        # Cleanup ThreadPool
-        if pool:
-            pool.close()
+        def compute(ndcs):
+            start, end = ndcs
+            if predict is None:
+                for i in range(start, end):
+                    melspecs[i] = self._get_melspectrogram(x[i])
+            else:
+                # Same transform as `_get_melspectrogram`, written directly to the output
+                output = melspecs[start:end]
+                outputs = predict(x[start:end].astype(np.float32))
+                np.divide(outputs[0].reshape(output.shape), 10, out=output)
+                output += 2
+
+        pool = self._get_batch_pool(ncpu) if on_cpu and ncpu > 1 else None
+        for i in range(0, x.shape[0], batch_size):
+            end = min(i + batch_size, x.shape[0])
+            if pool is None:
+                compute((i, end))
+            else:
+                bounds = np.linspace(i, end, min(ncpu, end - i) + 1).astype(int)
+                pool.map(compute, zip(bounds[0:-1], bounds[1:]))
 
         return melspecs
 
-    def _get_embeddings_batch(self, x, batch_size=128, ncpu=1):
+    def _get_embeddings_batch(self, x, batch_size=None, ncpu=None):
         """
         Compute the embeddings of the input melspectrograms in batches.
 
@@ -296,6 +578,8 @@ class AudioFeatures():
         batch size, and ncpu (if a CPU device is used). The user is encouraged
         to experiment with different values of these parameters to identify
         which combination is best for their data, as often differences of 1-4x are seen.
+        The autotuner (`openwakeword.autotune`) finds the best combination for the current host,
+        which is used when `batch_size` and `ncpu` aren't provided (if the autotune profile is enabled).
 
         Args:
             x (ndarray): A numpy array of melspectrograms of shape (N, frames, melbins).
@@ -308,53 +592,56 @@ class AudioFeatures():
             ndarray: A numpy array of shape (N, frames, embedding_dim) containing the embeddings of
                     all N input melspectrograms
         """
+        batch_size = batch_size or self.batch_size
+        ncpu = ncpu or self.batch_ncpu
+
         # Ensure input is the correct shape
         if x.shape[1] < 76:
             raise ValueError("Embedding model requires the input melspectrograms to have at least 76 frames")
+        x = x[..., None] if x.ndim == 3 else x
 
-        # Prepare ThreadPool object, if needed for multithreading
-        pool = None
-        if "CPU" in self.onnx_execution_provider:
-            pool = ThreadPool(processes=ncpu)
-
-        # Calculate array sizes and make batches
-        n_frames = (x.shape[1] - 76)//8 + 1
+        # Calculate array sizes
+        window_size, step_size = 76, 8
+        n_frames = (x.shape[1] - window_size)//step_size + 1
         embedding_dim = 96  # fixed by embedding model
         embeddings = np.empty((x.shape[0], n_frames, embedding_dim), dtype=np.float32)
 
-        batch = []
-        ndcs = []
-        for ndx, melspec in enumerate(x):
-            window_size = 76
-            for i in range(0, melspec.shape[0], 8):
-                window = melspec[i:i+window_size]
-                if window.shape[0] == window_size:  # ignore windows that are too short (truncates end of clip)
-                    batch.append(window)
-            ndcs.append(ndx)
-
-            if len(batch) >= batch_size or ndx+1 == x.shape[0]:
-                batch = np.array(batch).astype(np.float32)
-                if "CUDA" in self.onnx_execution_provider:
-                    result = self.embedding_model_predict(batch)
-
-                elif pool:
-                    chunksize = batch.shape[0]//ncpu if batch.shape[0] >= ncpu else 1
-                    result = np.array(pool.map(self._get_embeddings_from_melspec,
-                                      batch, chunksize=chunksize))
-
-                for j, ndx2 in zip(range(0, result.shape[0], n_frames), ndcs):
-                    embeddings[ndx2, :, :] = result[j:j+n_frames]
-
-                batch = []
-                ndcs = []
+        # Windows of all clips as a strided view of shape (N, n_frames, 76, melbins, 1), ignoring windows
+        # that are too short (truncates end of clip). Batches are made of whole clips with at least
+        # `batch_size` windows in total.
+        windows = np.lib.stride_tricks.sliding_window_view(x, window_size, axis=1)[:, ::step_size]
+        windows = windows.transpose(0, 1, 4, 2, 3)
+        clips_per_batch = max(1, int(np.ceil(batch_size/n_frames)))
+        batch = np.empty((min(clips_per_batch, x.shape[0])*n_frames,) + windows.shape[2:], dtype=np.float32)
 
-        # Cleanup ThreadPool
-        if pool:
-            pool.close()
+        # Get the worker pool, if needed for multithreading. On CPU, the windows are embedded in chunks of at
+        # most `EMBEDDING_MAX_CPU_BATCH_SIZE` windows per call of the model.
+        pool = None
+        on_cpu = "CPU" in self.onnx_execution_provider
+        if on_cpu and ncpu > 1:
+            pool = self._get_batch_pool(ncpu)
+
+        def compute(bounds):
+            start, end, output = bounds
+            step = EMBEDDING_MAX_CPU_BATCH_SIZE if on_cpu else max(end - start, 1)
+            for j in range(start, end, step):
+                k = min(j + step, end)
+                output[j:k] = self.embedding_model_predict(batch[j:k]).reshape(-1, embedding_dim)
+
+        for i in range(0, x.shape[0], clips_per_batch):
+            n_clips = min(clips_per_batch, x.shape[0] - i)
+            n_windows = n_clips*n_frames
+            np.copyto(batch[0:n_windows].reshape((n_clips, n_frames) + windows.shape[2:]), windows[i:i+n_clips])
+            output = embeddings[i:i+n_clips].reshape(n_windows, embedding_dim)
+            if pool is None:
+                compute((0, n_windows, output))
+            else:
+                bounds = np.linspace(0, n_windows, min(ncpu, n_windows) + 1).astype(int)
+                pool.map(compute, [(j, k, output) for j, k in zip(bounds[0:-1], bounds[1:])])
 
         return embeddings
 
-    def embed_clips(self, x, batch_size=128, ncpu=1):
+    def embed_clips(self, x, batch_size=None, ncpu=None):
         """
         Compute the embeddings of the input audio clips in batches.
 
@@ -362,6 +649,8 @@ class AudioFeatures():
         batch size, and ncpu (if a CPU device is used). The user is encouraged
         to experiment with different values of these parameters to identify
         which combination is best for their data, as often differences of 1-4x are seen.
+        The autotuner (`openwakeword.autotune`) finds the best combination for the current host,
+        which is used when `batch_size` and `ncpu` aren't provided (if the autotune profile is enabled).
 
         Args:
             x (ndarray): A numpy array of 16 khz input audio data in shape (N, samples).
@@ -389,23 +678,40 @@ class AudioFeatures():
         clip is calculated. It's unclear if this difference is significant and will impact model performance.
         In particular padding with 0 or very small values seems to demonstrate the differences well.
         """
-        if len(self.raw_data_buffer) < 400:
+        if len(self._raw_data_buffer) < 400:
             raise ValueError("The number of input frames must be at least 400 samples @ 16khz (25 ms)!")
 
-        self.melspectrogram_buffer = np.vstack(
-            (self.melspectrogram_buffer, self._get_melspectrogram(list(self.raw_data_buffer)[-n_samples-160*3:]))
+        if self.latency_recorder is not None:
+            stage_start = time.perf_counter_ns()
+
+        self._melspectrogram_buffer.extend(
+            self._get_melspectrogram(self._raw_data_buffer[-n_samples-160*3:])
         )
 
-        if self.melspectrogram_buffer.shape[0] > self.melspectrogram_max_len:
-            self.melspectrogram_buffer = self.melspectrogram_buffer[-self.melspectrogram_max_len:, :]
+        if self.latency_recorder is not None:
+            self.latency_recorder.record("melspectrogram", time.perf_counter_ns() - stage_start)
 
     def _buffer_raw_data(self, x):
         """
         Adds raw audio data to the input buffer
         """
-        self.raw_data_buffer.extend(x.tolist() if isinstance(x, np.ndarray) else x)
+        self._raw_data_buffer.extend(x if isinstance(x, np.ndarray) else np.array(x).astype(np.int16))
+
+    def _streaming_features(self, x, skip_embeddings: bool = False):
+        """
+        Adds audio to the streaming buffers, and computes the melspectrogram and audio features (embeddings)
+        for each new 80 ms frame.
+
+        Args:
+            x (ndarray): The 16-bit, 16 khz audio data
+            skip_embeddings (bool): Whether to defer computing the embeddings of the new frames. Deferred
+                                    embeddings are computed from the melspectrogram buffer on the next call
+                                    without `skip_embeddings`, for up to `embedding_backfill_frames` of the
+                                    most recent frames, so that the end of the feature buffer stays consistent.
 
-    def _streaming_features(self, x):
+        Returns:
+            int: The number of samples processed (or accumulated, if a full frame isn't yet available)
+        """
         # Add raw audio data to buffer, temporarily storing extra frames if not an even number of 80 ms chunks
         processed_samples = 0
 
@@ -419,7 +725,7 @@ class AudioFeatures():
                 x_even_chunks = x[0:-remainder]
                 self._buffer_raw_data(x_even_chunks)
                 self.accumulated_samples += len(x_even_chunks)
-                self.raw_data_remainder = x[-remainder:]
+                self.raw_data_remainder = x[-remainder:].copy()  # the input may be reused by the caller
             elif remainder == 0:
                 self._buffer_raw_data(x)
                 self.accumulated_samples += x.shape[0]
@@ -432,43 +738,251 @@ class AudioFeatures():
         if self.accumulated_samples >= 1280 and self.accumulated_samples % 1280 == 0:
             self._streaming_melspectrogram(self.accumulated_samples)
 
-            # Calculate new audio embeddings/features based on update melspectrograms
-            for i in np.arange(self.accumulated_samples//1280-1, -1, -1):
-                ndx = -8*i
-                ndx = ndx if ndx != 0 else len(self.melspectrogram_buffer)
-                x = self.melspectrogram_buffer[-76 + ndx:ndx].astype(np.float32)[None, :, :, None]
-                if x.shape[1] == 76:
-                    self.feature_buffer = np.vstack((self.feature_buffer,
-                                                    self.embedding_model_predict(x)))
+            # Calculate new audio embeddings/features based on update melspectrograms,
+            # with the windows for all of the new (and deferred) 80 ms frames predicted in a single batch
+            melspectrogram_buffer = self._melspectrogram_buffer.view()
+            if skip_embeddings:
+                self.n_deferred_embeddings += self.accumulated_samples//1280
+                n_windows = 0
+            else:
+                n_windows = self.accumulated_samples//1280
+                if self.n_deferred_embeddings > 0:
+                    n_windows = max(n_windows, min(n_windows + self.n_deferred_embeddings,
+                                                   self.embedding_backfill_frames))
+                    self.n_deferred_embeddings = 0
+                n_windows = min(n_windows, (len(melspectrogram_buffer) - 76)//8 + 1)
+
+            if n_windows == 1:
+                x = melspectrogram_buffer[-76:][None, :, :, None]
+            elif n_windows > 1:
+                x = np.lib.stride_tricks.sliding_window_view(
+                    melspectrogram_buffer[-76 - 8*(n_windows - 1):], 76, axis=0
+                )[::8]
+                x = np.ascontiguousarray(x.transpose(0, 2, 1))[:, :, :, None]
+            if n_windows > 0:
+                if self.latency_recorder is not None:
+                    stage_start = time.perf_counter_ns()
+                self._feature_buffer.extend(self.embedding_model_predict(x))
+                if self.latency_recorder is not None:
+                    self.latency_recorder.record("embedding", time.perf_counter_ns() - stage_start)
 
             # Reset raw data buffer counter
             processed_samples = self.accumulated_samples
             self.accumulated_samples = 0
 
-        if self.feature_buffer.shape[0] > self.feature_buffer_max_len:
-            self.feature_buffer = self.feature_buffer[-self.feature_buffer_max_len:, :]
-
         return processed_samples if processed_samples != 0 else self.accumulated_samples
 
     def get_features(self, n_feature_frames: int = 16, start_ndx: int = -1):
+        """
+        Gets a window of audio features from the feature buffer.
+
+        Note that the returned array is a view into the internal buffer (not a copy), and its
+        contents will change as new audio is processed. Copy the result if it needs to be kept.
+
+        Args:
+            n_feature_frames (int): The number of feature frames to return
+            start_ndx (int): The (negative) index of the first frame to return. By default (-1)
+                             the most recent `n_feature_frames` frames are returned.
+
+        Returns:
+            ndarray: A float32 array of shape (1, n_feature_frames, embedding_dim)
+        """
+        feature_buffer = self._feature_buffer.view()
         if start_ndx != -1:
             end_ndx = start_ndx + int(n_feature_frames) \
-                if start_ndx + n_feature_frames != 0 else len(self.feature_buffer)
-            return self.feature_buffer[start_ndx:end_ndx, :][None, ].astype(np.float32)
+                if start_ndx + n_feature_frames != 0 else len(feature_buffer)
+            return feature_buffer[start_ndx:end_ndx, :][None, ]
         else:
-            return self.feature_buffer[int(-1*n_feature_frames):, :][None, ].astype(np.float32)
+            return feature_buffer[int(-1*n_feature_frames):, :][None, ]
+
+    def __call__(self, x, **kwargs):
+        return self._streaming_features(x, **kwargs)
+
+def _set_dynamic_batch_dimension(model):
+    """Makes the first (batch) dimension of the inputs and outputs of an ONNX ModelProto dynamic, in place"""
+    for tensor in list(model.graph.input) + list(model.graph.output):
+        dims = tensor.type.tensor_type.shape.dim
+        if len(dims) > 0 and dims[0].HasField("dim_value"):
+            dims[0].dim_param = "batch_size"
+
+    # Remove the inferred shapes of intermediate tensors (e.g., added by quantization), which assume the fixed batch size
+    del model.graph.value_info[:]
+    return model
+
 
-    def __call__(self, x):
-        return self._streaming_features(x)
+def get_batchable_onnx_model(model_path: str):
+    """
+    Loads an ONNX model and makes the first (batch) dimension of its inputs and outputs dynamic,
+    so that models exported with a fixed batch size of 1 can predict on many windows in a single call.
+
+    Args:
+        model_path (str): The path to the ONNX model
+
+    Returns:
+        Union[str, bytes]: The serialized ONNX model with a dynamic batch dimension, or the original
+                           model path if the `onnx` package is not installed.
+    """
+    try:
+        import onnx
+    except ImportError:
+        return model_path
+
+    return _set_dynamic_batch_dimension(onnx.load(model_path)).SerializeToString()
+
+
+def get_batchable_melspectrogram_model(model_path: str):
+    """
+    Loads the ONNX melspectrogram model and changes it to limit the dynamic range of each example
+    of a batch separately (to 80 dB below the maximum of the example), instead of relative to the maximum
+    of the entire batch, so that each example of a batch has the same melspectrogram as on its own.
+
+    Args:
+        model_path (str): The path to the ONNX melspectrogram model
+
+    Returns:
+        Optional[bytes]: The serialized ONNX model, or None if the `onnx` package is not installed or
+                         the model doesn't have the structure of the openWakeWord melspectrogram model
+    """
+    try:
+        import onnx
+    except ImportError:
+        return None
+
+    model = onnx.load(model_path)
+    reduce_max = [node for node in model.graph.node if node.op_type == "ReduceMax"]
+    clip = [node for node in model.graph.node if node.op_type == "Clip" and model.graph.output[0].name in node.output]
+    if len(reduce_max) != 1 or len(clip) != 1 or len(clip[0].input) < 2 or len(reduce_max[0].input) != 1:
+        return None
+
+    # Reduce over all but the batch axis, keeping the dimensions so that the minimum broadcasts per example
+    reduce_max = reduce_max[0]
+    del reduce_max.attribute[:]
+    reduce_max.attribute.extend([onnx.helper.make_attribute("axes", [1, 2, 3]),
+                                 onnx.helper.make_attribute("keepdims", 1)])
+
+    # Clip only supports scalar bounds, so the clipping is replaced with Max (and Min, for an upper bound)
+    clip = clip[0]
+    ndx = list(model.graph.node).index(clip)
+    output_name = clip.output[0]
+    nodes = [onnx.helper.make_node("Max", [clip.input[0], clip.input[1]], [f"{output_name}_max"])]
+    if len(clip.input) > 2 and clip.input[2] != "":
+        nodes.append(onnx.helper.make_node("Min", [f"{output_name}_max", clip.input[2]], [output_name]))
+    else:
+        nodes[0].output[0] = output_name
+    model.graph.node.remove(clip)
+    for i, node in enumerate(nodes):
+        model.graph.node.insert(ndx + i, node)
+
+    del model.graph.value_info[:]
+    return model.SerializeToString()
+
+
+def fuse_onnx_models(model_paths: List[str]):
+    """
+    Combines several ONNX models that take the same input into a single ONNX graph, so that all of
+    the models can be run with one inference call. The fused graph has a single input (named "input")
+    and the outputs of each model, in the order of `model_paths`.
+
+    Args:
+        model_paths (List[str]): The paths to the ONNX models to fuse. All of the models must have one
+                                 input of the same shape and use the same operator set versions.
+
+    Returns:
+        bytes: The serialized fused ONNX model
+    """
+    import onnx
+    from onnx import compose, helper
+
+    models = [_set_dynamic_batch_dimension(onnx.load(i)) for i in model_paths]
+    opsets = set(tuple(sorted((j.domain, j.version) for j in i.opset_import)) for i in models)
+    if len(opsets) != 1:
+        raise ValueError("All of the models to fuse must use the same operator set versions!")
+
+    input_tensor = onnx.ValueInfoProto()
+    input_tensor.CopyFrom(models[0].graph.input[0])
+    input_tensor.name = "input"
+
+    nodes, initializers, value_info, outputs = [], [], [], []
+    for ndx, model in enumerate(models):
+        model = compose.add_prefix(model, prefix=f"model_{ndx}/")
+        nodes.append(helper.make_node("Identity", ["input"], [model.graph.input[0].name]))
+        nodes.extend(model.graph.node)
+        initializers.extend(model.graph.initializer)
+        value_info.extend(model.graph.value_info)
+        outputs.extend(model.graph.output)
+
+    graph = helper.make_graph(nodes, "fused_models", [input_tensor], outputs,
+                              initializer=initializers, value_info=value_info)
+    fused_model = helper.make_model(graph, opset_imports=models[0].opset_import)
+    fused_model.ir_version = max(i.ir_version for i in models)
+
+    return fused_model.SerializeToString()
+
+
+# Model object of each bulk prediction worker process, created by the pool initializer
+_bulk_predict_model = None
+
+
+def _init_bulk_predict_worker(wakeword_models, inference_framework, model_kwargs):
+    global _bulk_predict_model
+    _bulk_predict_model = openwakeword.Model(
+        wakeword_models=wakeword_models,
+        inference_framework=inference_framework,
+        **model_kwargs
+    )
+
+
+def _bulk_predict_worker(job):
+    file_path, prediction_function, kwargs = job
+    _bulk_predict_model.reset()
+    func = getattr(_bulk_predict_model, prediction_function)
+    filtered_kwargs = {key: value for key, value in kwargs.items()
+                       if key in func.__code__.co_varnames}
+    return file_path, func(file_path, **filtered_kwargs)
+
+
+def bulk_predict_iter(
+                      file_paths: List[str],
+                      wakeword_models: List[str],
+                      prediction_function: str = 'predict_clip',
+                      ncpu: int = 1,
+                      inference_framework: str = "tflite",
+                      chunksize: int = 1,
+                      **kwargs
+                      ):
+    """
+    Bulk predict on the provided input files in parallel with a pool of worker processes, yielding
+    the results as soon as each file is finished. Each worker creates its own openWakeWord model once,
+    and files are handed out to idle workers one `chunksize` at a time, so that workers with shorter
+    files don't sit idle while others are still busy. Results are yielded in order of completion,
+    not in the order of `file_paths`. The model is reset before each file.
+
+    Args:
+        file_paths (List[str]): The list of input file to predict
+        wakeword_models (List[str])): The paths to the wakeword model files
+        prediction_function (str): The name of the method used to predict on the input audio files
+                                   (default is the `predict_clip` method)
+        ncpu (int): How many processes to create (up to max of available CPUs)
+        inference_framework (str): The inference framework to use when for model prediction. Options are
+                                    "tflite" or "onnx". The default is "tflite" as this results in better
+                                    efficiency on common platforms (x86, ARM64), but in some deployment
+                                    scenarios ONNX models may be preferable.
+        chunksize (int): How many files to send to a worker at a time. Larger values reduce the
+                         communication overhead for many short files.
+        kwargs (dict): Any other keyword arguments to pass to the model initialization or
+                       specified prediction function
+
+    Yields:
+        tuple: The filepath and the predictions for that file
+    """
+    model_kwargs = {key: value for key, value in kwargs.items()
+                    if key in openwakeword.Model.__init__.__code__.co_varnames}
+    with Pool(processes=ncpu, initializer=_init_bulk_predict_worker,
+              initargs=(wakeword_models, inference_framework, model_kwargs)) as pool:
+        jobs = ((file_path, prediction_function, kwargs) for file_path in file_paths)
+        for result in pool.imap_unordered(_bulk_predict_worker, jobs, chunksize=chunksize):
+            yield result
 
-def f(clips, mdls, prediction_function, q, **kwargs):
-            results = []
-            for clip in clips:
-                func = getattr(mdls[-1], prediction_function)
-                filtered_kwargs = {key: value for key, value in kwargs.items()
-                                   if key in func.__code__.co_varnames}
-                results.append({clip: func(clip, **filtered_kwargs)})
-            q.put(results)
 
 # Bulk prediction function
 def bulk_predict(
@@ -481,6 +995,7 @@ def bulk_predict(
                  ):
     """
     Bulk predict on the provided input files in parallel using multiprocessing using the specified model.
+    See `bulk_predict_iter` to process the results as they are completed.
 
     Args:
         input_paths (List[str]): The list of input file to predict
@@ -498,114 +1013,465 @@ def bulk_predict(
     Returns:
         dict: A dictionary containing the predictions for each file, with the filepath as the key
     """
+    return dict(bulk_predict_iter(file_paths, wakeword_models, prediction_function=prediction_function,
+                                  ncpu=ncpu, inference_framework=inference_framework, **kwargs))
 
-    # Create openWakeWord model objects
-    n_batches = max(1, len(file_paths)//ncpu)
-    remainder = len(file_paths) % ncpu
-    chunks = [file_paths[i:i+n_batches] for i in range(0, max(1, len(file_paths)-remainder), n_batches)]
-    for i in range(1, remainder+1):
-        chunks[i-1].append(file_paths[-1*i])
-
-    # Create jobs
-    ps = []
-    mdls = []
-    q: Queue = Queue()
-    for chunk in chunks:
-        filtered_kwargs = {key: value for key, value in kwargs.items()
-                           if key in openwakeword.Model.__init__.__code__.co_varnames}
-        oww = openwakeword.Model(
-            wakeword_models=wakeword_models,
-            inference_framework=inference_framework,
-            **filtered_kwargs
-        )
-        mdls.append(oww)
 
-        # def f(clips, mdls, prediction_function, q, **kwargs):
-        #     results = []
-        #     for clip in clips:
-        #         func = getattr(mdls[-1], prediction_function)
-        #         filtered_kwargs = {key: value for key, value in kwargs.items()
-        #                            if key in func.__code__.co_varnames}
-        #         results.append({clip: func(clip, **filtered_kwargs)})
-        #     q.put(results)
+def read_wav_memmap(file_path: str):
+    """
+    Memory-maps the audio data of a 16-bit, 16 khz, single-channel WAV file, so that long files can be
+    read in parts without loading them into memory.
+
+    Args:
+        file_path (str): The path of the WAV file
+
+    Returns:
+        ndarray: A read-only array of the 16-bit PCM samples
+    """
+    with wave.open(file_path, mode='rb') as f:
+        if f.getsampwidth() != 2 or f.getnchannels() != 1 or f.getframerate() != 16000:
+            raise ValueError(f"The file '{file_path}' is not a 16-bit, 16 khz, single-channel WAV file!")
+        n_samples = f.getnframes()
+    if n_samples == 0:
+        return np.zeros(0, dtype=np.int16)
+
+    # Find the start of the data chunk
+    with open(file_path, 'rb') as f:
+        f.seek(12)
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError(f"The file '{file_path}' has no data chunk!")
+            chunk_size = int.from_bytes(chunk_header[4:8], "little")
+            if chunk_header[0:4] == b"data":
+                offset = f.tell()
+                break
+            f.seek(chunk_size + chunk_size % 2, 1)
+
+    return np.memmap(file_path, dtype="<i2", mode="r", offset=offset, shape=(n_samples,))
+
+
+def _mine_false_positives_worker(job):
+    file_path, start_frame, end_frame, context_frames, threshold, n_feature_frames, batch_size = job
+
+    # Score the segment with enough preceding audio to fill the melspectrogram and feature windows of its first frame.
+    # The melspectrogram of each frame is computed from its own samples (see `Model._get_offline_scores`), so the
+    # frames of the segment have the same features and scores as when streaming the whole file.
+    data = read_wav_memmap(file_path)
+    chunk_start = max(0, start_frame - context_frames)
+    chunk = np.array(data[1280*chunk_start:1280*end_frame + 1])
+    scores, features = _bulk_predict_model._get_offline_scores(chunk, batch_size=batch_size, return_features=True)
+    skip = start_frame - chunk_start
+    n_initial_features = features.shape[0] - scores.shape[0]
+
+    hits = {}
+    for ndx, (label, _, _) in enumerate(_bulk_predict_model.label_columns):
+        frames = np.nonzero(scores[skip:, ndx] >= threshold)[0]
+        if frames.shape[0] == 0:
+            continue
+        windows = np.lib.stride_tricks.sliding_window_view(features, n_feature_frames, axis=0)
+        windows = windows[n_initial_features + skip + frames + 1 - n_feature_frames].transpose(0, 2, 1)
+        hits[label] = (np.ascontiguousarray(windows), 1280*(start_frame + frames + 1), scores[skip + frames, ndx])
+
+    return file_path, end_frame - start_frame, hits
+
+
+def mine_false_positives(
+        file_paths: List[str],
+        wakeword_models: List[str],
+        output_dir: str,
+        threshold: float = 0.5,
+        n_feature_frames: Optional[int] = None,
+        ncpu: int = 1,
+        inference_framework: str = "onnx",
+        segment_duration: float = 300,
+        batch_size: int = 64,
+        shard_size: int = 4096,
+        **kwargs
+        ):
+    """
+    Finds the frames of (negative) audio files with a score above the threshold, and appends their audio features
+    to a feature store (see `openwakeword.feature_store.FeatureStore`), with the source file, sample offset, label,
+    and score of each frame. The feature store can be used as hard negative examples in training (e.g., in the
+    "feature_data_files" of the training config).
+
+    The files are memory-mapped and split into segments of `segment_duration` seconds, which are scored with the
+    batched offline path of `Model.predict_clip` by a pool of worker processes, so that long files are processed
+    in parallel without being loaded into memory. This is equivalent to the (much slower)
+    `Model._get_positive_prediction_frames` method with the "features" return type.
+
+    Args:
+        file_paths (List[str]): The paths of the 16-bit, 16 khz WAV files
+        wakeword_models (List[str]): The paths to the wakeword model files
+        output_dir (str): The directory of the feature store, which is created if it doesn't exist
+        threshold (float): The minimum score of a frame to be stored
+        n_feature_frames (int): The number of feature frames of each stored example. The default is the
+                                number of input frames of the wakeword models.
+        ncpu (int): How many processes to create
+        inference_framework (str): The inference framework to use for model prediction
+        segment_duration (float): The duration (in seconds) of the audio scored by a worker at a time
+        batch_size (int): The maximum number of frames per embedding model call
+        shard_size (int): The number of examples per shard of a new feature store
+        kwargs (dict): Any other keyword arguments to pass to the model (and `AudioFeatures`) initialization
+
+    Returns:
+        dict: The number of files, hours of audio, and frames stored ("n_files", "hours", and "n_hits")
+    """
+    # Function specific imports
+    from openwakeword.feature_store import FeatureStore
+
+    model_kwargs = {key: value for key, value in kwargs.items()
+                    if key in openwakeword.Model.__init__.__code__.co_varnames
+                    or key in AudioFeatures.__init__.__code__.co_varnames}
+    model = openwakeword.Model(wakeword_models=wakeword_models, inference_framework=inference_framework,
+                               **model_kwargs)
+    if n_feature_frames is None:
+        model_inputs = set(model.model_inputs.values())
+        if len(model_inputs) != 1:
+            raise ValueError("The wakeword models have different input sizes, so 'n_feature_frames' is required!")
+        n_feature_frames = model_inputs.pop()
+    n_features = model.preprocessor._get_initial_features().shape[1]
+    model.close()
+
+    # The preceding frames needed to fill the melspectrogram window (76 frames, ~10 steps of 1280 samples)
+    # and the feature window of the first frame of a segment
+    context_frames = 10 + max(n_feature_frames, max(model.model_inputs.values()))
+    segment_frames = max(1, int(segment_duration*16000/1280))
+    jobs = []
+    for file_path in file_paths:
+        with wave.open(file_path, mode='rb') as f:
+            n_frames = len(range(0, f.getnframes() - 1280, 1280))
+        jobs.extend([(file_path, i, min(i + segment_frames, n_frames), context_frames, threshold,
+                      n_feature_frames, batch_size) for i in range(0, n_frames, segment_frames)])
+
+    store = FeatureStore(output_dir, mode="a", row_shape=(n_feature_frames, n_features), shard_size=shard_size)
+    n_scored_frames, n_hits = 0, 0
+    with Pool(processes=ncpu, initializer=_init_bulk_predict_worker,
+              initargs=(wakeword_models, inference_framework, model_kwargs)) as pool:
+        for file_path, n_frames, hits in tqdm(pool.imap_unordered(_mine_false_positives_worker, jobs),
+                                              total=len(jobs), desc="Mining false positives"):
+            for label, (features, offsets, scores) in hits.items():
+                store.append(features, source=file_path, offsets=offsets, label=label, scores=scores)
+                n_hits += features.shape[0]
+            n_scored_frames += n_frames
+            if hits:
+                store.flush()
+    store.close()
+
+    return {"n_files": len(file_paths), "hours": n_scored_frames*1280/16000/3600, "n_hits": n_hits}
+
+
+def truncate_npy(file_path: str, n_rows: int):
+    """
+    Truncates a .npy file to its first `n_rows` rows in place, by rewriting the shape in the header and
+    shortening the file, so that no data is copied.
+
+    Args:
+        file_path (str): The path of the .npy file (which must not be memory-mapped while it is truncated)
+        n_rows (int): The number of rows to keep
+
+    Returns:
+        None
+    """
+    from numpy.lib import format
+
+    with open(file_path, "r+b") as f:
+        version = format.read_magic(f)
+        header_length_size = 2 if version == (1, 0) else 4
+        if version == (1, 0):
+            shape, fortran_order, dtype = format.read_array_header_1_0(f)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = format.read_array_header_2_0(f)
+        else:
+            raise ValueError(f"The .npy format version {version} of '{file_path}' is not supported!")
+        data_offset = f.tell()
 
-        ps.append(Process(target=f, args=(chunk, mdls, prediction_function, q, kwargs)))
+        if fortran_order or len(shape) == 0:
+            raise ValueError(f"The rows of '{file_path}' are not stored contiguously!")
+        n_rows = int(n_rows)
+        if n_rows < 0 or n_rows > shape[0]:
+            raise ValueError(f"Can't truncate '{file_path}' with {shape[0]} rows to {n_rows} rows!")
 
-    # Submit jobs
-    for p in ps:
-        p.start()
+        # The new header is padded with spaces to the size of the old one, so the data doesn't move
+        header_start = 8 + header_length_size
+        header = {"descr": format.dtype_to_descr(dtype), "fortran_order": False, "shape": (n_rows,) + shape[1:]}
+        header_text = "{" + "".join(f"'{key}': {value!r}, " for key, value in sorted(header.items())) + "}"
+        header_text = header_text.ljust(data_offset - header_start - 1) + "\n"
+        f.seek(header_start)
+        f.write(header_text.encode("latin1"))
+        f.truncate(data_offset + n_rows*dtype.itemsize*int(np.prod(shape[1:], dtype=np.int64)))
 
-    # Collection results
-    results = []
-    for p in ps:
-        while q.empty():
-            time.sleep(0.01)
-        results.extend(q.get())
 
-    # Consolidate results and return
-    return {list(i.keys())[0]: list(i.values())[0] for i in results}
+def get_feature_checkpoint_path(output_file: str):
+    """Gets the path of the checkpoint of `compute_features_from_generator` for an output file"""
+    return os.path.normpath(output_file) + ".checkpoint.json"
 
 
-def compute_features_from_generator(generator, n_total, clip_duration, output_file, device="cpu", ncpu=1):
+def compute_features_from_generator(generator, n_total, clip_duration, output_file, device="cpu", ncpu=1,
+                                    n_embedding_workers=1, prefetch_batches=4, resume=True, autotune_profile=True):
     """
     Computes audio features from a generator that produces Numpy arrays of shape (batch_size, samples)
     containing 16-bit PCM audio data.
 
+    The work is split into three stages that run concurrently and are connected by queues of at most
+    `prefetch_batches` batches: the generator(s) (e.g., audio augmentation) each run in their own thread,
+    `n_embedding_workers` threads compute the audio features, and the calling thread writes them to the output
+    file. A slow stage blocks the stages before it when its queue is full, so memory use stays bounded.
+
+    The batches of each generator are written in order, and after each batch a checkpoint with the number of
+    rows and the position (in batches) of each generator is saved next to the output file (see
+    `get_feature_checkpoint_path`). If the function is interrupted, running it again with the same arguments
+    resumes from the last batch in the checkpoint. The checkpoint is removed once the output is complete.
+
     Args:
-        generator (Generator): The generator that process the arrays of audio data
+        generator (Union[Generator, Callable, List]): The generator that process the arrays of audio data, or a
+                                                      function that takes the index of the first batch and returns
+                                                      such a generator (e.g., `functools.partial` of
+                                                      `openwakeword.data.augment_clips`), or a list of either that
+                                                      are consumed in parallel (for example, each augmenting part
+                                                      of the clips). When resuming, generators are started at
+                                                      their position by functions, while the batches of plain
+                                                      generators before their position are computed and skipped.
         n_total (int): The total number of rows (audio clips) that the generator will produce.
                        Ideally this is precise, but it can be approximate as well as the output
-                       .npy file will be automatically trimmed to remove empty values.
+                       .npy file will be automatically truncated to the rows that were written.
         clip_duration (float): The duration (in samples) of the audio produced by the generator
         output_file (str): The output file (.npy) containing the audio features. Note that this file
                            will be written to using memmap arrays, so it can be substantially larger
-                           than the available system memory.
+                           than the available system memory. If the path doesn't end with ".npy", the
+                           features are written to a new feature store directory instead (see
+                           `openwakeword.feature_store.FeatureStore`), which doesn't need to be trimmed.
         device (str): The device ("cpu" or "gpu") to use for computing features.
         ncpu (int): The number of cores to use when process the audio features (if computing on CPU)
+        n_embedding_workers (int): The number of threads computing audio features at the same time
+        prefetch_batches (int): The maximum number of batches waiting in each queue between stages
+        resume (bool): Whether to resume from the checkpoint of an interrupted run (if there is one), instead of
+                       starting over
+        autotune_profile (Union[bool, str, dict, None]): The autotune profile of the feature models (by default,
+                                                         the profile for this host if it exists; see `AudioFeatures`)
 
     Returns:
-        None
+        dict: The number of clips in the output, the number of clips resumed from a checkpoint, the elapsed time,
+              the throughput of this run ("clips_per_second"), and the "utilization" of each stage (the fraction
+              of the elapsed time its workers spent working instead of waiting)
     """
     # Function specific imports
-    from openwakeword.data import trim_mmap
+    import queue
+    from openwakeword.feature_store import FeatureStore
+
+    generators = list(generator) if isinstance(generator, (list, tuple)) else [generator]
 
     # Create audio features object
-    F = AudioFeatures(device=device)
+    F = AudioFeatures(device=device, autotune_profile=autotune_profile, autotune_workload="batch")
 
-    # Determine the output shape and create output file
+    # Determine the output shape, and load the checkpoint of an interrupted run
     n_feature_cols = F.get_embedding_shape(clip_duration/16000)
     output_shape = (n_total, n_feature_cols[0], n_feature_cols[1])
-    fp = open_memmap(output_file, mode='w+', dtype=np.float32, shape=output_shape)
-
-    # Get batch size by pulling one value from the generator and store features
-    row_counter = 0
-    audio_data = next(generator)
-    batch_size = audio_data.shape[0]
-
-    if batch_size > n_total:
-        raise ValueError(f"The value of 'n_total' ({n_total}) is less than the batch size ({batch_size})."
-                         " Please increase 'n_total' to be >= batch size.")
-
-    features = F.embed_clips(audio_data, batch_size=batch_size)
-    fp[row_counter:row_counter+features.shape[0], :, :] = features
-    row_counter += features.shape[0]
-    fp.flush()
-
-    # Compute features and add data to output file
-    for audio_data in tqdm(generator, total=n_total//batch_size, desc="Computing features"):
-        if row_counter >= n_total:
-            break
-
-        features = F.embed_clips(audio_data, batch_size=batch_size, ncpu=ncpu)
-        if row_counter + features.shape[0] > n_total:
-            features = features[0:n_total-row_counter]
-
-        fp[row_counter:row_counter+features.shape[0], :, :] = features
-        row_counter += features.shape[0]
-        fp.flush()
-
-    # Trip empty rows from the mmapped array
-    trim_mmap(output_file)
+    checkpoint_path = get_feature_checkpoint_path(output_file)
+    checkpoint = None
+    if resume and os.path.exists(checkpoint_path) and os.path.exists(output_file):
+        with open(checkpoint_path, "r") as f:
+            checkpoint = json.load(f)
+        if checkpoint["shape"] != list(output_shape) or len(checkpoint["batches"]) != len(generators):
+            logging.warning(f"The checkpoint '{checkpoint_path}' doesn't match the output shape or the number of "
+                            "generators, so the features will be computed again from the start")
+            checkpoint = None
+
+    # Open the output file to resume after the rows of the checkpoint
+    store = None
+    if checkpoint is not None and output_file.endswith(".npy"):
+        fp = open_memmap(output_file, mode='r+')
+        if fp.shape != output_shape:
+            del fp
+            checkpoint = None
+    elif checkpoint is not None:
+        store = FeatureStore(output_file, mode="a", row_shape=output_shape[1:])
+        store.truncate(checkpoint["n_rows"])
+
+    row_counter = 0 if checkpoint is None else checkpoint["n_rows"]
+    positions = [0]*len(generators) if checkpoint is None else list(checkpoint["batches"])
+    n_resumed = row_counter
+
+    def save_checkpoint():
+        temporary_path = f"{checkpoint_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump({"shape": list(output_shape), "n_rows": row_counter, "batches": positions}, f)
+        os.replace(temporary_path, checkpoint_path)
+
+    # Or create the output file, after the checkpoint so that an incomplete output always has one
+    if checkpoint is None:
+        save_checkpoint()
+        if output_file.endswith(".npy"):
+            fp = open_memmap(output_file, mode='w+', dtype=np.float32, shape=output_shape)
+        else:
+            store = FeatureStore(output_file, mode="w", row_shape=output_shape[1:])
+    else:
+        logging.info(f"Resuming the computation of features for '{output_file}' after {row_counter} clips")
+
+    audio_queue: queue.Queue = queue.Queue(maxsize=prefetch_batches)
+    feature_queue: queue.Queue = queue.Queue(maxsize=prefetch_batches)
+    stop = threading.Event()
+    # Limits the batches between the audio queue and the output (including those waiting for an earlier batch of
+    # their generator), so that a slow batch can't make the others pile up in memory
+    slots = threading.Semaphore(n_embedding_workers + 2*prefetch_batches)
+    errors = []
+    busy_time = {"augmentation": 0.0, "embedding": 0.0, "writer": 0.0}
+    lock = threading.Lock()
+    n_running_generators = [len(generators)]
+    finished = object()  # marks the end of the batches of a stage
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return finished
+
+    def acquire_slot():
+        while not stop.is_set():
+            if slots.acquire(timeout=0.1):
+                return True
+        return False
+
+    def add_busy_time(stage, seconds):
+        with lock:
+            busy_time[stage] += seconds
+
+    def augmentation_worker(generator_ndx, gen):
+        try:
+            # Start at the position of the generator, skipping the batches before it if needed
+            start_batch = positions[generator_ndx]
+            if callable(gen):
+                gen = gen(start_batch)
+            else:
+                for _ in range(start_batch):
+                    next(gen, None)
+
+            batch_ndx = start_batch
+            while not stop.is_set():
+                start = time.perf_counter()
+                audio_data = next(gen, None)
+                add_busy_time("augmentation", time.perf_counter() - start)
+                if audio_data is None or not put(audio_queue, (generator_ndx, batch_ndx, audio_data)):
+                    break
+                batch_ndx += 1
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            with lock:
+                n_running_generators[0] -= 1
+                last = n_running_generators[0] == 0
+            if last:
+                for _ in range(n_embedding_workers):
+                    put(audio_queue, finished)
+
+    def embedding_worker():
+        try:
+            while acquire_slot():
+                item = get(audio_queue)
+                if item is finished:
+                    slots.release()
+                    break
+                generator_ndx, batch_ndx, audio_data = item
+                if audio_data.shape[0] > n_total:
+                    raise ValueError(f"The value of 'n_total' ({n_total}) is less than the batch size "
+                                     f"({audio_data.shape[0]}). Please increase 'n_total' to be >= batch size.")
+
+                start = time.perf_counter()
+                features = F.embed_clips(audio_data, batch_size=audio_data.shape[0], ncpu=ncpu)
+                add_busy_time("embedding", time.perf_counter() - start)
+                if not put(feature_queue, (generator_ndx, batch_ndx, features)):
+                    break
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            put(feature_queue, finished)
+
+    threads = [threading.Thread(target=augmentation_worker, args=(i, gen), daemon=True)
+               for i, gen in enumerate(generators)]
+    threads += [threading.Thread(target=embedding_worker, daemon=True) for _ in range(n_embedding_workers)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    # Write features to the output file as they are computed. Batches that arrive before an earlier batch of the
+    # same generator (from another embedding worker) wait, so that the position of each generator is well defined.
+    # The batches of a generator leave the audio queue in order, so the earlier batch is always being computed,
+    # and the limit on the batches in flight can't block it.
+    pending: dict = {}
+    n_finished_workers = 0
+    try:
+        with tqdm(total=n_total, initial=row_counter, desc="Computing features", unit="clips") as progress:
+            while row_counter < n_total and n_finished_workers < n_embedding_workers:
+                item = get(feature_queue)
+                if item is finished:
+                    n_finished_workers += 1
+                    continue
+                pending[item[0:2]] = item[2]
+
+                for generator_ndx in range(len(generators)):
+                    while (generator_ndx, positions[generator_ndx]) in pending and row_counter < n_total:
+                        start = time.perf_counter()
+                        features = pending.pop((generator_ndx, positions[generator_ndx]))[0:n_total-row_counter]
+                        if store is None:
+                            fp[row_counter:row_counter+features.shape[0], :, :] = features
+                            fp.flush()
+                        else:
+                            store.append(features)
+                            store.flush()
+                        row_counter += features.shape[0]
+                        positions[generator_ndx] += 1
+                        slots.release()
+                        save_checkpoint()
+                        busy_time["writer"] += time.perf_counter() - start
+                        progress.update(features.shape[0])
+    finally:
+        # Stop the other stages (e.g., if the generator produces more than `n_total` rows)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start_time
+    if store is None:
+        del fp
+    else:
+        store.close()
+    if errors:
+        raise errors[0]
+
+    # Truncate the .npy file to the rows that were written, and remove the checkpoint of the completed output
+    if store is None:
+        truncate_npy(output_file, row_counter)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    n_computed = row_counter - n_resumed
+    stats = {
+        "n_clips": row_counter,
+        "n_resumed_clips": n_resumed,
+        "seconds": elapsed,
+        "clips_per_second": n_computed/elapsed if elapsed > 0 else 0.0,
+        "utilization": {
+            "augmentation": busy_time["augmentation"]/(elapsed*len(generators)),
+            "embedding": busy_time["embedding"]/(elapsed*n_embedding_workers),
+            "writer": busy_time["writer"]/elapsed
+        }
+    }
+    logging.info(f"Computed features for {n_computed} clips at {stats['clips_per_second']:.1f} clips/s "
+                 "(utilization: " + ", ".join(f"{k} {v:.0%}" for k, v in stats["utilization"].items()) + ")")
+
+    return stats
 
 
 # Function to download files from a URL with a progress bar
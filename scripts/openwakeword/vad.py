@@ -45,10 +45,11 @@
 # It can be used as with the openWakeWord library, or independently.
 
 # Imports
-import onnxruntime as ort
 import numpy as np
 import os
 from collections import deque
+from typing import List, Optional
+from openwakeword.sessions import session_registry
 
 
 class VAD():
@@ -64,31 +65,46 @@ class VAD():
                     "models",
                     "silero_vad.onnx"
                  ),
-                 n_threads: int = 1
+                 n_threads: int = 1,
+                 onnx_cache_dir: Optional[str] = None
                  ):
         """Initialize the VAD model object.
 
             Args:
                 model_path (str): The path to the Silero VAD ONNX model.
                 n_threads (int): The number of threads to use for the VAD model.
+                onnx_cache_dir (str): A directory to cache the optimized ONNX model in (see
+                                      `openwakeword.sessions.SessionRegistry`).
         """
 
-        # Initialize the ONNX model
-        sessionOptions = ort.SessionOptions()
-        sessionOptions.inter_op_num_threads = n_threads
-        sessionOptions.intra_op_num_threads = n_threads
-        self.model = ort.InferenceSession(model_path, sess_options=sessionOptions,
-                                          providers=["CPUExecutionProvider"])
+        # Initialize the ONNX model (shared with other VAD objects in the process)
+        self.model = session_registry.acquire(model_path, n_threads=n_threads, providers=["CPUExecutionProvider"],
+                                              cache_dir=onnx_cache_dir)
 
         # Create buffer
         self.prediction_buffer: deque = deque(maxlen=125)  # buffer lenght of 10 seconds
 
+        # LSTM states of each stream, for batched multi-stream prediction
+        self.stream_states: dict = {}
+
         # Set model parameters
         self.sample_rate = np.array(16000).astype(np.int64)
 
         # Reset model to start
         self.reset_states()
 
+    def close(self):
+        """Releases the shared ONNX session of the VAD model"""
+        if self.model is not None:
+            session_registry.release(self.model)
+            self.model = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
     def reset_states(self, batch_size=1):
         self._h = np.zeros((2, batch_size, 64)).astype('float32')
         self._c = np.zeros((2, batch_size, 64)).astype('float32')
@@ -128,3 +144,93 @@ class VAD():
 
     def __call__(self, x, frame_size=160*4):
         self.prediction_buffer.append(self.predict(x, frame_size))
+
+    def _predict_batch(self, x, h, c):
+        """Runs the model on a batch of chunks (one per row), returning the scores and updated LSTM states"""
+        ort_inputs = {'input': x, 'h': h, 'c': c, 'sr': self.sample_rate}
+        out, h, c = self.model.run(None, ort_inputs)
+        return out[:, 0], h, c
+
+    def reset_stream(self, stream_id):
+        """Resets (or creates) the LSTM state of a stream used by `predict_streams`"""
+        self.stream_states[stream_id] = (np.zeros((2, 64), dtype=np.float32), np.zeros((2, 64), dtype=np.float32))
+
+    def remove_stream(self, stream_id):
+        """Removes the LSTM state of a stream used by `predict_streams`"""
+        self.stream_states.pop(stream_id, None)
+
+    def predict_streams(self, x: dict, frame_size=480):
+        """
+        Get the VAD predictions for the input audio frames of many independent streams. Each stream
+        keeps its own LSTM state, and the chunks of all of the streams are processed together
+        with one batched model call per chunk position.
+
+        Args:
+            x (dict): A dictionary where the keys are stream ids and the values are the input audio
+                      (16 khz and 16-bit PCM format). The audio is split into chunks of `frame_size`
+                      samples, and any samples after the last complete chunk are ignored.
+                      New stream ids are added automatically.
+            frame_size (int): The frame size in samples (see `predict`)
+
+        Returns:
+            dict: A dictionary with the average predicted score of each stream
+        """
+        chunks = {}
+        for stream_id, audio in x.items():
+            if stream_id not in self.stream_states:
+                self.reset_stream(stream_id)
+            n_chunks = audio.shape[0]//frame_size
+            chunks[stream_id] = (audio[0:n_chunks*frame_size].reshape(n_chunks, frame_size)/32767).astype(np.float32)
+
+        scores: dict = {stream_id: [] for stream_id in x.keys()}
+        for ndx in range(max([i.shape[0] for i in chunks.values()], default=0)):
+            stream_ids = [i for i in chunks.keys() if chunks[i].shape[0] > ndx]
+            batch = np.stack([chunks[i][ndx] for i in stream_ids])
+            h = np.stack([self.stream_states[i][0] for i in stream_ids], axis=1)
+            c = np.stack([self.stream_states[i][1] for i in stream_ids], axis=1)
+            out, h, c = self._predict_batch(batch, h, c)
+            for batch_ndx, stream_id in enumerate(stream_ids):
+                self.stream_states[stream_id] = (h[:, batch_ndx], c[:, batch_ndx])
+                scores[stream_id].append(out[batch_ndx])
+
+        return {stream_id: float(np.mean(i)) if len(i) > 0 else 0.0 for stream_id, i in scores.items()}
+
+    def predict_clips(self, clips: List[np.ndarray], frame_size=480, batch_size=64):
+        """
+        Get the VAD predictions for every chunk of many audio clips (e.g., long files) using large batches.
+        Each clip is a row of the batch with its own LSTM state, so the results are the same as predicting
+        on each clip sequentially with `predict` from a reset state. Clips are sorted by length so that
+        each batch stays full for as long as possible. The state of the VAD object is not changed.
+
+        Args:
+            clips (List[np.ndarray]): The input audio clips, which must be 16 khz and 16-bit PCM format
+            frame_size (int): The frame size in samples (see `predict`)
+            batch_size (int): The maximum number of clips processed in each batch
+
+        Returns:
+            List[np.ndarray]: The predicted score of each complete chunk of `frame_size` samples, for each clip
+        """
+        n_chunks = [i.shape[0]//frame_size for i in clips]
+        order = np.argsort(n_chunks, kind="stable")[::-1]
+
+        results: List[np.ndarray] = [np.empty(0, dtype=np.float32)]*len(clips)
+        for batch_start in range(0, len(order), batch_size):
+            ndcs = order[batch_start:batch_start + batch_size]
+            max_chunks = n_chunks[ndcs[0]]
+            batch = np.zeros((len(ndcs), max_chunks, frame_size), dtype=np.float32)
+            for row, ndx in enumerate(ndcs):
+                batch[row, 0:n_chunks[ndx]] = clips[ndx][0:n_chunks[ndx]*frame_size].reshape(-1, frame_size)/32767
+
+            # Rows are sorted by length, so the clips that still have chunks are always the first rows
+            n_active = np.array([n_chunks[i] for i in ndcs])
+            h = np.zeros((2, len(ndcs), 64), dtype=np.float32)
+            c = np.zeros((2, len(ndcs), 64), dtype=np.float32)
+            scores = np.zeros((len(ndcs), max_chunks), dtype=np.float32)
+            for step in range(max_chunks):
+                n_rows = int((n_active > step).sum())
+                scores[0:n_rows, step], h, c = self._predict_batch(batch[0:n_rows, step], h[:, 0:n_rows], c[:, 0:n_rows])
+
+            for row, ndx in enumerate(ndcs):
+                results[ndx] = scores[row, 0:n_chunks[ndx]]
+
+        return results
@@ -0,0 +1,104 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This file contains a compact representation of the custom verifier models trained
+# with `openwakeword.train_custom_verifier`, which doesn't require scikit-learn at inference time.
+
+# Imports
+import numpy as np
+
+
+class LinearVerifier():
+    """
+    A logistic regression custom verifier model, with the standardization of the features folded into the
+    weights so that scoring a frame is a single dot product:
+
+        score = sigmoid(flatten(features) @ weights + bias)
+    """
+    def __init__(self, weights: np.ndarray, bias: float):
+        """
+        Initialize the LinearVerifier object.
+
+        Args:
+            weights (ndarray): The weight of each (flattened) feature
+            bias (float): The bias of the logistic regression model
+        """
+        self.weights = np.asarray(weights, dtype=np.float32).reshape(-1)
+        self.bias = float(bias)
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """
+        Creates a LinearVerifier from a scikit-learn pipeline (as trained by `train_custom_verifier`) with
+        a feature flattening step, an optional `StandardScaler`, and a binary `LogisticRegression` model.
+
+        Args:
+            pipeline (sklearn.pipeline.Pipeline): The trained scikit-learn pipeline
+
+        Returns:
+            LinearVerifier: The equivalent verifier model
+        """
+        steps = [i[1] for i in pipeline.steps]
+        clf = steps[-1]
+        if type(clf).__name__ != "LogisticRegression" or clf.coef_.shape[0] != 1:
+            raise ValueError("The final step of the pipeline must be a binary LogisticRegression model!")
+
+        weights = clf.coef_[0].astype(np.float64)
+        bias = float(clf.intercept_[0])
+        for step in steps[-2::-1]:
+            if type(step).__name__ == "StandardScaler":
+                if step.scale_ is not None:
+                    weights = weights/step.scale_
+                if step.mean_ is not None:
+                    bias -= float(np.dot(weights, step.mean_))
+            elif type(step).__name__ != "FunctionTransformer":
+                raise ValueError(f"Unsupported step in the custom verifier pipeline: {type(step).__name__}")
+
+        return cls(weights, bias)
+
+    @classmethod
+    def load(cls, path: str):
+        """Loads a LinearVerifier saved with `save`"""
+        data = np.load(path)
+        return cls(data["weights"], data["bias"])
+
+    def save(self, path: str):
+        """Saves the LinearVerifier as a NumPy .npz file"""
+        np.savez(path, weights=self.weights, bias=np.array(self.bias, dtype=np.float32))
+
+    def score(self, x: np.ndarray):
+        """
+        Gets the verifier score for a single example.
+
+        Args:
+            x (ndarray): The audio features of the example, of any shape with the same number of elements as `weights`
+
+        Returns:
+            float: The predicted probability of the positive class
+        """
+        return 1/(1 + np.exp(-(float(np.dot(x.reshape(-1), self.weights)) + self.bias)))
+
+    def predict_proba(self, x: np.ndarray):
+        """
+        Gets the predicted probabilities of each class for one or more examples, like a scikit-learn classifier.
+
+        Args:
+            x (ndarray): The audio features, with the examples along the first axis
+
+        Returns:
+            ndarray: An array of shape (n_examples, 2) with the probabilities of the negative and positive classes
+        """
+        logits = x.reshape(x.shape[0], -1) @ self.weights + self.bias
+        positive = 1/(1 + np.exp(-logits))
+        return np.stack((1 - positive, positive), axis=1)
@@ -0,0 +1,142 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Imports
+import json
+import os
+
+import numpy as np
+
+from openwakeword.feature_store import FeatureStore, METADATA_DTYPE, MANIFEST_NAME, load_features, open_features
+
+
+def get_rows(n_rows, seed=0):
+    return np.random.RandomState(seed).rand(n_rows, 2, 3).astype(np.float32)
+
+
+class TestFeatureStore:
+    def test_append_and_reopen(self, tmp_path):
+        path = str(tmp_path / "store")
+        rows = get_rows(10)
+        with FeatureStore(path, mode="w", row_shape=(2, 3), shard_size=4) as store:
+            store.append(rows[0:6], source="a.wav", offsets=np.arange(6), label="model")
+            store.append(rows[6:], source="b.wav", scores=np.ones(4))
+
+        store = FeatureStore(path)
+        assert store.shape == (10, 2, 3)
+        np.testing.assert_array_equal(store[:], rows)
+        np.testing.assert_array_equal(store[[9, 0, 5]], rows[[9, 0, 5]])
+        metadata = store.get_metadata()
+        assert store.sources == ["a.wav", "b.wav"]
+        assert [store.sources[i] for i in metadata["source"]] == ["a.wav"]*6 + ["b.wav"]*4
+        np.testing.assert_array_equal(metadata["offset"], list(range(6)) + [-1]*4)
+        np.testing.assert_array_equal(metadata["label"], [0]*6 + [-1]*4)
+
+        # Appending to the store again adds rows after the existing ones
+        with FeatureStore(path, mode="a", row_shape=(2, 3)) as store:
+            store.append(get_rows(3, seed=1))
+        np.testing.assert_array_equal(FeatureStore(path)[:], np.concatenate((rows, get_rows(3, seed=1))))
+
+    def test_unflushed_rows_are_not_visible(self, tmp_path):
+        path = str(tmp_path / "store")
+        writer = FeatureStore(path, mode="w", row_shape=(2, 3), shard_size=4)
+        writer.append(get_rows(4))
+        writer.flush()
+        writer.append(get_rows(6, seed=1))  # fills the second shard and starts a third one
+        assert len(FeatureStore(path)) == 4
+
+        writer.flush()
+        assert len(FeatureStore(path)) == 10
+
+    def test_concurrent_writers(self, tmp_path):
+        path = str(tmp_path / "store")
+        FeatureStore(path, mode="w", row_shape=(2, 3), shard_size=4).close()
+        reader = FeatureStore(path)
+
+        # Each writer appends to its own shards, so interleaved appends don't overwrite each other
+        writers = [FeatureStore(path, mode="a", row_shape=(2, 3)) for _ in range(2)]
+        for i in range(3):
+            for j, writer in enumerate(writers):
+                writer.append(get_rows(3, seed=10*j + i), source=f"writer_{j}.wav")
+        writers[0].flush()
+        assert len(reader) == 0
+        reader.refresh()
+        assert len(reader) == 9
+        for writer in writers:
+            writer.close()
+
+        store = FeatureStore(path)
+        metadata = store.get_metadata()
+        for j in range(2):
+            ndcs = np.nonzero(metadata["source"] == store.sources.index(f"writer_{j}.wav"))[0]
+            np.testing.assert_array_equal(store[ndcs], np.concatenate([get_rows(3, seed=10*j + i) for i in range(3)]))
+
+    def test_open_features(self, tmp_path):
+        path = str(tmp_path / "store")
+        rows = get_rows(10)
+        with FeatureStore(path, mode="w", row_shape=(2, 3), shard_size=4) as store:
+            store.append(rows)
+        FeatureStore(path).save_npy(str(tmp_path / "features.npy"))
+
+        for features_path in [path, str(tmp_path / "features.npy")]:
+            assert open_features(features_path).shape == (10, 2, 3)
+            np.testing.assert_array_equal(open_features(features_path)[[1, 7]], rows[[1, 7]])
+            np.testing.assert_array_equal(load_features(features_path), rows)
+
+    def test_truncate(self, tmp_path):
+        path = str(tmp_path / "store")
+        rows = get_rows(10)
+        with FeatureStore(path, mode="w", row_shape=(2, 3), shard_size=4) as store:
+            store.append(rows)
+
+        with FeatureStore(path, mode="a", row_shape=(2, 3)) as store:
+            store.truncate(5)
+            assert len(store) == 5
+            assert not os.path.exists(os.path.join(path, "shard_00002.npy"))
+            store.append(get_rows(5, seed=1))
+
+        store = FeatureStore(path)
+        np.testing.assert_array_equal(store[:], np.concatenate((rows[0:5], get_rows(5, seed=1))))
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            assert [(i["name"], i["n_rows"]) for i in json.load(f)["shards"]] == \
+                [("shard_00000", 4), ("shard_00001", 4), ("shard_00002", 2)]
+
+    def test_version_1_manifest(self, tmp_path):
+        path = str(tmp_path / "store")
+        os.makedirs(path)
+        rows = get_rows(6)
+        metadata = np.zeros(6, dtype=METADATA_DTYPE)
+        metadata["source"] = [0, 0, 0, 1, 1, 1]
+        metadata["label"] = -1
+        for i, name in enumerate(["shard_00000", "shard_00001"]):
+            np.save(os.path.join(path, f"{name}.npy"), rows[3*i:3*(i + 1)])
+            np.save(os.path.join(path, f"{name}_metadata.npy"), metadata[3*i:3*(i + 1)])
+        with open(os.path.join(path, MANIFEST_NAME), "w") as f:
+            json.dump({"version": 1, "dtype": "<f4", "row_shape": [2, 3], "shard_size": 3,
+                       "sources": ["a.wav", "b.wav"], "labels": [],
+                       "shards": [{"name": "shard_00000", "n_rows": 3}, {"name": "shard_00001", "n_rows": 3}]}, f)
+
+        store = FeatureStore(path)
+        np.testing.assert_array_equal(store[:], rows)
+        assert [store.sources[i] for i in store.get_metadata()["source"]] == ["a.wav"]*3 + ["b.wav"]*3
+
+        # Appending upgrades the manifest to version 2
+        with FeatureStore(path, mode="a", row_shape=(2, 3)) as store:
+            store.append(get_rows(2, seed=1), source="c.wav")
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        assert manifest["version"] == 2 and "sources" not in manifest
+        store = FeatureStore(path)
+        np.testing.assert_array_equal(store[:], np.concatenate((rows, get_rows(2, seed=1))))
+        assert [store.sources[i] for i in store.get_metadata()["source"]] == ["a.wav"]*3 + ["b.wav"]*3 + ["c.wav"]*2
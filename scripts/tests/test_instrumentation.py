@@ -0,0 +1,80 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Imports
+import json
+import os
+
+import numpy as np
+
+import openwakeword
+from openwakeword.instrumentation import LatencyHistogram, LatencyRecorder
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "outputs", "hola-pepito", "models",
+                          "01-10-2025T13.41.00", "hola-pepito_0_0.onnx")
+
+
+class TestLatencyHistogram:
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        values = np.random.RandomState(0).lognormal(np.log(2e6), 1, 10000).astype(int)
+        for value in values:
+            histogram.record(int(value))
+
+        assert histogram.count == values.shape[0]
+        assert histogram.total_ns == values.sum()
+        assert histogram.max_ns == values.max()
+        for q in [50, 95, 99]:
+            assert abs(histogram.percentile(q)/np.percentile(values, q) - 1) < 0.1
+        assert histogram.percentile(100) == values.max()
+
+        histogram.record(10**12)  # beyond the largest bucket
+        assert histogram.percentile(100) == 10**12
+
+        histogram.reset()
+        assert histogram.count == 0 and histogram.percentile(50) == 0
+
+
+class TestModelInstrumentation:
+    def test_stages_are_recorded(self):
+        audio = (np.random.RandomState(0).randn(1280*10)*2000).astype(np.int16)
+        oww = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        recorder = oww.enable_instrumentation()
+        for i in range(0, audio.shape[0], 1280):
+            oww.predict(audio[i:i+1280])
+
+        summary = recorder.summary()
+        assert summary["audio_seconds"] == 0.8
+        for stage in ["predict", "melspectrogram", "embedding", "model:hola-pepito_0_0"]:
+            assert summary["stages"][stage]["count"] == 10
+        assert summary["stages"]["predict"]["mean_ms"] >= summary["stages"]["embedding"]["mean_ms"]
+        assert summary["real_time_factor"] == recorder.real_time_factor("predict") > 0
+        assert json.loads(recorder.to_json()) == json.loads(json.dumps(summary))
+        assert 'openwakeword_stage_latency_seconds_count{stage="predict"} 10' in recorder.to_prometheus()
+
+        # Nothing more is recorded after instrumentation is disabled
+        oww.disable_instrumentation()
+        oww.predict(audio[0:1280])
+        assert recorder.histograms["predict"].count == 10
+        assert recorder.audio_samples == 1280*10
+
+    def test_shared_recorder(self):
+        recorder = LatencyRecorder()
+        models = [openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx") for _ in range(2)]
+        for oww in models:
+            oww.enable_instrumentation(recorder)
+            oww.predict(np.zeros(1280, dtype=np.int16))
+
+        assert recorder.histograms["predict"].count == 2
+        assert recorder.audio_samples == 1280*2
@@ -0,0 +1,72 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Imports
+import os
+
+import numpy as np
+import onnxruntime as ort
+import pytest
+
+from openwakeword.melspectrogram import (DEFAULT_MELSPECTROGRAM_MODEL_PATH, NumpyMelSpectrogram,
+                                         load_melspectrogram_parameters)
+from openwakeword.utils import AudioFeatures
+
+
+def get_varying_audio(n_hops, seed=0):
+    """Audio whose amplitude changes every 80 ms hop, so that the dynamic range limit of each hop differs"""
+    rng = np.random.RandomState(seed)
+    amplitudes = np.repeat(rng.choice([10, 2000, 20000], n_hops), 1280)
+    return (rng.randn(1280*n_hops)*amplitudes).clip(-32768, 32767).astype(np.int16)
+
+
+class TestNumpyMelSpectrogram:
+    def test_hops_match_model(self):
+        session = ort.InferenceSession(DEFAULT_MELSPECTROGRAM_MODEL_PATH, providers=["CPUExecutionProvider"])
+        melspectrogram = NumpyMelSpectrogram()
+
+        # The input of each streaming hop (1280 new samples and 480 preceding samples), including silence with
+        # a short loud burst, whose quiet frames are limited by the dynamic range
+        rng = np.random.RandomState(0)
+        hops = (rng.randn(4, 1760)*np.array([[20], [2000], [20000], [0]])).astype(np.float32)
+        hops[3, 800:900] = 5000
+        for hop in hops:
+            expected = session.run(None, {session.get_inputs()[0].name: hop[None]})[0]
+            output = melspectrogram(hop[None])[0]
+            assert output.shape == expected.shape == (1, 1, 8, 32)
+            np.testing.assert_allclose(output, expected, atol=1e-4)
+
+    def test_streaming_matches_model(self):
+        audio = get_varying_audio(30)
+        model_frontend = AudioFeatures(inference_framework="onnx")
+        numpy_frontend = AudioFeatures(inference_framework="onnx", melspectrogram_frontend="numpy")
+        for i in range(0, audio.shape[0], 1280):
+            model_frontend(audio[i:i+1280])
+            numpy_frontend(audio[i:i+1280])
+
+        np.testing.assert_allclose(numpy_frontend.melspectrogram_buffer, model_frontend.melspectrogram_buffer,
+                                   atol=1e-4)
+        np.testing.assert_allclose(numpy_frontend.feature_buffer, model_frontend.feature_buffer, atol=1e-3)
+
+        # The melspectrogram of the whole clip is the same as when streaming it
+        n_frames = len(numpy_frontend.melspectrogram_buffer) - 76
+        np.testing.assert_array_equal(numpy_frontend._get_melspectrogram(audio)[-n_frames:],
+                                      numpy_frontend.melspectrogram_buffer[-n_frames:])
+
+    def test_invalid_models(self):
+        embedding_model_path = os.path.join(os.path.dirname(DEFAULT_MELSPECTROGRAM_MODEL_PATH), "embedding_model.onnx")
+        with pytest.raises(ValueError):
+            load_melspectrogram_parameters(embedding_model_path)
+        with pytest.raises(ValueError):
+            AudioFeatures(inference_framework="onnx", melspectrogram_frontend="librosa")
@@ -0,0 +1,257 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Imports
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+import openwakeword
+from openwakeword.vad import VAD
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "outputs", "hola-pepito", "models",
+                          "01-10-2025T13.41.00", "hola-pepito_0_0.onnx")
+
+
+async def get_audio_chunks(audio, chunk_size):
+    for i in range(0, audio.shape[0], chunk_size):
+        yield audio[i:i+chunk_size]
+
+
+def get_high_dynamic_range_audio(n_samples, seed=0):
+    """Quiet noise with a loud burst and stretches of silence"""
+    rng = np.random.RandomState(seed)
+    audio = rng.randn(n_samples)*20
+    audio[n_samples//3:n_samples//3 + 8000] *= 1000
+    audio[n_samples//2:n_samples//2 + 12000] = 0
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def get_perturbed_model(output_path, seed=0):
+    """A copy of the test model with randomly scaled weights, so that its scores differ from the original's"""
+    import onnx
+    from onnx import numpy_helper
+
+    model = onnx.load(MODEL_PATH)
+    rng = np.random.RandomState(seed)
+    for initializer in model.graph.initializer:
+        weights = numpy_helper.to_array(initializer)
+        if weights.dtype == np.float32:
+            weights = weights*rng.uniform(0.5, 1.5, weights.shape).astype(np.float32)
+            initializer.CopyFrom(numpy_helper.from_array(weights, initializer.name))
+    onnx.save(model, output_path)
+    return output_path
+
+
+def get_multiclass_model(output_path, n_classes=3, seed=0):
+    """A linear model with a sigmoid output for each class, on the same 16 feature frames as the test model"""
+    import onnx
+    from onnx import helper, numpy_helper
+
+    weights = np.random.RandomState(seed).randn(16*96, n_classes).astype(np.float32)*0.01
+    graph = helper.make_graph(
+        [helper.make_node("Flatten", ["input"], ["flat"]), helper.make_node("MatMul", ["flat", "weights"], ["logits"]),
+         helper.make_node("Sigmoid", ["logits"], ["scores"])],
+        "multiclass",
+        [helper.make_tensor_value_info("input", onnx.TensorProto.FLOAT, [1, 16, 96])],
+        [helper.make_tensor_value_info("scores", onnx.TensorProto.FLOAT, [1, n_classes])],
+        initializer=[numpy_helper.from_array(weights, "weights")]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, output_path)
+    return output_path
+
+
+class TestMultiStreamModel:
+    def test_streams_are_independent(self):
+        quiet = get_high_dynamic_range_audio(1280*40, seed=0)
+        loud = (np.random.RandomState(1).randn(1280*40)*10000).clip(-32768, 32767).astype(np.int16)
+
+        alone = openwakeword.MultiStreamModel(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        together = openwakeword.MultiStreamModel(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        for i in range(0, quiet.shape[0], 1280):
+            scores_alone = alone.predict({"quiet": quiet[i:i+1280]})
+            scores_together = together.predict({"quiet": quiet[i:i+1280], "loud": loud[i:i+1280]})
+            assert scores_alone["quiet"] == scores_together["quiet"]
+
+        for buffer in ["melspectrogram_buffer", "feature_buffer"]:
+            np.testing.assert_array_equal(alone.streams["quiet"][buffer][:], together.streams["quiet"][buffer][:])
+
+
+    def test_ncpu_from_autotune_profile(self):
+        profile = {"streaming": {"session_options": {"intra_op_num_threads": 2}}}
+        msm = openwakeword.MultiStreamModel(wakeword_models=[MODEL_PATH], inference_framework="onnx", ncpu=None,
+                                            autotune_profile=profile)
+        assert msm.preprocessor.ncpu == 2
+
+        for i in range(4):
+            msm.predict({"a": np.zeros(1280, dtype=np.int16), "b": np.zeros(1280, dtype=np.int16)})
+        stats = msm.get_stats()
+        latencies = np.array(msm.tick_latencies)
+        assert stats["streams_per_core"] == pytest.approx((2*0.08/latencies).mean()/2)
+
+
+class TestModel:
+    def test_offline_scoring_matches_streaming(self):
+        audio = get_high_dynamic_range_audio(16000*6)
+        oww = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+
+        streaming_scores, streaming_features = [], []
+        for i in range(0, audio.shape[0] - 1280, 1280):
+            streaming_scores.append(list(oww.predict(audio[i:i+1280]).values()))
+            streaming_features.append(oww.preprocessor.get_features(16)[0].copy())
+
+        scores, features = oww._get_offline_scores(audio, return_features=True)
+        n_initial_features = features.shape[0] - scores.shape[0]
+        for i, frame_features in enumerate(streaming_features):
+            end = n_initial_features + i + 1
+            np.testing.assert_allclose(features[end - 16:end], frame_features, atol=1e-5)
+        np.testing.assert_allclose(scores, np.array(streaming_scores), atol=1e-5)
+
+    @pytest.mark.parametrize("supports_batching", [True, False])
+    def test_long_chunks_match_frames(self, supports_batching):
+        # Noise with a loud burst (the melspectrogram of digital silence depends on the length of the chunk)
+        audio = np.random.RandomState(0).randn(1280*48)*20
+        audio[1280*16:1280*24] *= 1000
+        audio = audio.clip(-32768, 32767).astype(np.int16)
+        frames = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        frame_scores = [list(frames.predict(audio[i:i+1280]).values()) for i in range(0, audio.shape[0], 1280)]
+
+        # Each call covers 4 frames, and its score is the maximum of the scores of those frames
+        # (after the first 5 calls, whose scores are always zero)
+        chunks = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        chunks.model_supports_batching = {i: supports_batching for i in chunks.model_supports_batching}
+        chunk_scores = [list(chunks.predict(audio[i:i+1280*4]).values()) for i in range(0, audio.shape[0], 1280*4)]
+
+        expected = np.array(frame_scores).reshape(-1, 4, 1).max(axis=1)
+        np.testing.assert_allclose(chunk_scores[5:], expected[5:], rtol=1e-5)
+        np.testing.assert_allclose(chunks.preprocessor.feature_buffer, frames.preprocessor.feature_buffer, atol=1e-5)
+
+    def test_fused_models_match_individual_models(self, tmp_path):
+        audio = get_high_dynamic_range_audio(16000*4)
+        model_paths = [MODEL_PATH, get_perturbed_model(str(tmp_path / "perturbed.onnx"))]
+        individual = openwakeword.Model(wakeword_models=model_paths, inference_framework="onnx")
+        fused = openwakeword.Model(wakeword_models=model_paths, inference_framework="onnx", fuse_models=True)
+        assert len(fused.fused_models) == 1
+
+        for i in range(0, audio.shape[0] - 1280, 1280):
+            expected = individual.predict(audio[i:i+1280])
+            scores = fused.predict(audio[i:i+1280])
+            assert list(scores.keys()) == list(expected.keys())
+            np.testing.assert_allclose(list(scores.values()), list(expected.values()), atol=1e-6)
+        assert not np.allclose(*np.array(individual.prediction_history[:]).T)
+
+
+class TestLabels:
+    def test_label_index_and_parent_models(self, tmp_path, monkeypatch):
+        # The class mapping lists the output columns out of order
+        monkeypatch.setitem(openwakeword.model_class_mappings, "multiclass", {"2": "c", "0": "a", "1": "b"})
+        multiclass_path = get_multiclass_model(str(tmp_path / "multiclass.onnx"))
+        oww = openwakeword.Model(wakeword_models=[MODEL_PATH, multiclass_path], inference_framework="onnx")
+
+        assert oww.labels == ["hola-pepito_0_0", "c", "a", "b"]
+        assert oww.label_index == {"hola-pepito_0_0": 0, "c": 1, "a": 2, "b": 3}
+        assert [oww.get_parent_model_from_label(i) for i in oww.labels] == ["hola-pepito_0_0"] + ["multiclass"]*3
+        assert oww.get_parent_model_from_label("unknown") == ""
+
+        # The scores of each label are those of its output column, in the dictionary and array results
+        audio = (np.random.RandomState(0).randn(1280*10)*2000).astype(np.int16)
+        for i in range(0, audio.shape[0], 1280):
+            scores = oww.predict(audio[i:i+1280])
+        array_scores = oww.predict(audio[0:1280], return_array=True)
+        assert list(scores.keys()) == oww.labels
+        np.testing.assert_array_equal(array_scores, oww.prediction_history[-1])
+
+        session = oww.models["multiclass"]
+        outputs = session.run(None, {session.get_inputs()[0].name: oww.preprocessor.get_features(16)})[0][0]
+        np.testing.assert_allclose(array_scores[[2, 3, 1]], outputs, rtol=1e-6)
+        assert oww.prediction_buffer["c"][-1] == array_scores[1]
+
+
+class TestGating:
+    def test_energy_gate(self):
+        # 20 loud frames, 40 quiet frames and 10 loud frames
+        rng = np.random.RandomState(0)
+        audio = (rng.randn(1280*70)*np.repeat([2000, 60, 2000], [1280*20, 1280*40, 1280*10])).astype(np.int16)
+        ungated = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        expected = [list(ungated.predict(audio[i:i+1280]).values())[0] for i in range(0, audio.shape[0], 1280)]
+
+        for skip_embeddings in [False, True]:
+            gated = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx", energy_threshold=100,
+                                       gate_skip_embeddings=skip_embeddings)
+            scores = [list(gated.predict(audio[i:i+1280]).values())[0] for i in range(0, audio.shape[0], 1280)]
+
+            # The gate closes when all of the last 16 inputs are quiet, and opens again with the first loud input
+            closed = np.zeros(70, dtype=bool)
+            closed[20 + 15:60] = True
+            assert gated.gate_counters == {"frames": 70, "energy_skipped": 25, "vad_skipped": 0,
+                                           "embeddings_skipped": 25 if skip_embeddings else 0}
+            assert all(np.array(scores)[closed] == 0)
+            np.testing.assert_allclose(np.array(scores)[~closed], np.array(expected)[~closed], atol=1e-6)
+            np.testing.assert_allclose(gated.preprocessor.get_features(16), ungated.preprocessor.get_features(16),
+                                       atol=1e-5)
+
+    def test_vad_gate(self, monkeypatch):
+        # The VAD detects speech in frames 20 to 39, and the wakeword models use the VAD scores of the frames
+        # 4 to 6 frames before the current one
+        monkeypatch.setattr(VAD, "predict", lambda self, x, frame_size=480:
+                            1.0 if 20 <= len(self.prediction_buffer) < 40 else 0.0)
+        audio = get_high_dynamic_range_audio(1280*60)
+        ungated = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx", vad_threshold=0.5)
+        gated = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx", vad_threshold=0.5,
+                                   vad_gating=True)
+        for i in range(0, audio.shape[0], 1280):
+            assert gated.predict(audio[i:i+1280]) == ungated.predict(audio[i:i+1280])
+
+        assert gated.gate_counters == {"frames": 60, "energy_skipped": 0, "vad_skipped": 60 - 22,
+                                       "embeddings_skipped": 0}
+        assert ungated.gate_counters["vad_skipped"] == 0
+
+        with pytest.raises(ValueError):
+            openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx", vad_gating=True)
+
+
+class TestDetect:
+    def test_detect_again_after_break(self):
+        audio = get_high_dynamic_range_audio(1280*20)
+        oww = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+
+        async def detect():
+            for _ in range(2):
+                async for event in oww.detect(get_audio_chunks(audio, 1280), threshold=0):
+                    break
+            async with oww.detect(get_audio_chunks(audio, 1280), threshold=0) as events:
+                return [event async for event in events]
+
+        events = asyncio.run(detect())
+        assert [event["frame"] for event in events] == list(range(20))
+
+    def test_dropped_frames_keep_their_time(self):
+        audio = get_high_dynamic_range_audio(1280*40)
+        oww = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+
+        async def detect():
+            # All of the audio arrives at once, so the queue only keeps the last frames
+            return [event async for event in oww.detect(get_audio_chunks(audio, audio.shape[0]), threshold=0,
+                                                         max_queue_frames=2, drop_when_behind=True)]
+
+        events = asyncio.run(detect())
+        stats = oww.detect_stats
+        assert stats["frames_received"] == 40
+        assert stats["frames_processed"] + stats["frames_dropped"] == 40
+        assert [event["frame"] for event in events] == [38, 39]
+        np.testing.assert_allclose([event["time"] for event in events], [39*0.08, 40*0.08])
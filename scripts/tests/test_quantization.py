@@ -0,0 +1,80 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Imports
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import openwakeword
+from openwakeword.quantization import (FEATURE_MODELS_DIR, get_quantized_model_path, load_calibration_features,
+                                       quantize_feature_models, quantize_onnx_model)
+from openwakeword.utils import AudioFeatures
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "outputs", "hola-pepito", "models",
+                          "01-10-2025T13.41.00", "hola-pepito_0_0.onnx")
+
+
+def get_streaming_scores(oww, audio):
+    return np.array([list(oww.predict(audio[i:i+1280]).values()) for i in range(0, audio.shape[0], 1280)])
+
+
+class TestQuantization:
+    @pytest.mark.parametrize("mode", ["dynamic", "static"])
+    def test_int8_wakeword_model(self, tmp_path, mode):
+        model_path = shutil.copy(MODEL_PATH, str(tmp_path))
+        calibration_data = None
+        if mode == "static":
+            # Calibrate with the features of clips like the test audio, as saved by the training pipeline
+            clips = (np.random.RandomState(1).randn(20, 16000*3)*2000).astype(np.int16)
+            features_path = str(tmp_path / "features.npy")
+            np.save(features_path, AudioFeatures(inference_framework="onnx").embed_clips(clips))
+            calibration_data = load_calibration_features([features_path], n_input_frames=16, max_examples=10)
+            assert calibration_data.shape == (10, 16, 96)
+        quantized_path = quantize_onnx_model(model_path, mode=mode, calibration_data=calibration_data)
+        assert quantized_path == get_quantized_model_path(model_path) == str(tmp_path / "hola-pepito_0_0_int8.onnx")
+
+        audio = (np.random.RandomState(0).randn(1280*30)*2000).astype(np.int16)
+        float_model = openwakeword.Model(wakeword_models=[model_path], inference_framework="onnx")
+        int8_model = openwakeword.Model(wakeword_models=[model_path], inference_framework="onnx", precision="int8")
+        assert int8_model.labels == float_model.labels
+        np.testing.assert_allclose(get_streaming_scores(int8_model, audio), get_streaming_scores(float_model, audio),
+                                   atol=0.01)
+
+    def test_int8_feature_models(self, tmp_path, monkeypatch):
+        output_paths = quantize_feature_models(output_dir=str(tmp_path))
+        for name, filename in [("melspectrogram", "melspectrogram.onnx"), ("embedding", "embedding_model.onnx")]:
+            assert output_paths[name] == get_quantized_model_path(str(tmp_path / filename))
+            assert os.path.getsize(output_paths[name]) < os.path.getsize(os.path.join(FEATURE_MODELS_DIR, filename))
+
+        # With INT8 precision, the quantized feature models are used when they exist
+        monkeypatch.setattr(openwakeword.model, "FEATURE_MODELS_DIR", str(tmp_path))
+        model_path = shutil.copy(MODEL_PATH, str(tmp_path))
+        quantize_onnx_model(model_path)
+        oww = openwakeword.Model(wakeword_models=[model_path], inference_framework="onnx", precision="int8")
+        assert oww.preprocessor._initial_features_key[2:] == (output_paths["melspectrogram"], output_paths["embedding"])
+
+        scores = get_streaming_scores(oww, (np.random.RandomState(0).randn(1280*10)*2000).astype(np.int16))
+        assert scores.shape == (10, 1) and np.isfinite(scores).all()
+
+    def test_invalid_precision(self, tmp_path):
+        model_path = shutil.copy(MODEL_PATH, str(tmp_path))
+        with pytest.raises(ValueError):
+            openwakeword.Model(wakeword_models=[model_path], inference_framework="onnx", precision="int8")
+        with pytest.raises(ValueError):
+            openwakeword.Model(wakeword_models=[model_path], inference_framework="onnx", precision="float16")
+        with pytest.raises(ValueError):
+            quantize_onnx_model(model_path, mode="static")
@@ -0,0 +1,90 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Imports
+import os
+
+import numpy as np
+
+import openwakeword
+from openwakeword.sessions import SessionRegistry, session_registry
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "outputs", "hola-pepito", "models",
+                          "01-10-2025T13.41.00", "hola-pepito_0_0.onnx")
+
+
+def get_reference_count(session):
+    key = session_registry._session_keys.get(id(session))
+    return 0 if key is None else session_registry._sessions[key][1]
+
+
+class TestSessionRegistry:
+    def test_reference_counting(self):
+        registry = SessionRegistry()
+        n_loads = []
+
+        def load():
+            n_loads.append(1)
+            return MODEL_PATH
+
+        session = registry.acquire(("test", MODEL_PATH), load)
+        assert registry.acquire(("test", MODEL_PATH), load) is session
+        other = registry.acquire(("test", MODEL_PATH), load, n_threads=2)  # different options get another session
+        assert other is not session
+        assert len(registry) == 2 and len(n_loads) == 2
+
+        registry.release(session)
+        assert registry.acquire(("test", MODEL_PATH), load) is session  # still referenced once
+        registry.release(session)
+        registry.release(session)
+        registry.release(session)  # releasing a session that isn't in the registry does nothing
+        assert len(registry) == 1
+
+        # The session is created again once all of its references were released
+        assert registry.acquire(("test", MODEL_PATH), load) is not session
+        assert len(n_loads) == 3
+
+    def test_optimized_model_cache(self, tmp_path):
+        x = np.random.RandomState(0).rand(1, 16, 96).astype(np.float32)
+        session = SessionRegistry().acquire(MODEL_PATH, cache_dir=str(tmp_path))
+        cached_files = os.listdir(tmp_path)
+        assert len(cached_files) == 1 and cached_files[0].endswith(".onnx")
+
+        # Another registry (like another process) loads the cached model instead of the original one
+        def fail():
+            raise AssertionError("The model should be loaded from the cache")
+
+        cached_session = SessionRegistry().acquire(MODEL_PATH, fail, cache_dir=str(tmp_path))
+        assert os.listdir(tmp_path) == cached_files
+        input_name = session.get_inputs()[0].name
+        np.testing.assert_allclose(cached_session.run(None, {input_name: x})[0], session.run(None, {input_name: x})[0],
+                                   atol=1e-6)
+
+
+class TestSharedSessions:
+    def test_models_share_sessions(self):
+        first = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        sessions = [first.models["hola-pepito_0_0"], first.preprocessor.melspec_model,
+                    first.preprocessor.embedding_model]
+        counts = [get_reference_count(i) for i in sessions]
+
+        second = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        assert [second.models["hola-pepito_0_0"], second.preprocessor.melspec_model,
+                second.preprocessor.embedding_model] == sessions
+        assert [get_reference_count(i) for i in sessions] == [i + 1 for i in counts]
+
+        second.close()
+        assert [get_reference_count(i) for i in sessions] == counts
+        first.close()
+        assert [get_reference_count(i) for i in sessions] == [i - 1 for i in counts]
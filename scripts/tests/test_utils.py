@@ -0,0 +1,322 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Imports
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pytest
+import scipy.io.wavfile
+
+import openwakeword
+import openwakeword.utils
+from openwakeword.noise_suppression import NoiseSuppressor, SpectralSubtractionNoiseSuppressor
+from openwakeword.feature_store import FeatureStore, load_features
+from openwakeword.utils import AudioFeatures, RingBuffer, bulk_predict, mine_false_positives, \
+    compute_features_from_generator, get_feature_checkpoint_path, truncate_npy
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "outputs", "hola-pepito", "models",
+                          "01-10-2025T13.41.00", "hola-pepito_0_0.onnx")
+
+
+class TestRingBuffer:
+    def test_wraparound(self):
+        buffer = RingBuffer(10, row_shape=(3,))
+        rows = np.arange(3*200, dtype=np.float32).reshape(200, 3)
+        rng = np.random.RandomState(0)
+        n_added = 0
+        while n_added < rows.shape[0]:
+            # Chunks both smaller and larger than the capacity, which wrap around the storage at varying offsets
+            n = min(rng.randint(1, 14), rows.shape[0] - n_added)
+            buffer.extend(rows[n_added:n_added + n])
+            n_added += n
+            expected = rows[max(0, n_added - 10):n_added]
+            assert buffer.shape == expected.shape
+            np.testing.assert_array_equal(buffer[:], expected)
+            assert np.shares_memory(buffer.view(), buffer._data)
+
+        buffer.extend(rows[0])  # a single row without the leading dimension
+        np.testing.assert_array_equal(buffer[-2:], np.vstack((rows[-1], rows[0])))
+
+        buffer.clear()
+        assert len(buffer) == 0
+        buffer.extend(rows[0:2])
+        np.testing.assert_array_equal(buffer[:], rows[0:2])
+
+
+class TestStreamingFeatures:
+    def test_noise_suppression_with_uneven_chunks(self):
+        audio = (np.random.RandomState(0).randn(1280*30)*2000).astype(np.int16)
+        expected = SpectralSubtractionNoiseSuppressor(160, 16000).process(audio)
+
+        oww = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx",
+                                 noise_suppression="spectral_subtraction")
+        for i in range(0, audio.shape[0], 1000):
+            oww.predict(audio[i:i+1000])
+
+        raw_data = oww.preprocessor.raw_data_buffer
+        assert raw_data.shape[0] == 1280*(expected.shape[0]//1280)
+        np.testing.assert_array_equal(raw_data, expected[0:raw_data.shape[0]])
+
+    def test_reused_input_buffer(self):
+        audio = (np.random.RandomState(1).randn(1280*30)*2000).astype(np.int16)
+        F = AudioFeatures(inference_framework="onnx")
+        chunk = np.empty(1000, dtype=np.int16)
+        for i in range(0, audio.shape[0] - 1000 + 1, 1000):
+            chunk[:] = audio[i:i+1000]
+            F(chunk)
+
+        raw_data = F.raw_data_buffer
+        np.testing.assert_array_equal(raw_data, audio[0:raw_data.shape[0]])
+
+
+class TestInitialFeatures:
+    def test_deterministic_initial_features(self, monkeypatch):
+        monkeypatch.setattr(openwakeword.utils, "_initial_features_cache", {})
+        F = AudioFeatures(inference_framework="onnx")
+        features = F.get_features(41)[0].copy()
+        noise = np.random.RandomState(0).randint(-1000, 1000, 16000*4).astype(np.int16)
+        np.testing.assert_array_equal(features, F._get_embeddings(noise))
+
+        # The features are computed again (with the same result) once per process, and restored by reset
+        monkeypatch.setattr(openwakeword.utils, "_initial_features_cache", {})
+        np.testing.assert_array_equal(AudioFeatures(inference_framework="onnx").get_features(41)[0], features)
+        F(np.random.RandomState(1).randint(-1000, 1000, 1280*20).astype(np.int16))
+        F.reset()
+        assert len(F.feature_buffer) == 41
+        np.testing.assert_array_equal(F.feature_buffer, features)
+
+    def test_reset_model_matches_new_model(self):
+        audio = (np.random.RandomState(0).randn(1280*20)*2000).astype(np.int16)
+        oww = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        for i in range(0, audio.shape[0], 1280):
+            oww.predict(audio[i:i+1280])
+        oww.reset()
+
+        new = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        for i in range(0, audio.shape[0], 1280):
+            assert oww.predict(audio[i:i+1280]) == new.predict(audio[i:i+1280])
+
+    def test_cached_initial_features_file(self, tmp_path, monkeypatch):
+        models_dir = os.path.join(os.path.dirname(openwakeword.__file__), "resources", "models")
+        model_paths = {}
+        for name in ["melspectrogram", "embedding_model"]:
+            model_paths[name] = shutil.copy(os.path.join(models_dir, f"{name}.onnx"), str(tmp_path))
+
+        monkeypatch.setattr(openwakeword.utils, "_initial_features_cache", {})
+        F = AudioFeatures(melspec_model_path=model_paths["melspectrogram"],
+                          embedding_model_path=model_paths["embedding_model"], inference_framework="onnx",
+                          cache_initial_features=True)
+        cache_files = [i for i in os.listdir(tmp_path) if i.startswith("initial_features_")]
+        assert len(cache_files) == 1
+
+        # A new process loads the features from the file, instead of computing them
+        def fail(*args, **kwargs):
+            raise AssertionError("The initial features should be loaded from the file")
+
+        monkeypatch.setattr(openwakeword.utils, "_initial_features_cache", {})
+        monkeypatch.setattr(AudioFeatures, "_get_embeddings", fail)
+        loaded = AudioFeatures(melspec_model_path=model_paths["melspectrogram"],
+                               embedding_model_path=model_paths["embedding_model"], inference_framework="onnx",
+                               cache_initial_features=True)
+        np.testing.assert_array_equal(loaded.feature_buffer, F.feature_buffer)
+
+
+class TestNoiseSuppression:
+    def test_output_buffer(self):
+        audio = (np.random.RandomState(2).randn(16000*2)*2000).astype(np.int16)
+        expected = SpectralSubtractionNoiseSuppressor(160, 16000).process(audio)
+
+        ns = SpectralSubtractionNoiseSuppressor(160, 16000)
+        out = np.zeros(1000 + 160, dtype=np.int16)
+        outputs = []
+        for i in range(0, audio.shape[0], 1000):
+            cleaned = ns.process(audio[i:i+1000], out=out)
+            assert np.shares_memory(cleaned, out)
+            outputs.append(cleaned.copy())
+        np.testing.assert_array_equal(np.concatenate(outputs), expected[0:sum(i.shape[0] for i in outputs)])
+
+        with pytest.raises(ValueError):
+            ns.process(audio[0:1000], out=np.zeros(160, dtype=np.int16))
+
+    def test_incomplete_subclass(self):
+        class IncompleteNoiseSuppressor(NoiseSuppressor):
+            pass
+
+        with pytest.raises(TypeError):
+            IncompleteNoiseSuppressor()
+
+
+class TestBulkPredict:
+    def test_results_match_predict_clip(self, tmp_path):
+        # Files of different lengths, so that the workers finish them out of order
+        rng = np.random.RandomState(0)
+        files = []
+        for i, duration in enumerate([3, 1, 2, 1]):
+            files.append(str(tmp_path / f"clip_{i}.wav"))
+            scipy.io.wavfile.write(files[-1], 16000, (rng.randn(16000*duration)*2000).astype(np.int16))
+
+        results = bulk_predict(files, [MODEL_PATH], ncpu=2, inference_framework="onnx", chunksize=1, padding=0)
+        assert sorted(results.keys()) == sorted(files)
+
+        oww = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        for file_path in files:
+            oww.reset()
+            expected = oww.predict_clip(file_path, padding=0)
+            assert len(results[file_path]) == len(expected)
+            for frame_scores, expected_scores in zip(results[file_path], expected):
+                assert frame_scores.keys() == expected_scores.keys()
+                np.testing.assert_allclose(list(frame_scores.values()), list(expected_scores.values()), atol=1e-6)
+
+
+class TestMineFalsePositives:
+    def test_mining_matches_streaming(self, tmp_path):
+        # Audio with loud bursts, quiet stretches and silence, mined in segments shorter than the files
+        rng = np.random.RandomState(0)
+        files = []
+        for i in range(2):
+            audio = rng.randn(16000*12 + 777)*rng.choice([0, 20, 2000, 20000], 25).repeat(8000)[0:16000*12 + 777]
+            files.append(str(tmp_path / f"negative_{i}.wav"))
+            scipy.io.wavfile.write(files[-1], 16000, np.clip(audio, -32768, 32767).astype(np.int16))
+
+        oww = openwakeword.Model(wakeword_models=[MODEL_PATH], inference_framework="onnx")
+        scores = np.concatenate([oww._get_offline_scores(scipy.io.wavfile.read(i)[1])[5:, 0] for i in files])
+        threshold = float(np.quantile(scores, 0.8))
+
+        mine_false_positives(files, [MODEL_PATH], str(tmp_path / "store"), threshold=threshold, segment_duration=4)
+        store = FeatureStore(str(tmp_path / "store"))
+        metadata = store.get_metadata()
+        for file_path in files:
+            oww.reset()
+            expected = list(oww._get_positive_prediction_frames(file_path, threshold=threshold).values())[0]
+            ndcs = np.nonzero(metadata["source"] == store.sources.index(file_path))[0]
+            ndcs = ndcs[np.argsort(metadata["offset"][ndcs])]
+            assert ndcs.shape[0] == expected.shape[0]
+            np.testing.assert_allclose(store[ndcs], expected, atol=1e-5)
+
+
+def get_audio_batch(seed, batch_size=4):
+    return (np.random.RandomState(seed).randn(batch_size, 16000)*2000).astype(np.int16)
+
+
+def get_batch_generator(n_batches, output_file=None, fail_at=None, started_at=None):
+    """
+    A function that returns a generator of audio batches from a starting batch. If `fail_at` is given, the
+    generator fails at that batch, once the checkpoint of `output_file` has all of the batches before it.
+    """
+    def generator(start_batch=0):
+        if started_at is not None:
+            started_at.append(start_batch)
+        for i in range(start_batch, n_batches):
+            if i == fail_at:
+                checkpoint_path = get_feature_checkpoint_path(output_file)
+                for _ in range(200):
+                    with open(checkpoint_path) as f:
+                        if json.load(f)["batches"] == [fail_at]:
+                            break
+                    time.sleep(0.05)
+                raise RuntimeError("The audio generator failed")
+            yield get_audio_batch(i)
+    return generator
+
+
+class TestTruncateNpy:
+    @pytest.mark.parametrize("version", [(1, 0), (2, 0)])
+    def test_truncate(self, tmp_path, version):
+        from numpy.lib import format
+
+        x = np.arange(50*3, dtype=np.float64).reshape(50, 3)
+        file_path = str(tmp_path / "x.npy")
+        with open(file_path, "wb") as f:
+            format.write_array(f, x, version=version)
+        size = os.path.getsize(file_path)
+
+        truncate_npy(file_path, 7)
+        np.testing.assert_array_equal(np.load(file_path), x[0:7])
+        assert os.path.getsize(file_path) == size - 43*3*8
+        truncate_npy(file_path, 0)
+        assert np.load(file_path).shape == (0, 3)
+
+    def test_invalid_truncation(self, tmp_path):
+        np.save(str(tmp_path / "x.npy"), np.zeros((5, 3)))
+        with pytest.raises(ValueError):
+            truncate_npy(str(tmp_path / "x.npy"), 6)
+        np.save(str(tmp_path / "fortran.npy"), np.asfortranarray(np.zeros((5, 3))))
+        with pytest.raises(ValueError):
+            truncate_npy(str(tmp_path / "fortran.npy"), 2)
+
+
+class TestComputeFeaturesFromGenerator:
+    @pytest.mark.parametrize("output_name", ["features.npy", "features"])
+    def test_resume_after_failure(self, tmp_path, output_name):
+        output_file = str(tmp_path / output_name)
+        with pytest.raises(RuntimeError):
+            compute_features_from_generator(get_batch_generator(6, output_file, fail_at=3), 40, 16000, output_file)
+        with open(get_feature_checkpoint_path(output_file)) as f:
+            assert json.load(f)["n_rows"] == 12
+
+        # The generator starts again at the first batch after the checkpoint, and the output has all of the
+        # batches (and no more rows than were produced)
+        started_at: list = []
+        stats = compute_features_from_generator(get_batch_generator(6, started_at=started_at), 40, 16000,
+                                                output_file)
+        assert started_at == [3] and stats["n_resumed_clips"] == 12 and stats["n_clips"] == 24
+        assert not os.path.exists(get_feature_checkpoint_path(output_file))
+        F = AudioFeatures(inference_framework="onnx")
+        expected = np.vstack([F.embed_clips(get_audio_batch(i), batch_size=4) for i in range(6)])
+        np.testing.assert_allclose(load_features(output_file), expected, atol=1e-5)
+
+    def test_resume_plain_generator(self, tmp_path):
+        output_file = str(tmp_path / "features.npy")
+        with pytest.raises(RuntimeError):
+            compute_features_from_generator(get_batch_generator(4, output_file, fail_at=2)(), 16, 16000, output_file)
+
+        # The batches of a plain generator before the checkpoint are skipped
+        stats = compute_features_from_generator(get_batch_generator(4)(), 16, 16000, output_file)
+        assert stats["n_resumed_clips"] == 8
+        F = AudioFeatures(inference_framework="onnx")
+        expected = np.vstack([F.embed_clips(get_audio_batch(i), batch_size=4) for i in range(4)])
+        np.testing.assert_allclose(np.load(output_file), expected, atol=1e-5)
+
+        # Without `resume`, the features are computed again
+        stats = compute_features_from_generator(get_batch_generator(4)(), 16, 16000, output_file, resume=False)
+        assert stats["n_resumed_clips"] == 0
+        np.testing.assert_allclose(np.load(output_file), expected, atol=1e-5)
+
+    def test_slow_batch_limits_batches_in_flight(self, tmp_path, monkeypatch):
+        # The third batch is slow to embed, while the other embedding workers keep going
+        embed_clips = AudioFeatures.embed_clips
+        state = {"stalled": False, "n_embedded_while_stalled": 0}
+
+        def slow_embed_clips(self, x, *args, **kwargs):
+            if x[0, 0] == 777 and not state["stalled"]:
+                state["stalled"] = True
+                time.sleep(1)
+                state["stalled"] = False
+            elif state["stalled"]:
+                state["n_embedded_while_stalled"] += 1
+            return embed_clips(self, x, *args, **kwargs)
+        monkeypatch.setattr(AudioFeatures, "embed_clips", slow_embed_clips)
+
+        batches = [np.full((2, 16000), 777 if i == 2 else i, dtype=np.int16) for i in range(40)]
+        output_file = str(tmp_path / "features.npy")
+        compute_features_from_generator(iter(batches), 80, 16000, output_file, n_embedding_workers=3,
+                                        prefetch_batches=2)
+
+        assert state["n_embedded_while_stalled"] <= 3 + 2*2
+        F = AudioFeatures(inference_framework="onnx")
+        expected = np.vstack([embed_clips(F, i, batch_size=2) for i in batches])
+        np.testing.assert_allclose(np.load(output_file), expected, atol=1e-5)
@@ -0,0 +1,66 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Imports
+import numpy as np
+
+from openwakeword.vad import VAD
+
+
+def get_clip(n_samples, seed):
+    """Noise with a changing amplitude, so that the scores depend on the LSTM state"""
+    rng = np.random.RandomState(seed)
+    return (rng.randn(n_samples)*np.linspace(100, 8000, n_samples)).clip(-32768, 32767).astype(np.int16)
+
+
+def get_sequential_scores(vad, clip, frame_size=480):
+    vad.reset_states()
+    return np.array([vad.predict(clip[i:i+frame_size], frame_size)
+                     for i in range(0, clip.shape[0] - frame_size + 1, frame_size)])
+
+
+class TestVAD:
+    def test_streams_match_sequential_predictions(self):
+        clips = {"a": get_clip(480*12, 0), "b": get_clip(480*7, 1), "c": get_clip(480*12, 2)}
+        single = VAD()
+        expected = {i: get_sequential_scores(single, clip) for i, clip in clips.items()}
+
+        # Each call has 3 chunks of each stream, except for the last calls of the shorter stream "b"
+        vad = VAD()
+        scores: dict = {i: [] for i in clips.keys()}
+        for i in range(0, 480*12, 480*3):
+            batch = {stream_id: clip[i:i+480*3] for stream_id, clip in clips.items() if clip.shape[0] > i}
+            for stream_id, score in vad.predict_streams(batch).items():
+                scores[stream_id].append(score)
+
+        for stream_id, stream_scores in scores.items():
+            n_chunks = expected[stream_id].shape[0]
+            expected_scores = [expected[stream_id][i:i+3].mean() for i in range(0, n_chunks, 3)]
+            np.testing.assert_allclose(stream_scores, expected_scores, atol=1e-5)
+
+        # Removed streams start again from a reset state
+        vad.remove_stream("a")
+        score = vad.predict_streams({"a": clips["a"][0:480*3]})["a"]
+        np.testing.assert_allclose(score, expected["a"][0:3].mean(), atol=1e-5)
+
+    def test_clips_match_sequential_predictions(self):
+        clips = [get_clip(n_samples, seed) for seed, n_samples in enumerate([480*10, 480*3 + 100, 480*8, 0, 480*10])]
+        vad = VAD()
+        results = vad.predict_clips(clips, batch_size=2)
+
+        single = VAD()
+        for clip, scores in zip(clips, results):
+            expected = get_sequential_scores(single, clip)
+            assert scores.shape == (clip.shape[0]//480,)
+            np.testing.assert_allclose(scores, expected.reshape(-1), atol=1e-5)
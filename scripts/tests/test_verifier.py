@@ -0,0 +1,79 @@
+# Copyright 2022 David Scripka. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Imports
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import FunctionTransformer, StandardScaler
+
+import openwakeword
+from openwakeword.custom_verifier_model import flatten_features, train_verifier_model
+from openwakeword.verifier import LinearVerifier
+
+
+def get_training_data(n_examples=200, seed=0):
+    """Features with a different mean and scale in each column, and labels that depend on a few of them"""
+    rng = np.random.RandomState(seed)
+    features = (rng.randn(n_examples, 16, 96)*rng.uniform(0.1, 5, (16, 96)) + rng.uniform(-3, 3, (16, 96)))
+    features = features.astype(np.float32)
+    labels = (features[:, 0, 0] + features[:, 5, 10] > features[:, 0, 0].mean() + features[:, 5, 10].mean())
+    return features, labels.astype(int)
+
+
+class TestLinearVerifier:
+    @pytest.mark.parametrize("scaler", [True, False])
+    def test_matches_sklearn(self, scaler):
+        features, labels = get_training_data()
+        steps = [FunctionTransformer(flatten_features)] + ([StandardScaler()] if scaler else []) + \
+            [LogisticRegression(max_iter=2000, C=0.1)]
+        pipeline = make_pipeline(*steps).fit(features, labels)
+        verifier = LinearVerifier.from_pipeline(pipeline)
+
+        x, _ = get_training_data(n_examples=50, seed=1)
+        expected = pipeline.predict_proba(x)
+        assert np.ptp(expected[:, 1]) > 0.5
+        np.testing.assert_allclose(verifier.predict_proba(x), expected, atol=1e-4)
+        np.testing.assert_allclose([verifier.score(i) for i in x], expected[:, 1], atol=1e-4)
+
+    def test_trained_verifier_model(self, tmp_path):
+        features, labels = get_training_data()
+        pipeline = train_verifier_model(features, labels)
+        verifier = LinearVerifier.from_pipeline(pipeline)
+        np.testing.assert_allclose(verifier.predict_proba(features), pipeline.predict_proba(features), atol=1e-5)
+
+        verifier.save(str(tmp_path / "verifier.npz"))
+        loaded = LinearVerifier.load(str(tmp_path / "verifier.npz"))
+        np.testing.assert_array_equal(loaded.weights, verifier.weights)
+        assert loaded.score(features[0]) == pytest.approx(verifier.score(features[0]))
+
+    def test_unsupported_pipelines(self, tmp_path):
+        features, labels = get_training_data()
+        multiclass = make_pipeline(FunctionTransformer(flatten_features), LogisticRegression(max_iter=200))
+        multiclass.fit(features, labels + (features[:, 1, 1] > 0))
+        with pytest.raises(ValueError):
+            LinearVerifier.from_pipeline(multiclass)
+
+        # Pickled pipelines that can't be converted are scored with scikit-learn
+        with open(tmp_path / "multiclass.pkl", "wb") as f:
+            pickle.dump(multiclass, f)
+        verifier_model = openwakeword.Model._load_custom_verifier(str(tmp_path / "multiclass.pkl"))
+        assert hasattr(verifier_model, "predict_proba") and not isinstance(verifier_model, LinearVerifier)
+
+        with open(tmp_path / "binary.pkl", "wb") as f:
+            pickle.dump(train_verifier_model(features, labels), f)
+        assert isinstance(openwakeword.Model._load_custom_verifier(str(tmp_path / "binary.pkl")), LinearVerifier)